@@ -8,6 +8,49 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str
 
+    # Supabase 连接池 (httpx, 所有请求共享)
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_POOL_SIZE: int = 50
+    SUPABASE_POOL_KEEPALIVE: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0
+    SUPABASE_TIMEOUT: float = 30.0
+    SUPABASE_CONNECT_TIMEOUT: float = 5.0
+    SUPABASE_POOL_TIMEOUT: float = 10.0
+
+    # 材料搜索索引刷新间隔（秒），物料和别名通过 API 修改时立即更新
+    SEARCH_INDEX_TTL: int = 60
+
+    # 材料详情缓存（物料数上限、秒），别名和图片通过 API 修改时立即失效
+    MATERIAL_CACHE_SIZE: int = 5000
+    MATERIAL_CACHE_TTL: int = 60
+
+    # 参考数据缓存（分类、工地、项目、库位）: memory | redis
+    CACHE_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REFERENCE_CACHE_TTL: int = 300
+
+    # 超过这个大小（字节）的 JSON 响应启用 gzip/brotli 压缩
+    COMPRESSION_MIN_SIZE: int = 1024
+
+    # 未读通知计数缓存（用户数上限、秒）
+    UNREAD_CACHE_SIZE: int = 10000
+    UNREAD_CACHE_TTL: int = 60
+
+    # 批量上传时同时写入 Storage 的文件数
+    UPLOAD_CONCURRENCY: int = 3
+
+    # 上传后没有被申请/物料引用的图片保留多久（秒），以及清理的间隔（秒）
+    IMAGE_CLAIM_TTL: int = 86400
+    IMAGE_SWEEP_INTERVAL: int = 3600
+
+    # 文件存储: supabase | s3 | local
+    STORAGE_BACKEND: str = "supabase"
+    # 允许使用的 bucket（逗号分隔）
+    STORAGE_BUCKETS: str = "request-images"
+    LOCAL_STORAGE_PATH: str = "storage"
+    # 本地存储文件的访问地址（前后端不同域名时填写完整 URL）
+    LOCAL_STORAGE_URL: str = "/api/uploads/files"
+
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -20,6 +63,10 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
+    @property
+    def storage_buckets_list(self) -> List[str]:
+        return [bucket.strip() for bucket in self.STORAGE_BUCKETS.split(",") if bucket.strip()]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,17 +1,84 @@
-from supabase import create_client, Client
+import asyncio
+from typing import List, Optional
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
 from app.config import settings
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+# anon 客户端与 service role 客户端各自使用一个 HTTP/2 连接池（配置相同）。
+# 旧版 postgrest/storage3 会把 apikey、Authorization 和 base_url 写到传入的
+# httpx 客户端上，共享同一个客户端会让后创建的客户端覆盖前一个的密钥。
+_http_clients: List[httpx.AsyncClient] = []
+_init_lock = asyncio.Lock()
+
+supabase: Optional[AsyncClient] = None
 
 # Storage operations need service role key for upload permissions
-supabase_admin: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+supabase_admin: Optional[AsyncClient] = None
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    """创建 HTTP 连接池 (大小和超时见 Settings.SUPABASE_*)"""
+    return httpx.AsyncClient(
+        http2=settings.SUPABASE_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_POOL_SIZE,
+            max_keepalive_connections=settings.SUPABASE_POOL_KEEPALIVE,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.SUPABASE_TIMEOUT,
+            connect=settings.SUPABASE_CONNECT_TIMEOUT,
+            pool=settings.SUPABASE_POOL_TIMEOUT,
+        ),
+        follow_redirects=True,
+    )
+
+
+async def init_supabase() -> None:
+    """初始化 Supabase 异步客户端 (应用启动时调用，重复调用无副作用)"""
+    global supabase, supabase_admin
+
+    async with _init_lock:
+        if supabase is not None:
+            return
+
+        admin_http_client = _create_http_client()
+        anon_http_client = _create_http_client()
+        _http_clients.extend([admin_http_client, anon_http_client])
+        supabase_admin = await acreate_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_SERVICE_KEY,
+            AsyncClientOptions(httpx_client=admin_http_client),
+        )
+        supabase = await acreate_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_KEY,
+            AsyncClientOptions(httpx_client=anon_http_client),
+        )
+
+
+async def close_supabase() -> None:
+    """关闭连接池 (应用关闭时调用)"""
+    global supabase, supabase_admin
+
+    async with _init_lock:
+        for http_client in _http_clients:
+            await http_client.aclose()
+        _http_clients.clear()
+        supabase = None
+        supabase_admin = None
 
 
-def get_supabase() -> Client:
+async def get_supabase() -> AsyncClient:
     """获取 Supabase 客户端实例"""
+    if supabase is None:
+        await init_supabase()
     return supabase
 
 
-def get_supabase_admin() -> Client:
+async def get_supabase_admin() -> AsyncClient:
     """获取 Supabase Admin 客户端实例 (用于Storage等需要service role的操作)"""
+    if supabase_admin is None:
+        await init_supabase()
     return supabase_admin
@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+from app.responses import nested_model
+
+
+class FieldSelection:
+    """字段选择参数（作为依赖注入使用）
+
+    fields=id,name,unit 只查询和返回这些字段，嵌套对象用点号选择子字段
+    （例如 fields=quantity,items.name）；不传时返回全部字段
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,unit or items.name")
+    ):
+        self.fields = fields
+
+    def shape(self, model: Type[BaseModel]) -> Optional[Dict[str, Optional[dict]]]:
+        """按模型校验字段，返回 {字段: None 或 {子字段: None}}，没有传入时返回 None"""
+        if not self.fields:
+            return None
+
+        shape: Dict[str, Optional[dict]] = {}
+        unknown = []
+        for name in (part.strip() for part in self.fields.split(",")):
+            if not name:
+                continue
+            field, _, subfield = name.partition(".")
+            if field not in model.model_fields:
+                unknown.append(name)
+                continue
+            if not subfield:
+                shape[field] = None
+                continue
+
+            nested = nested_model(model.model_fields[field].annotation)
+            if nested is None or subfield not in nested.model_fields:
+                unknown.append(name)
+            elif field not in shape or shape[field] is not None:
+                shape.setdefault(field, {})[subfield] = None
+
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        return shape
+
+    def resolve(
+        self,
+        model: Type[BaseModel],
+        default: str = "*",
+        required: Iterable[str] = ("id",),
+        embeds: Optional[Dict[str, str]] = None,
+        computed: Iterable[str] = ()
+    ) -> Tuple[str, Optional[Dict[str, Optional[dict]]]]:
+        """返回 (PostgREST select 列表, 响应字段)
+
+        required: 接口自己需要的列（例如游标分页的排序列），总是查询，只在请求时返回
+        embeds: 嵌套对象字段 -> PostgREST 关联表达式，例如 {"worker": "worker:profiles!worker_id"}
+        computed: 不在表中、由接口另外加载的字段（不出现在 select 中）
+        """
+        shape = self.shape(model)
+        if shape is None:
+            return default, None
+
+        embeds = embeds or {}
+        computed = set(computed)
+        columns = list(dict.fromkeys(required))
+        for field, subfields in shape.items():
+            if field in computed:
+                continue
+            if field in embeds:
+                sub_columns = ",".join(subfields) if subfields else "*"
+                columns.append(f"{embeds[field]}({sub_columns})")
+            elif field not in columns:
+                columns.append(field)
+        return ",".join(columns), shape
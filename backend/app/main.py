@@ -1,12 +1,66 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.pagination import NEXT_CURSOR_HEADER
+from app.middleware import ConditionalCompressionMiddleware
+from app.database import init_supabase, close_supabase, get_supabase
+from app.services.image_processing import shutdown_process_pool
+from app.services.notification_hub import notification_hub
+from app.services.search_index import material_search_index
 from app.routers import auth, baustellen, items, requests, notifications, statistics, wms, uploads, einkaufs, materials, projects, subcontractors, returns, transfers
 
+logger = logging.getLogger(__name__)
+
+
+async def sweep_uploads_periodically() -> None:
+    """每隔 IMAGE_SWEEP_INTERVAL 秒清理一次上传后没有被引用的图片"""
+    while True:
+        await asyncio.sleep(settings.IMAGE_SWEEP_INTERVAL)
+        try:
+            deleted = await uploads.sweep_abandoned_uploads()
+            if deleted:
+                logger.info("Swept %d abandoned uploads", deleted)
+        except Exception:
+            logger.exception("Failed to sweep abandoned uploads")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动时建立 Supabase 连接池、构建搜索索引、订阅通知变更并开始定期清理放弃的上传，
+    关闭时释放（包括图片处理进程池）
+    """
+    await init_supabase()
+    try:
+        await material_search_index.load(await get_supabase())
+    except Exception:
+        # 数据库暂时不可用时不影响启动，第一次搜索时再构建
+        logger.exception("Failed to build material search index")
+    if settings.UNREAD_CACHE_SIZE > 0:
+        # 未读计数缓存依赖 Realtime 事件失效，没有 SSE 客户端时也需要订阅
+        await notification_hub.start()
+    upload_sweeper = asyncio.create_task(sweep_uploads_periodically())
+    yield
+    upload_sweeper.cancel()
+    await notification_hub.close()
+    await asyncio.to_thread(shutdown_process_pool)
+    await close_supabase()
+
+
 app = FastAPI(
     title="Baustelle Material Management System",
     description="工地物资申领系统 API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# ETag/304 + gzip/brotli 压缩（在 CORS 内层，304 响应也带 CORS 头）
+app.add_middleware(
+    ConditionalCompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
 )
 
 # CORS 配置
@@ -16,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # 注册路由
@@ -0,0 +1,147 @@
+"""
+响应优化中间件 - ETag 条件请求 + gzip/brotli 压缩
+只处理 GET 的 200 JSON/文本响应：
+- 响应没有 ETag 时按响应体生成弱 ETag，If-None-Match 匹配时返回 304
+  （大列表接口在查询之前按表版本设置 ETag 并自行返回 304，见 responses.list_etag）
+- 超过 COMPRESSION_MIN_SIZE 的响应按 Accept-Encoding 压缩（优先 brotli）
+SSE、图片等其他响应直接透传
+"""
+import gzip
+import hashlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，没有安装时只使用 gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+# 压缩级别：动态响应优先速度
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# 超过这个大小的响应在线程池中压缩，避免阻塞事件循环
+THREADPOOL_MIN_SIZE = 256 * 1024
+
+
+def make_etag(body: bytes) -> str:
+    """按响应体生成弱 ETag"""
+    return f'W/"{hashlib.blake2b(body, digest_size=10).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 比较（弱比较，忽略 W/ 前缀）"""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in tags)
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """根据 Accept-Encoding 选择压缩方式，不支持时返回空字符串"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class ConditionalCompressionMiddleware:
+    """ETag/304 + 响应压缩（纯 ASGI 中间件，不影响流式响应）"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message: Message = {}
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            await self._send_buffered(start_message, b"".join(chunks), request_headers, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_buffered(self, start: Message, body: bytes, request_headers: Headers, send: Send) -> None:
+        headers = MutableHeaders(raw=list(start["headers"]))
+
+        etag = headers.get("etag")
+        if etag is None:
+            etag = make_etag(body)
+            headers["ETag"] = etag
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            not_modified = MutableHeaders()
+            for name in ("etag", "cache-control", "vary"):
+                if name in headers:
+                    not_modified[name] = headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if len(body) >= self.minimum_size:
+            headers.add_vary_header("Accept-Encoding")
+            encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+            if encoding:
+                if len(body) >= THREADPOOL_MIN_SIZE:
+                    body = await run_in_threadpool(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+
+        await send({"type": "http.response.start", "status": start["status"], "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
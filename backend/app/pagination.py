@@ -0,0 +1,80 @@
+import base64
+import json
+from typing import List, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+# 列表接口的分页参数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# 下一页游标通过响应头返回（响应体保持为列表）
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """游标分页参数（作为依赖注入使用）
+
+    不传 limit 时每页 DEFAULT_PAGE_SIZE 行（列表接口不再返回整张表），
+    需要全部结果的客户端按 X-Next-Cursor 响应头继续请求下一页
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size")
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+
+def encode_cursor(values: list) -> str:
+    """排序键 -> 不透明游标"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """不透明游标 -> 排序键"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        values = None
+
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def _quote(value) -> str:
+    """PostgREST 逻辑表达式中的值（时间戳、名称中可能有逗号和括号）"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def paginate(query, page: PageParams, sort_column: str, desc: bool = False):
+    """按 (sort_column, id) 排序并应用游标条件，多取一行用于判断是否有下一页"""
+    if page.cursor:
+        sort_value, last_id = decode_cursor(page.cursor)
+        op = "lt" if desc else "gt"
+        query = query.or_(
+            f"{sort_column}.{op}.{_quote(sort_value)},"
+            f"and({sort_column}.eq.{_quote(sort_value)},id.{op}.{_quote(last_id)})"
+        )
+
+    return query.order(sort_column, desc=desc).order("id", desc=desc).limit(page.limit + 1)
+
+
+def finish_page(rows: List[dict], page: PageParams, sort_column: str, response: Response) -> List[dict]:
+    """去掉多取的一行，有下一页时设置 X-Next-Cursor 响应头"""
+    if len(rows) <= page.limit:
+        return rows
+
+    rows = rows[:page.limit]
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last[sort_column], last["id"]])
+    return rows
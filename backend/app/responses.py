@@ -0,0 +1,126 @@
+"""
+快速 JSON 响应 - 大列表接口直接用 orjson 序列化数据库返回的数据
+数据库行的类型已经由表结构保证，跳过 response_model 的逐行校验和
+jsonable_encoder，只按模型字段裁剪（不返回模型以外的列）
+"""
+import hashlib
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type, Union, get_args
+
+import orjson
+from fastapi import Request, Response
+from postgrest.exceptions import APIError
+from pydantic import BaseModel
+
+from app.middleware import etag_matches
+
+
+def _default(value: Any):
+    """orjson 不支持的类型（与 Pydantic 的 JSON 输出一致）"""
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """Optional[Model] / List[Model] -> Model"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+@lru_cache(maxsize=None)
+def _shape(model: Type[BaseModel]) -> Dict[str, tuple]:
+    """模型字段 -> (嵌套模型, 是否必填, 缺省值)，每个模型只计算一次"""
+    shape = {}
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        shape[name] = (nested_model(field.annotation), field.is_required(), default)
+    return shape
+
+
+def project(data: Union[dict, list, None], model: Type[BaseModel], fields: Optional[dict] = None):
+    """按模型字段裁剪数据库返回的数据（不做类型校验）
+
+    fields 是 FieldSelection.shape() 返回的字段选择，为空时返回模型的全部字段
+    """
+    if data is None:
+        return None
+    if isinstance(data, list):
+        return [project(row, model, fields) for row in data]
+
+    model_shape = _shape(model)
+    row = {}
+    for name in model_shape if fields is None else fields:
+        nested, required, default = model_shape[name]
+        if name in data:
+            value = data[name]
+            if nested is not None:
+                value = project(value, nested, fields[name] if fields is not None else None)
+            row[name] = value
+        elif not required:
+            row[name] = default
+    return row
+
+
+def fast_json(
+    data: Union[dict, list],
+    model: Optional[Type[BaseModel]] = None,
+    response: Optional[Response] = None,
+    fields: Optional[dict] = None
+) -> FastJSONResponse:
+    """直接返回 JSON 响应，跳过 FastAPI 的 response_model 处理
+
+    直接返回 Response 时 FastAPI 不会合并注入的 response 参数上的响应头，
+    所以这里复制过来（例如分页的 X-Next-Cursor）
+    """
+    headers = None
+    if response is not None:
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key not in ("content-length", "content-type")
+        }
+    content = project(data, model, fields) if model is not None else data
+    return FastJSONResponse(content, headers=headers)
+
+
+async def list_etag(request: Request, db, version_function: str) -> Optional[str]:
+    """
+    列表接口的 ETag：表版本（行数 + 最大 updated_at，见 database/list_versions.sql）加上请求 URL，
+    在执行列表查询之前计算。数据库函数未部署 (PGRST202) 时返回 None，由中间件按响应体生成 ETag
+    """
+    try:
+        result = await db.rpc(version_function, {}).execute()
+    except APIError as e:
+        if e.code != "PGRST202":
+            raise
+        return None
+
+    key = f"{request.url.path}?{request.url.query}|{result.data}"
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=10).hexdigest()}"'
+
+
+def not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """客户端已有最新数据时返回 304；否则把 ETag 加到 response（fast_json 会复制过去）"""
+    if etag is None:
+        return None
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
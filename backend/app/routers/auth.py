@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.models import Profile, ProfileCreate, ProfileUpdate
 from typing import List
@@ -10,12 +10,12 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 @router.post("/register", response_model=Profile, status_code=status.HTTP_201_CREATED)
 async def register(
     profile_data: ProfileCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """注册新用户"""
     try:
         # 创建用户（使用 Supabase Auth）
-        auth_response = supabase.auth.sign_up({
+        auth_response = await supabase.auth.sign_up({
             "email": profile_data.email,
             "password": "temporary_password"  # 实际应用中应该让用户设置密码
         })
@@ -35,7 +35,7 @@ async def register(
             "phone": profile_data.phone
         }
 
-        result = supabase.table("profiles").insert(profile).execute()
+        result = await supabase.table("profiles").insert(profile).execute()
 
         if not result.data:
             raise HTTPException(
@@ -56,11 +56,11 @@ async def register(
 async def login(
     email: str,
     password: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """用户登录"""
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await supabase.auth.sign_in_with_password({
             "email": email,
             "password": password
         })
@@ -79,10 +79,10 @@ async def login(
 
 
 @router.post("/logout")
-async def logout(supabase: Client = Depends(get_supabase)):
+async def logout(supabase: AsyncClient = Depends(get_supabase)):
     """用户登出"""
     try:
-        supabase.auth.sign_out()
+        await supabase.auth.sign_out()
         return {"message": "Logged out successfully"}
     except Exception as e:
         raise HTTPException(
@@ -92,17 +92,17 @@ async def logout(supabase: Client = Depends(get_supabase)):
 
 
 @router.get("/me", response_model=Profile)
-async def get_current_user(supabase: Client = Depends(get_supabase)):
+async def get_current_user(supabase: AsyncClient = Depends(get_supabase)):
     """获取当前用户信息"""
     try:
-        user = supabase.auth.get_user()
+        user = await supabase.auth.get_user()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Not authenticated"
             )
 
-        result = supabase.table("profiles").select("*").eq("id", user.user.id).execute()
+        result = await supabase.table("profiles").select("*").eq("id", user.user.id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -122,11 +122,11 @@ async def get_current_user(supabase: Client = Depends(get_supabase)):
 @router.patch("/me", response_model=Profile)
 async def update_current_user(
     profile_data: ProfileUpdate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """更新当前用户信息"""
     try:
-        user = supabase.auth.get_user()
+        user = await supabase.auth.get_user()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,7 +135,7 @@ async def update_current_user(
 
         update_data = profile_data.model_dump(exclude_unset=True)
 
-        result = supabase.table("profiles").update(update_data).eq("id", user.user.id).execute()
+        result = await supabase.table("profiles").update(update_data).eq("id", user.user.id).execute()
 
         if not result.data:
             raise HTTPException(
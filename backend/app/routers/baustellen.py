@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.services.reference_cache import reference_cache
 from app.models import Baustelle, BaustelleCreate, BaustelleUpdate
 from typing import List, Optional
 
@@ -9,19 +10,26 @@ router = APIRouter(prefix="/baustellen", tags=["Baustellen"])
 
 @router.get("/", response_model=List[Baustelle])
 async def get_baustellen(
+    request: Request,
+    response: Response,
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """获取所有工地列表"""
-    try:
+    """获取所有工地列表（带缓存）"""
+    async def load_baustellen():
         query = supabase.table("baustellen").select("*").order("created_at", desc=True)
 
         if is_active is not None:
             query = query.eq("is_active", is_active)
 
-        result = query.execute()
+        result = await query.execute()
         return result.data
 
+    try:
+        return await reference_cache.respond(
+            request, response, "baustellen", {"is_active": is_active}, load_baustellen
+        )
+
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -32,11 +40,11 @@ async def get_baustellen(
 @router.get("/{baustelle_id}", response_model=Baustelle)
 async def get_baustelle(
     baustelle_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取指定工地详情"""
     try:
-        result = supabase.table("baustellen").select("*").eq("id", baustelle_id).execute()
+        result = await supabase.table("baustellen").select("*").eq("id", baustelle_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -58,12 +66,12 @@ async def get_baustelle(
 @router.post("/", response_model=Baustelle, status_code=status.HTTP_201_CREATED)
 async def create_baustelle(
     baustelle: BaustelleCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建新工地（仅限仓库和管理员）"""
     try:
         baustelle_data = baustelle.model_dump()
-        result = supabase.table("baustellen").insert(baustelle_data).execute()
+        result = await supabase.table("baustellen").insert(baustelle_data).execute()
 
         if not result.data:
             raise HTTPException(
@@ -71,6 +79,7 @@ async def create_baustelle(
                 detail="Failed to create baustelle"
             )
 
+        await reference_cache.invalidate("baustellen")
         return result.data[0]
 
     except Exception as e:
@@ -84,13 +93,13 @@ async def create_baustelle(
 async def update_baustelle(
     baustelle_id: str,
     baustelle: BaustelleUpdate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """更新工地信息（仅限仓库和管理员）"""
     try:
         update_data = baustelle.model_dump(exclude_unset=True)
 
-        result = supabase.table("baustellen").update(update_data).eq("id", baustelle_id).execute()
+        result = await supabase.table("baustellen").update(update_data).eq("id", baustelle_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -98,6 +107,7 @@ async def update_baustelle(
                 detail="Baustelle not found"
             )
 
+        await reference_cache.invalidate("baustellen")
         return result.data[0]
 
     except HTTPException:
@@ -112,11 +122,11 @@ async def update_baustelle(
 @router.delete("/{baustelle_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_baustelle(
     baustelle_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除工地（仅限管理员）"""
     try:
-        result = supabase.table("baustellen").delete().eq("id", baustelle_id).execute()
+        result = await supabase.table("baustellen").delete().eq("id", baustelle_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -124,6 +134,7 @@ async def delete_baustelle(
                 detail="Baustelle not found"
             )
 
+        await reference_cache.invalidate("baustellen")
         return None
 
     except HTTPException:
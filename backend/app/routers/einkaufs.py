@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, date
 from ..database import get_supabase
+from ..fields import FieldSelection
+from ..pagination import PageParams, paginate, finish_page
+from ..responses import fast_json
+from ..services.search_index import material_search_index
 
 router = APIRouter(prefix="/api/einkaufs", tags=["einkaufs"])
 
@@ -19,6 +23,13 @@ class SupplierCreate(BaseModel):
     country: Optional[str] = "Deutschland"
     notes: Optional[str] = None
 
+class Supplier(SupplierCreate):
+    id: str
+    rating: Optional[int] = 0
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class SupplierUpdate(BaseModel):
     name: Optional[str] = None
     contact_person: Optional[str] = None
@@ -53,6 +64,27 @@ class PurchaseOrderCreate(BaseModel):
     notes: Optional[str] = None
     items: List[PurchaseOrderItemCreate]
 
+class PurchaseOrderDetails(BaseModel):
+    """purchase_order_details 视图"""
+    id: str
+    order_number: str
+    status: str
+    total_amount: Optional[float] = None
+    ordered_at: Optional[datetime] = None
+    expected_delivery_date: Optional[date] = None
+    actual_delivery_date: Optional[date] = None
+    supplier_id: Optional[str] = None
+    supplier_name: Optional[str] = None
+    supplier_contact: Optional[str] = None
+    supplier_email: Optional[str] = None
+    supplier_phone: Optional[str] = None
+    created_by: Optional[str] = None
+    creator_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+    item_count: int = 0
+    total_quantity: Optional[float] = None
+    total_received: Optional[float] = None
+
 class PurchaseOrderUpdate(BaseModel):
     status: Optional[str] = None
     expected_delivery_date: Optional[date] = None
@@ -70,18 +102,27 @@ class DeliveryRecordCreate(BaseModel):
 
 @router.get("/suppliers")
 async def get_suppliers(
+    response: Response,
     is_active: Optional[bool] = None,
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(),
     db=Depends(get_supabase)
 ):
     """Get all suppliers"""
     try:
-        query = db.table("suppliers").select("*").order("name")
+        select, shape = fields.resolve(Supplier, required=("id", "name"))
+        query = db.table("suppliers").select(select)
 
         if is_active is not None:
             query = query.eq("is_active", is_active)
 
-        result = query.execute()
-        return result.data
+        result = await paginate(query, page, "name").execute()
+        suppliers = finish_page(result.data, page, "name", response)
+        if shape is None:
+            return suppliers
+        return fast_json(suppliers, Supplier, response, shape)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -89,7 +130,7 @@ async def get_suppliers(
 async def get_supplier(supplier_id: str, db=Depends(get_supabase)):
     """Get supplier details"""
     try:
-        result = db.table("suppliers").select("*").eq("id", supplier_id).execute()
+        result = await db.table("suppliers").select("*").eq("id", supplier_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Supplier not found")
@@ -104,7 +145,7 @@ async def get_supplier(supplier_id: str, db=Depends(get_supabase)):
 async def create_supplier(supplier: SupplierCreate, db=Depends(get_supabase)):
     """Create new supplier"""
     try:
-        result = db.table("suppliers").insert(supplier.dict()).execute()
+        result = await db.table("suppliers").insert(supplier.dict()).execute()
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -122,7 +163,7 @@ async def update_supplier(
         if not update_data:
             raise HTTPException(status_code=400, detail="No data to update")
 
-        result = db.table("suppliers").update(update_data).eq("id", supplier_id).execute()
+        result = await db.table("suppliers").update(update_data).eq("id", supplier_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Supplier not found")
@@ -137,7 +178,7 @@ async def update_supplier(
 async def get_supplier_items(supplier_id: str, db=Depends(get_supabase)):
     """Get all items for a supplier with pricing"""
     try:
-        result = db.table("supplier_items").select(
+        result = await db.table("supplier_items").select(
             "*, items(*)"
         ).eq("supplier_id", supplier_id).execute()
 
@@ -152,7 +193,7 @@ async def create_supplier_item(
 ):
     """Add item pricing for supplier"""
     try:
-        result = db.table("supplier_items").insert(supplier_item.dict()).execute()
+        result = await db.table("supplier_items").insert(supplier_item.dict()).execute()
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -161,21 +202,30 @@ async def create_supplier_item(
 
 @router.get("/purchase-orders")
 async def get_purchase_orders(
+    response: Response,
     status: Optional[str] = None,
     supplier_id: Optional[str] = None,
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(),
     db=Depends(get_supabase)
 ):
     """Get all purchase orders"""
     try:
-        query = db.table("purchase_order_details").select("*").order("created_at", desc=True)
+        select, shape = fields.resolve(PurchaseOrderDetails, required=("id", "created_at"))
+        query = db.table("purchase_order_details").select(select)
 
         if status:
             query = query.eq("status", status)
         if supplier_id:
             query = query.eq("supplier_id", supplier_id)
 
-        result = query.execute()
-        return result.data
+        result = await paginate(query, page, "created_at", desc=True).execute()
+        orders = finish_page(result.data, page, "created_at", response)
+        if shape is None:
+            return orders
+        return fast_json(orders, PurchaseOrderDetails, response, shape)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -183,7 +233,7 @@ async def get_purchase_orders(
 async def get_purchase_order(po_id: str, db=Depends(get_supabase)):
     """Get purchase order details"""
     try:
-        result = db.table("purchase_order_details").select("*").eq("id", po_id).execute()
+        result = await db.table("purchase_order_details").select("*").eq("id", po_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Purchase order not found")
@@ -209,7 +259,7 @@ async def create_purchase_order(
         total_amount = sum(item.quantity * item.unit_price for item in po.items)
 
         # Get next PO number
-        po_number_result = db.rpc("generate_po_number").execute()
+        po_number_result = await db.rpc("generate_po_number").execute()
         po_number = po_number_result.data
 
         # Create purchase order
@@ -223,7 +273,7 @@ async def create_purchase_order(
             "status": "draft"
         }
 
-        po_result = db.table("purchase_orders").insert(po_data).execute()
+        po_result = await db.table("purchase_orders").insert(po_data).execute()
 
         if not po_result.data:
             raise HTTPException(status_code=500, detail="Failed to create purchase order")
@@ -244,10 +294,10 @@ async def create_purchase_order(
             for item in po.items
         ]
 
-        db.table("purchase_order_items").insert(items_data).execute()
+        await db.table("purchase_order_items").insert(items_data).execute()
 
         # Get complete PO with details
-        result = db.table("purchase_order_details").select("*").eq("id", po_id).execute()
+        result = await db.table("purchase_order_details").select("*").eq("id", po_id).execute()
 
         return result.data[0]
     except HTTPException:
@@ -277,13 +327,13 @@ async def update_purchase_order(
         if not update_data:
             raise HTTPException(status_code=400, detail="No data to update")
 
-        result = db.table("purchase_orders").update(update_data).eq("id", po_id).execute()
+        result = await db.table("purchase_orders").update(update_data).eq("id", po_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Purchase order not found")
 
         # Get complete PO with details
-        po_result = db.table("purchase_order_details").select("*").eq("id", po_id).execute()
+        po_result = await db.table("purchase_order_details").select("*").eq("id", po_id).execute()
 
         return po_result.data[0]
     except HTTPException:
@@ -295,7 +345,7 @@ async def update_purchase_order(
 async def confirm_purchase_order(po_id: str, db=Depends(get_supabase)):
     """Confirm and submit purchase order"""
     try:
-        result = db.table("purchase_orders").update({
+        result = await db.table("purchase_orders").update({
             "status": "ordered",
             "ordered_at": datetime.utcnow().isoformat()
         }).eq("id", po_id).execute()
@@ -315,7 +365,7 @@ async def confirm_purchase_order(po_id: str, db=Depends(get_supabase)):
 async def get_low_stock_items(db=Depends(get_supabase)):
     """Get items with low stock"""
     try:
-        result = db.table("low_stock_items").select("*").execute()
+        result = await db.table("low_stock_items").select("*").execute()
         return result.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -334,7 +384,7 @@ async def get_purchase_requests(
         if status:
             query = query.eq("status", status)
 
-        result = query.execute()
+        result = await query.execute()
         return result.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -349,7 +399,7 @@ async def convert_request_to_po(
     """Convert purchase request to purchase order"""
     try:
         # Get purchase request
-        req_result = db.table("purchase_requests").select(
+        req_result = await db.table("purchase_requests").select(
             "*, items(*)"
         ).eq("id", request_id).execute()
 
@@ -359,7 +409,7 @@ async def convert_request_to_po(
         request = req_result.data[0]
 
         # Get supplier item pricing
-        supplier_item = db.table("supplier_items").select("*").eq(
+        supplier_item = await db.table("supplier_items").select("*").eq(
             "supplier_id", supplier_id
         ).eq("item_id", request["item_id"]).execute()
 
@@ -385,7 +435,7 @@ async def convert_request_to_po(
         po = await create_purchase_order(po_data, created_by, db)
 
         # Update request status
-        db.table("purchase_requests").update({
+        await db.table("purchase_requests").update({
             "status": "converted",
             "po_id": po["id"]
         }).eq("id", request_id).execute()
@@ -411,12 +461,12 @@ async def create_delivery_record(
             "received_by": received_by
         }
 
-        result = db.table("delivery_records").insert(delivery_data).execute()
+        result = await db.table("delivery_records").insert(delivery_data).execute()
 
         # If quality check passed, update inventory
         if delivery.quality_check_passed:
             # Get item details
-            po_item = db.table("purchase_order_items").select(
+            po_item = await db.table("purchase_order_items").select(
                 "*, items(*)"
             ).eq("po_id", delivery.po_id).eq("item_id", delivery.item_id).execute()
 
@@ -424,9 +474,11 @@ async def create_delivery_record(
                 item = po_item.data[0]["items"]
                 new_stock = item["current_stock"] + delivery.quantity_received
 
-                db.table("items").update({
+                updated = await db.table("items").update({
                     "current_stock": new_stock
                 }).eq("id", delivery.item_id).execute()
+                if updated.data:
+                    material_search_index.upsert_item(updated.data[0])
 
         return result.data[0]
     except Exception as e:
@@ -439,20 +491,20 @@ async def get_einkaufs_stats(db=Depends(get_supabase)):
     """Get purchasing statistics"""
     try:
         # Low stock count
-        low_stock = db.table("low_stock_items").select("id", count="exact").execute()
+        low_stock = await db.table("low_stock_items").select("id", count="exact").execute()
 
         # Active POs
-        active_pos = db.table("purchase_orders").select(
+        active_pos = await db.table("purchase_orders").select(
             "id", count="exact"
         ).in_("status", ["draft", "ordered", "shipping"]).execute()
 
         # Total suppliers
-        suppliers = db.table("suppliers").select(
+        suppliers = await db.table("suppliers").select(
             "id", count="exact"
         ).eq("is_active", True).execute()
 
         # Pending requests
-        pending_requests = db.table("purchase_requests").select(
+        pending_requests = await db.table("purchase_requests").select(
             "id", count="exact"
         ).eq("status", "pending").execute()
 
@@ -1,43 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.fields import FieldSelection
+from app.pagination import PageParams, paginate, finish_page
+from app.responses import fast_json, list_etag, not_modified
+from app.services.material_cache import material_detail_cache
+from app.services.reference_cache import reference_cache
+from app.services.search_index import material_search_index
 from app.models import Item, ItemCreate, ItemUpdate, Category
+from postgrest.exceptions import APIError
 from typing import List, Optional
 
 router = APIRouter(prefix="/items", tags=["Items"])
 # Updated to include baustelle_id in Item model
 
 
+async def fetch_low_stock_fallback(query) -> List[dict]:
+    """低库存筛选的 Python 实现（未部署 items_low_stock.sql 时使用）"""
+    result = await query.order("name").order("id").execute()
+    return [
+        item for item in result.data
+        if float(item.get("stock_quantity") or 0) <= float(item.get("min_stock_level") or 0)
+    ]
+
+
 @router.get("/", response_model=List[Item])
 async def get_items(
+    request: Request,
+    response: Response,
     type: Optional[str] = Query(None, description="Filter by type: material or maschine"),
     category_id: Optional[str] = Query(None, description="Filter by category"),
     is_active: Optional[bool] = Query(True, description="Filter by active status"),
     low_stock: Optional[bool] = Query(None, description="Show only low stock items"),
-    supabase: Client = Depends(get_supabase)
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """获取材料/设备列表"""
+    """获取材料/设备列表（ETag 按物料表版本计算，数据没有变化时返回 304，不执行列表查询）"""
     try:
-        query = supabase.table("items").select("*").order("name")
+        cached = not_modified(request, response, await list_etag(request, supabase, "items_list_version"))
+        if cached is not None:
+            return cached
 
-        if type:
-            query = query.eq("type", type)
+        required = ("id", "name", "stock_quantity", "min_stock_level") if low_stock else ("id", "name")
+        select, shape = fields.resolve(Item, required=required)
+        def items_query():
+            query = supabase.table("items").select(select)
 
-        if category_id:
-            query = query.eq("category_id", category_id)
+            if type:
+                query = query.eq("type", type)
 
-        if is_active is not None:
-            query = query.eq("is_active", is_active)
+            if category_id:
+                query = query.eq("category_id", category_id)
 
-        result = query.execute()
-        items = result.data
+            if is_active is not None:
+                query = query.eq("is_active", is_active)
 
-        # 过滤低库存项目
-        if low_stock:
-            items = [item for item in items if float(item["stock_quantity"]) <= float(item["min_stock_level"])]
+            return query
 
-        return items
+        if low_stock:
+            # 低库存筛选在数据库中执行（stock_quantity <= min_stock_level 的生成列 is_low_stock，见 database/items_low_stock.sql）
+            try:
+                result = await paginate(items_query().eq("is_low_stock", True), page, "name").execute()
+            except APIError as e:
+                # 生成列未部署 (42703) 时退回到读取全部物料后在 Python 中过滤（不分页）
+                if e.code != "42703":
+                    raise
+                return fast_json(await fetch_low_stock_fallback(items_query()), Item, response, shape)
+        else:
+            result = await paginate(items_query(), page, "name").execute()
+        items = finish_page(result.data, page, "name", response)
+
+        return fast_json(items, Item, response, shape)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,11 +85,11 @@ async def get_items(
 @router.get("/{item_id}", response_model=Item)
 async def get_item(
     item_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取指定材料/设备详情"""
     try:
-        result = supabase.table("items").select("*").eq("id", item_id).execute()
+        result = await supabase.table("items").select("*").eq("id", item_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -74,7 +111,7 @@ async def get_item(
 @router.post("/", response_model=Item, status_code=status.HTTP_201_CREATED)
 async def create_item(
     item: ItemCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建新材料/设备（仅限仓库和管理员）"""
     try:
@@ -83,7 +120,7 @@ async def create_item(
         item_data["stock_quantity"] = str(item_data["stock_quantity"])
         item_data["min_stock_level"] = str(item_data["min_stock_level"])
 
-        result = supabase.table("items").insert(item_data).execute()
+        result = await supabase.table("items").insert(item_data).execute()
 
         if not result.data:
             raise HTTPException(
@@ -91,6 +128,7 @@ async def create_item(
                 detail="Failed to create item"
             )
 
+        material_search_index.upsert_item(result.data[0])
         return result.data[0]
 
     except Exception as e:
@@ -104,7 +142,7 @@ async def create_item(
 async def update_item(
     item_id: str,
     item: ItemUpdate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """更新材料/设备信息（仅限仓库和管理员）"""
     try:
@@ -116,7 +154,7 @@ async def update_item(
         if "min_stock_level" in update_data:
             update_data["min_stock_level"] = str(update_data["min_stock_level"])
 
-        result = supabase.table("items").update(update_data).eq("id", item_id).execute()
+        result = await supabase.table("items").update(update_data).eq("id", item_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -124,6 +162,8 @@ async def update_item(
                 detail="Item not found"
             )
 
+        material_search_index.upsert_item(result.data[0])
+        material_detail_cache.invalidate(item_id)
         return result.data[0]
 
     except HTTPException:
@@ -138,11 +178,11 @@ async def update_item(
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_item(
     item_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除材料/设备（仅限管理员）"""
     try:
-        result = supabase.table("items").delete().eq("id", item_id).execute()
+        result = await supabase.table("items").delete().eq("id", item_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -150,6 +190,8 @@ async def delete_item(
                 detail="Item not found"
             )
 
+        material_search_index.remove_item(item_id)
+        material_detail_cache.invalidate(item_id)
         return None
 
     except HTTPException:
@@ -167,19 +209,26 @@ async def delete_item(
 
 @router.get("/categories/", response_model=List[Category], tags=["Categories"])
 async def get_categories(
+    request: Request,
+    response: Response,
     type: Optional[str] = Query(None, description="Filter by type: material or maschine"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """获取分类列表"""
-    try:
+    """获取分类列表（带缓存，分类在数据库中维护，TTL 到期后刷新）"""
+    async def load_categories():
         query = supabase.table("categories").select("*").order("name")
 
         if type:
             query = query.eq("type", type)
 
-        result = query.execute()
+        result = await query.execute()
         return result.data
 
+    try:
+        return await reference_cache.respond(
+            request, response, "categories", {"type": type}, load_categories
+        )
+
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
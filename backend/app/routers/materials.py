@@ -2,15 +2,24 @@
 材料管理 API (Material Management)
 支持别名、图片、智能搜索等功能
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from supabase import AsyncClient
 from app.database import get_supabase
-from typing import List, Optional
+from app.services.material_cache import material_detail_cache
+from app.services.search_index import RESULT_LIMIT, material_search_index
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/materials", tags=["Materials"])
 
+# 输入联想结果在浏览器中的缓存时间（秒）
+TYPEAHEAD_MAX_AGE = 10
+
+# 批量获取材料详情每次最多的物料数量
+MATERIAL_DETAILS_MAX_IDS = 100
+
 
 # ============ Pydantic Models ============
 
@@ -72,11 +81,11 @@ class SearchResult(BaseModel):
 @router.get("/{item_id}/aliases", response_model=List[MaterialAlias])
 async def get_material_aliases(
     item_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取材料的所有别名"""
     try:
-        result = supabase.table("item_aliases").select("*").eq("item_id", item_id).execute()
+        result = await supabase.table("item_aliases").select("*").eq("item_id", item_id).execute()
         return result.data
     except Exception as e:
         raise HTTPException(
@@ -89,11 +98,11 @@ async def get_material_aliases(
 async def add_material_alias(
     item_id: str,
     alias: MaterialAliasCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """为材料添加别名"""
     try:
-        result = supabase.table("item_aliases").insert({
+        result = await supabase.table("item_aliases").insert({
             "item_id": item_id,
             "alias": alias.alias
         }).execute()
@@ -104,6 +113,8 @@ async def add_material_alias(
                 detail="Failed to create alias"
             )
 
+        material_search_index.add_alias(result.data[0])
+        material_detail_cache.invalidate(item_id)
         return result.data[0]
     except Exception as e:
         # 检查是否是重复别名错误
@@ -122,11 +133,11 @@ async def add_material_alias(
 async def delete_material_alias(
     item_id: str,
     alias_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除材料别名"""
     try:
-        result = supabase.table("item_aliases").delete().eq("id", alias_id).eq("item_id", item_id).execute()
+        result = await supabase.table("item_aliases").delete().eq("id", alias_id).eq("item_id", item_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -134,6 +145,8 @@ async def delete_material_alias(
                 detail="Alias not found"
             )
 
+        material_search_index.remove_alias(alias_id)
+        material_detail_cache.invalidate(item_id)
         return None
     except HTTPException:
         raise
@@ -149,11 +162,11 @@ async def delete_material_alias(
 @router.get("/{item_id}/images", response_model=List[MaterialImage])
 async def get_material_images(
     item_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取材料的所有图片"""
     try:
-        result = supabase.table("item_images").select("*").eq("item_id", item_id).order("is_primary", desc=True).execute()
+        result = await supabase.table("item_images").select("*").eq("item_id", item_id).order("is_primary", desc=True).execute()
         return result.data
     except Exception as e:
         raise HTTPException(
@@ -166,20 +179,20 @@ async def get_material_images(
 async def add_material_image(
     item_id: str,
     image: MaterialImageCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """为材料添加图片"""
     try:
         # 如果设置为主图片，先取消其他主图片
         if image.is_primary:
-            supabase.table("item_images").update({
+            await supabase.table("item_images").update({
                 "is_primary": False
             }).eq("item_id", item_id).execute()
 
         image_data = image.model_dump()
         image_data["item_id"] = item_id
 
-        result = supabase.table("item_images").insert(image_data).execute()
+        result = await supabase.table("item_images").insert(image_data).execute()
 
         if not result.data:
             raise HTTPException(
@@ -187,6 +200,7 @@ async def add_material_image(
                 detail="Failed to add image"
             )
 
+        material_detail_cache.invalidate(item_id)
         return result.data[0]
     except Exception as e:
         raise HTTPException(
@@ -199,11 +213,11 @@ async def add_material_image(
 async def delete_material_image(
     item_id: str,
     image_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除材料图片"""
     try:
-        result = supabase.table("item_images").delete().eq("id", image_id).eq("item_id", item_id).execute()
+        result = await supabase.table("item_images").delete().eq("id", image_id).eq("item_id", item_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -211,6 +225,7 @@ async def delete_material_image(
                 detail="Image not found"
             )
 
+        material_detail_cache.invalidate(item_id)
         return None
     except HTTPException:
         raise
@@ -225,17 +240,17 @@ async def delete_material_image(
 async def set_primary_image(
     item_id: str,
     image_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """设置主图片"""
     try:
         # 取消所有主图片
-        supabase.table("item_images").update({
+        await supabase.table("item_images").update({
             "is_primary": False
         }).eq("item_id", item_id).execute()
 
         # 设置新的主图片
-        result = supabase.table("item_images").update({
+        result = await supabase.table("item_images").update({
             "is_primary": True
         }).eq("id", image_id).eq("item_id", item_id).execute()
 
@@ -245,6 +260,7 @@ async def set_primary_image(
                 detail="Image not found"
             )
 
+        material_detail_cache.invalidate(item_id)
         return result.data[0]
     except HTTPException:
         raise
@@ -257,36 +273,30 @@ async def set_primary_image(
 
 # ============ 材料详情（包含别名和图片） ============
 
-@router.get("/{item_id}/detail", response_model=MaterialDetail)
-async def get_material_detail(
-    item_id: str,
-    supabase: Client = Depends(get_supabase)
-):
-    """获取材料详细信息（包含别名和图片）"""
-    try:
-        # 获取材料基本信息
-        item_result = supabase.table("items").select(
-            "*, category:categories(name)"
-        ).eq("id", item_id).execute()
-
-        if not item_result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Material not found"
-            )
-
-        item = item_result.data[0]
-
-        # 获取别名
-        aliases_result = supabase.table("item_aliases").select("alias").eq("item_id", item_id).execute()
-        aliases = [a["alias"] for a in aliases_result.data] if aliases_result.data else []
-
-        # 获取图片
-        images_result = supabase.table("item_images").select("*").eq("item_id", item_id).order("is_primary", desc=True).execute()
-        images = images_result.data if images_result.data else []
-
-        # 组装响应
-        return {
+async def load_material_details(supabase: AsyncClient, item_ids: List[str]) -> Dict[str, dict]:
+    """批量获取材料详情：物料、别名、图片各一次查询（并行执行），结果写入缓存"""
+    details, missing = material_detail_cache.get_many(item_ids)
+    if not missing:
+        return details
+
+    generation = material_detail_cache.generation
+    items_result, aliases_result, images_result = await asyncio.gather(
+        supabase.table("items").select("*, category:categories(name)").in_("id", missing).execute(),
+        supabase.table("item_aliases").select("item_id, alias").in_("item_id", missing).execute(),
+        supabase.table("item_images").select("*").in_("item_id", missing).order("is_primary", desc=True).execute()
+    )
+
+    aliases_by_item = {item_id: [] for item_id in missing}
+    for alias in aliases_result.data or []:
+        aliases_by_item[alias["item_id"]].append(alias["alias"])
+
+    images_by_item = {item_id: [] for item_id in missing}
+    for image in images_result.data or []:
+        images_by_item[image["item_id"]].append(image)
+
+    loaded = {}
+    for item in items_result.data or []:
+        loaded[item["id"]] = {
             "id": item["id"],
             "name": item["name"],
             "barcode": item.get("barcode"),
@@ -298,9 +308,54 @@ async def get_material_detail(
             "current_stock": item.get("current_stock", 0),
             "min_stock": item.get("min_stock", 0),
             "is_active": item["is_active"],
-            "aliases": aliases,
-            "images": images
+            "aliases": aliases_by_item[item["id"]],
+            "images": images_by_item[item["id"]]
         }
+
+    material_detail_cache.set_many(loaded, generation)
+    details.update(loaded)
+    return details
+
+
+@router.get("/details", response_model=List[MaterialDetail])
+async def get_material_details(
+    ids: str = Query(..., description="逗号分隔的物料 ID"),
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    """批量获取材料详情（材料目录页面），按请求顺序返回，不存在的 ID 忽略"""
+    item_ids = list(dict.fromkeys(item_id.strip() for item_id in ids.split(",") if item_id.strip()))
+    if len(item_ids) > MATERIAL_DETAILS_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many ids (max {MATERIAL_DETAILS_MAX_IDS})"
+        )
+
+    try:
+        details = await load_material_details(supabase, item_ids)
+        return [details[item_id] for item_id in item_ids if item_id in details]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.get("/{item_id}/detail", response_model=MaterialDetail)
+async def get_material_detail(
+    item_id: str,
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    """获取材料详细信息（包含别名和图片）"""
+    try:
+        details = await load_material_details(supabase, [item_id])
+
+        if item_id not in details:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Material not found"
+            )
+
+        return details[item_id]
     except HTTPException:
         raise
     except Exception as e:
@@ -315,13 +370,32 @@ async def get_material_detail(
 @router.get("/search", response_model=List[SearchResult])
 async def search_materials(
     q: str = Query(..., min_length=1, description="搜索关键词"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
+):
+    """智能搜索材料（支持名称、别名、条码、模糊匹配和拼写纠错）"""
+    try:
+        # 使用进程内搜索索引（与 search_items() 数据库函数返回相同的结构）
+        return await material_search_index.search(supabase, q)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.get("/typeahead", response_model=List[SearchResult])
+async def typeahead_materials(
+    response: Response,
+    q: str = Query(..., min_length=1, description="已输入的关键词"),
+    limit: int = Query(10, ge=1, le=RESULT_LIMIT, description="返回数量"),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """智能搜索材料（支持名称、别名、模糊匹配）"""
+    """搜索框输入联想（每次按键调用，结果与 /search 相同并缓存）"""
     try:
-        # 调用数据库搜索函数
-        result = supabase.rpc("search_items", {"search_term": q}).execute()
-        return result.data if result.data else []
+        results = await material_search_index.typeahead(supabase, q, limit)
+        # 用户删除字符时浏览器直接使用刚才的结果
+        response.headers["Cache-Control"] = f"private, max-age={TYPEAHEAD_MAX_AGE}"
+        return results
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
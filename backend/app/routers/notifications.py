@@ -1,18 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.models import Notification, NotificationCreate
+from app.services.notification_hub import notification_hub
+from app.services.unread_counter import unread_counter
 from typing import List, Optional
+import asyncio
+import json
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
+# SSE heartbeat interval in seconds (keeps proxies from closing idle streams)
+STREAM_HEARTBEAT_INTERVAL = 25
+
+
+def _on_notification_event(user_id: str, event: dict) -> None:
+    """Notifications changed outside this worker (triggers, SQL, other workers) invalidate the cached count"""
+    if event.get("type") in ("insert", "update", "delete"):
+        unread_counter.invalidate(user_id)
+
+
+notification_hub.add_listener(_on_notification_event)
+# Events missed while the Realtime channel was down may have changed any cached count
+notification_hub.add_reset_listener(unread_counter.clear)
+
 
 @router.get("/", response_model=List[Notification])
 async def get_notifications(
     user_id: str = Query(..., description="User ID to get notifications for"),
     is_read: Optional[bool] = Query(None, description="Filter by read status"),
     limit: int = Query(50, description="Limit number of results"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Get user notification list"""
     try:
@@ -23,7 +42,7 @@ async def get_notifications(
 
         query = query.limit(limit)
 
-        result = query.execute()
+        result = await query.execute()
         return result.data
 
     except Exception as e:
@@ -36,15 +55,28 @@ async def get_notifications(
 @router.get("/unread-count")
 async def get_unread_count(
     user_id: str = Query(..., description="User ID"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """Get unread notification count"""
+    """
+    Get unread notification count (served from the per-user cache when possible).
+    The cache is only used while the Realtime channel is connected: without it,
+    notifications created by triggers would not invalidate the cached count.
+    """
     try:
-        result = supabase.table("notifications").select(
+        cacheable = notification_hub.connected
+        if cacheable:
+            count = unread_counter.get(user_id)
+            if count is not None:
+                return {"count": count}
+
+        result = await supabase.table("notifications").select(
             "id", count="exact"
         ).eq("user_id", user_id).eq("is_read", False).execute()
 
-        return {"count": result.count if result.count else 0}
+        count = result.count if result.count else 0
+        if cacheable:
+            unread_counter.set(user_id, count)
+        return {"count": count}
 
     except Exception as e:
         raise HTTPException(
@@ -53,16 +85,67 @@ async def get_unread_count(
         )
 
 
+@router.get("/unread-count/stats")
+async def get_unread_count_stats():
+    """Unread count cache hit/miss metrics"""
+    return unread_counter.stats()
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    user_id: str = Query(..., description="User ID")
+):
+    """Server-Sent Events stream of the user's new and updated notifications"""
+    try:
+        queue = await notification_hub.subscribe(user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Notification stream unavailable: {e}"
+        )
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            notification_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.patch("/{notification_id}/read", response_model=Notification)
 async def mark_notification_read(
     notification_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Mark notification as read"""
     try:
-        result = supabase.table("notifications").update({
+        # Only unread notifications change the unread count
+        result = await supabase.table("notifications").update({
             "is_read": True
-        }).eq("id", notification_id).execute()
+        }).eq("id", notification_id).eq("is_read", False).execute()
+
+        if result.data:
+            unread_counter.adjust(result.data[0]["user_id"], -1)
+            return result.data[0]
+
+        # Already read (or missing)
+        result = await supabase.table("notifications").select("*").eq("id", notification_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -84,13 +167,14 @@ async def mark_notification_read(
 @router.patch("/mark-all-read")
 async def mark_all_notifications_read(
     user_id: str = Query(..., description="User ID"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Mark all notifications as read"""
     try:
-        result = supabase.table("notifications").update({
+        result = await supabase.table("notifications").update({
             "is_read": True
         }).eq("user_id", user_id).eq("is_read", False).execute()
+        unread_counter.set(user_id, 0)
 
         return {"message": "All notifications marked as read", "count": len(result.data) if result.data else 0}
 
@@ -104,11 +188,11 @@ async def mark_all_notifications_read(
 @router.delete("/{notification_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_notification(
     notification_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Delete notification"""
     try:
-        result = supabase.table("notifications").delete().eq("id", notification_id).execute()
+        result = await supabase.table("notifications").delete().eq("id", notification_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -116,6 +200,10 @@ async def delete_notification(
                 detail="Notification not found"
             )
 
+        deleted = result.data[0]
+        if not deleted.get("is_read"):
+            unread_counter.adjust(deleted["user_id"], -1)
+
         return None
 
     except HTTPException:
@@ -130,12 +218,12 @@ async def delete_notification(
 @router.post("/", response_model=Notification, status_code=status.HTTP_201_CREATED)
 async def create_notification(
     notification: NotificationCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Create new notification (for internal system use)"""
     try:
         notification_data = notification.model_dump()
-        result = supabase.table("notifications").insert(notification_data).execute()
+        result = await supabase.table("notifications").insert(notification_data).execute()
 
         if not result.data:
             raise HTTPException(
@@ -143,7 +231,11 @@ async def create_notification(
                 detail="Failed to create notification"
             )
 
-        return result.data[0]
+        created = result.data[0]
+        if not created.get("is_read"):
+            unread_counter.adjust(created["user_id"], 1)
+
+        return created
 
     except Exception as e:
         raise HTTPException(
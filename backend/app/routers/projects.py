@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.pagination import NEXT_CURSOR_HEADER, PageParams, paginate, finish_page
+from app.services.reference_cache import reference_cache
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
@@ -37,41 +39,62 @@ class Project(ProjectBase):
 
 @router.get("/", response_model=List[Project])
 async def get_projects(
+    request: Request,
+    response: Response,
     is_active: Optional[bool] = Query(None),
-    supabase: Client = Depends(get_supabase)
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """获取所有项目列表"""
-    query = supabase.table("projects").select("""
-        *,
-        bauleiter:profiles!projects_bauleiter_id_fkey(full_name)
-    """)
-
-    if is_active is not None:
-        query = query.eq("is_active", is_active)
-
-    result = query.order("created_at", desc=True).execute()
-
-    # 格式化返回数据
-    projects = []
-    for project in result.data:
-        project_data = {
-            **project,
-            "bauleiter_name": project.get("bauleiter", {}).get("full_name") if project.get("bauleiter") else None
-        }
-        # 移除嵌套的 bauleiter 对象
-        if "bauleiter" in project_data:
-            del project_data["bauleiter"]
-        projects.append(project_data)
-
-    return projects
+    """获取项目列表（第一页使用缓存，下一页游标和数据一起缓存）"""
+    async def load_projects(page_response: Response):
+        query = supabase.table("projects").select("""
+            *,
+            bauleiter:profiles!projects_bauleiter_id_fkey(full_name)
+        """)
+
+        if is_active is not None:
+            query = query.eq("is_active", is_active)
+
+        result = await paginate(query, page, "created_at", desc=True).execute()
+
+        # 格式化返回数据
+        projects = []
+        for project in finish_page(result.data, page, "created_at", page_response):
+            project_data = {
+                **project,
+                "bauleiter_name": project.get("bauleiter", {}).get("full_name") if project.get("bauleiter") else None
+            }
+            # 移除嵌套的 bauleiter 对象
+            if "bauleiter" in project_data:
+                del project_data["bauleiter"]
+            projects.append(project_data)
+
+        return projects
+
+    if page.cursor:
+        return await load_projects(response)
+
+    async def load_first_page():
+        page_response = Response()
+        projects = await load_projects(page_response)
+        return {"projects": projects, "next_cursor": page_response.headers.get(NEXT_CURSOR_HEADER)}
+
+    cached = await reference_cache.respond(
+        request, response, "projects", {"is_active": is_active, "limit": page.limit}, load_first_page
+    )
+    if isinstance(cached, Response):
+        return cached
+    if cached["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = cached["next_cursor"]
+    return cached["projects"]
 
 @router.get("/{project_id}", response_model=Project)
 async def get_project(
     project_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取单个项目详情"""
-    result = supabase.table("projects").select("""
+    result = await supabase.table("projects").select("""
         *,
         bauleiter:profiles!projects_bauleiter_id_fkey(full_name)
     """).eq("id", project_id).single().execute()
@@ -88,14 +111,16 @@ async def get_project(
 @router.post("/", response_model=Project, status_code=201)
 async def create_project(
     project: ProjectCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建新项目"""
-    result = supabase.table("projects").insert(project.model_dump()).execute()
+    result = await supabase.table("projects").insert(project.model_dump()).execute()
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create project")
 
+    await reference_cache.invalidate("projects")
+
     # 重新获取完整数据（包含关联的 bauleiter 信息）
     return await get_project(result.data[0]["id"], supabase)
 
@@ -103,7 +128,7 @@ async def create_project(
 async def update_project(
     project_id: str,
     project: ProjectUpdate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """更新项目信息"""
     # 只更新提供的字段
@@ -112,31 +137,35 @@ async def update_project(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = supabase.table("projects").update(update_data).eq("id", project_id).execute()
+    result = await supabase.table("projects").update(update_data).eq("id", project_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    await reference_cache.invalidate("projects")
+
     return await get_project(project_id, supabase)
 
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除项目（软删除 - 设置 is_active = false）"""
-    result = supabase.table("projects").update({"is_active": False}).eq("id", project_id).execute()
+    result = await supabase.table("projects").update({"is_active": False}).eq("id", project_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    await reference_cache.invalidate("projects")
+
     return {"message": "Project deactivated successfully"}
 
 @router.get("/{project_id}/materials")
 async def get_project_materials(
     project_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取项目使用的材料统计"""
-    result = supabase.rpc("project_material_stats").eq("project_id", project_id).execute()
+    result = await supabase.rpc("project_material_stats").eq("project_id", project_id).execute()
     return result.data
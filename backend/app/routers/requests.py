@@ -1,29 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.fields import FieldSelection
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PageParams, paginate, finish_page
+from app.responses import fast_json
 from app.models import (
     Request, RequestCreate, RequestUpdate, RequestWithDetails,
     RequestHistory, RequestItem
 )
+from postgrest.exceptions import APIError
 from typing import List, Optional
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/requests", tags=["Requests"])
 
+# Request with worker, construction site, items and images in one PostgREST call
+REQUEST_DETAIL_SELECT = (
+    "*, worker:profiles!worker_id(*), baustelle:baustellen!baustelle_id(*), "
+    "request_items(*, item:items(*)), request_images(*)"
+)
+
+
+async def _fetch_by_request(supabase: AsyncClient, table: str, select: str, request_ids: List[str]) -> dict:
+    result = await supabase.table(table).select(select).in_("request_id", request_ids).execute()
+    rows_by_request = {request_id: [] for request_id in request_ids}
+    for row in result.data or []:
+        rows_by_request[row["request_id"]].append(row)
+    return rows_by_request
+
+
+async def attach_items_and_images(
+    supabase: AsyncClient,
+    requests: List[dict],
+    include_items: bool = True,
+    include_images: bool = True
+) -> None:
+    """Load items and images for a page of requests in (at most) two batch queries and stitch them in place"""
+    if not requests:
+        return
+
+    request_ids = [request["id"] for request in requests]
+
+    lookups = {}
+    if include_items:
+        lookups["items"] = _fetch_by_request(supabase, "request_items", "*, item:items(*)", request_ids)
+    if include_images:
+        lookups["images"] = _fetch_by_request(supabase, "request_images", "*", request_ids)
+
+    results = await asyncio.gather(*lookups.values())
+    for key, rows_by_request in zip(lookups, results):
+        for request in requests:
+            request[key] = rows_by_request[request["id"]]
+
+
+async def fetch_request_embedded(supabase: AsyncClient, request_id: str) -> Optional[dict]:
+    """Fetch a fully hydrated request in a single round-trip"""
+    result = await supabase.table("requests").select(
+        REQUEST_DETAIL_SELECT
+    ).eq("id", request_id).execute()
+
+    if not result.data:
+        return None
+
+    request_data = result.data[0]
+    request_data["items"] = request_data.pop("request_items", None) or []
+    request_data["images"] = request_data.pop("request_images", None) or []
+    return request_data
+
+
+async def fetch_request_parallel(supabase: AsyncClient, request_id: str) -> Optional[dict]:
+    """Fetch a hydrated request with concurrent lookups (fallback when embedding is not possible)"""
+    request_result, items_result, images_result = await asyncio.gather(
+        supabase.table("requests").select("*").eq("id", request_id).execute(),
+        supabase.table("request_items").select(
+            "*, item:items(*)"
+        ).eq("request_id", request_id).execute(),
+        supabase.table("request_images").select("*").eq("request_id", request_id).execute()
+    )
+
+    if not request_result.data:
+        return None
+
+    request_data = request_result.data[0]
+
+    # Worker and construction site depend on the request row
+    worker_result, baustelle_result = await asyncio.gather(
+        supabase.table("profiles").select("*").eq("id", request_data["worker_id"]).execute(),
+        supabase.table("baustellen").select("*").eq("id", request_data["baustelle_id"]).execute()
+    )
+
+    request_data["items"] = items_result.data if items_result.data else []
+    request_data["worker"] = worker_result.data[0] if worker_result.data else None
+    request_data["baustelle"] = baustelle_result.data[0] if baustelle_result.data else None
+    request_data["images"] = images_result.data if images_result.data else []
+    return request_data
+
 
 @router.get("/", response_model=List[RequestWithDetails])
 async def get_requests(
+    response: Response,
     status_filter: Optional[str] = Query(None, alias="status", description="Filter by status"),
     baustelle_id: Optional[str] = Query(None, description="Filter by baustelle"),
     worker_id: Optional[str] = Query(None, description="Filter by worker"),
     priority: Optional[str] = Query(None, description="Filter by priority"),
-    limit: int = Query(100, description="Limit number of results"),
-    offset: int = Query(0, description="Offset for pagination"),
-    supabase: Client = Depends(get_supabase)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Limit number of results"),
+    offset: int = Query(0, description="Offset for pagination (deprecated, use cursor; not combinable with cursor)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: FieldSelection = Depends(),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Get request list"""
     try:
-        query = supabase.table("requests").select("*, worker:profiles!worker_id(*), baustelle:baustellen!baustelle_id(*)").order("created_at", desc=True)
+        select, shape = fields.resolve(
+            RequestWithDetails,
+            default="*, worker:profiles!worker_id(*), baustelle:baustellen!baustelle_id(*)",
+            required=("id", "created_at"),
+            embeds={"worker": "worker:profiles!worker_id", "baustelle": "baustelle:baustellen!baustelle_id"},
+            computed=("items", "images")
+        )
+        query = supabase.table("requests").select(select)
 
         if status_filter:
             query = query.eq("status", status_filter)
@@ -37,25 +133,35 @@ async def get_requests(
         if priority:
             query = query.eq("priority", priority)
 
-        query = query.range(offset, offset + limit - 1)
-
-        result = query.execute()
-
-        # Enrich each request with items and images
-        requests = result.data
-        for request in requests:
-            # Get request items
-            items_result = supabase.table("request_items").select(
-                "*, item:items(*)"
-            ).eq("request_id", request["id"]).execute()
-            request["items"] = items_result.data if items_result.data else []
+        if offset and cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="offset cannot be combined with cursor"
+            )
 
-            # Get request images
-            images_result = supabase.table("request_images").select("*").eq("request_id", request["id"]).execute()
-            request["images"] = images_result.data if images_result.data else []
+        if offset:
+            # Legacy offset paging: no X-Next-Cursor, the client keeps paging by offset
+            result = await query.order("created_at", desc=True).order("id", desc=True).range(
+                offset, offset + limit - 1
+            ).execute()
+            requests = result.data
+        else:
+            page = PageParams(cursor=cursor, limit=limit)
+            result = await paginate(query, page, "created_at", desc=True).execute()
+            requests = finish_page(result.data, page, "created_at", response)
+
+        # Enrich the whole page with items and images (two batch queries, skipped when not selected)
+        await attach_items_and_images(
+            supabase,
+            requests,
+            include_items=shape is None or "items" in shape,
+            include_images=shape is None or "images" in shape
+        )
 
-        return requests
+        return fast_json(requests, RequestWithDetails, response, shape)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -66,41 +172,24 @@ async def get_requests(
 @router.get("/{request_id}", response_model=RequestWithDetails)
 async def get_request(
     request_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Get request details (including items, worker, construction site info, images)"""
     try:
-        # Get basic request information
-        request_result = supabase.table("requests").select("*").eq("id", request_id).execute()
-
-        if not request_result.data:
+        try:
+            request_data = await fetch_request_embedded(supabase, request_id)
+        except APIError as e:
+            # Relationship embedding unavailable (PGRST2xx): fall back to parallel lookups
+            if not str(e.code or "").startswith("PGRST2"):
+                raise
+            request_data = await fetch_request_parallel(supabase, request_id)
+
+        if not request_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Request not found"
             )
 
-        request_data = request_result.data[0]
-
-        # Get request items
-        items_result = supabase.table("request_items").select(
-            "*, item:items(*)"
-        ).eq("request_id", request_id).execute()
-
-        # Get worker information
-        worker_result = supabase.table("profiles").select("*").eq("id", request_data["worker_id"]).execute()
-
-        # Get construction site information
-        baustelle_result = supabase.table("baustellen").select("*").eq("id", request_data["baustelle_id"]).execute()
-
-        # Get images
-        images_result = supabase.table("request_images").select("*").eq("request_id", request_id).execute()
-
-        # Assemble data
-        request_data["items"] = items_result.data if items_result.data else []
-        request_data["worker"] = worker_result.data[0] if worker_result.data else None
-        request_data["baustelle"] = baustelle_result.data[0] if baustelle_result.data else None
-        request_data["images"] = images_result.data if images_result.data else []
-
         return request_data
 
     except HTTPException:
@@ -116,7 +205,7 @@ async def get_request(
 async def create_request(
     request: RequestCreate,
     worker_id: str = Query(..., description="Worker ID creating the request"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Create new request"""
     try:
@@ -128,7 +217,7 @@ async def create_request(
         if request_data.get("needed_date"):
             request_data["needed_date"] = str(request_data["needed_date"])
 
-        result = supabase.table("requests").insert(request_data).execute()
+        result = await supabase.table("requests").insert(request_data).execute()
 
         if not result.data:
             raise HTTPException(
@@ -147,7 +236,7 @@ async def create_request(
             items_data.append(item_dict)
 
         if items_data:
-            supabase.table("request_items").insert(items_data).execute()
+            await supabase.table("request_items").insert(items_data).execute()
 
         return result.data[0]
 
@@ -165,7 +254,7 @@ async def update_request(
     request_id: str,
     request: RequestUpdate,
     confirmed_by: Optional[str] = Query(None, description="User ID confirming the request"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Update request status (warehouse and admin only)"""
     try:
@@ -184,7 +273,7 @@ async def update_request(
         if "needed_date" in update_data and update_data["needed_date"]:
             update_data["needed_date"] = str(update_data["needed_date"])
 
-        result = supabase.table("requests").update(update_data).eq("id", request_id).execute()
+        result = await supabase.table("requests").update(update_data).eq("id", request_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -206,11 +295,11 @@ async def update_request(
 @router.delete("/{request_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_request(
     request_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Cancel request"""
     try:
-        result = supabase.table("requests").update({
+        result = await supabase.table("requests").update({
             "status": "cancelled"
         }).eq("id", request_id).execute()
 
@@ -234,11 +323,11 @@ async def cancel_request(
 @router.get("/{request_id}/history", response_model=List[RequestHistory])
 async def get_request_history(
     request_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Get request status change history"""
     try:
-        result = supabase.table("request_history").select(
+        result = await supabase.table("request_history").select(
             "*"
         ).eq("request_id", request_id).order("created_at", desc=True).execute()
 
@@ -255,14 +344,14 @@ async def get_request_history(
 async def add_request_item(
     request_id: str,
     item: dict,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Add item to request"""
     try:
         item["request_id"] = request_id
         item["quantity"] = str(item["quantity"])
 
-        result = supabase.table("request_items").insert(item).execute()
+        result = await supabase.table("request_items").insert(item).execute()
 
         if not result.data:
             raise HTTPException(
@@ -283,11 +372,11 @@ async def add_request_item(
 async def remove_request_item(
     request_id: str,
     item_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Remove item from request"""
     try:
-        result = supabase.table("request_items").delete().eq("id", item_id).eq("request_id", request_id).execute()
+        result = await supabase.table("request_items").delete().eq("id", item_id).eq("request_id", request_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.pagination import PageParams, paginate, finish_page
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -38,9 +39,11 @@ class ReturnRequest(BaseModel):
 
 @router.get("/", response_model=List[ReturnRequest])
 async def get_returns(
+    response: Response,
     worker_id: Optional[str] = None,
     status: Optional[str] = None,
-    supabase: Client = Depends(get_supabase)
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取退货申请列表"""
     query = supabase.table("return_requests").select("""
@@ -55,10 +58,10 @@ async def get_returns(
     if status:
         query = query.eq("status", status)
 
-    result = query.order("created_at", desc=True).execute()
+    result = await paginate(query, page, "created_at", desc=True).execute()
 
     returns = []
-    for item in result.data:
+    for item in finish_page(result.data, page, "created_at", response):
         returns.append({
             **item,
             "worker_name": item.get("worker", {}).get("full_name"),
@@ -71,11 +74,11 @@ async def get_returns(
 @router.get("/{return_id}", response_model=ReturnRequest)
 async def get_return(
     return_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取退货申请详情"""
     # 获取退货申请
-    result = supabase.table("return_requests").select("""
+    result = await supabase.table("return_requests").select("""
         *,
         worker:profiles!return_requests_worker_id_fkey(full_name),
         project:projects(name),
@@ -86,7 +89,7 @@ async def get_return(
         raise HTTPException(status_code=404, detail="Return request not found")
 
     # 获取退货明细
-    items_result = supabase.table("return_items").select("""
+    items_result = await supabase.table("return_items").select("""
         *,
         item:items(id, name, unit, barcode)
     """).eq("return_request_id", return_id).execute()
@@ -104,11 +107,11 @@ async def get_return(
 async def create_return(
     return_request: ReturnRequestCreate,
     worker_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建退货申请"""
     # 生成退货单号
-    number_result = supabase.rpc("generate_return_number").execute()
+    number_result = await supabase.rpc("generate_return_number").execute()
     request_number = number_result.data
 
     # 创建退货申请
@@ -121,7 +124,7 @@ async def create_return(
         "status": "pending"
     }
 
-    result = supabase.table("return_requests").insert(request_data).execute()
+    result = await supabase.table("return_requests").insert(request_data).execute()
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create return request")
@@ -137,7 +140,7 @@ async def create_return(
         for item in return_request.items
     ]
 
-    supabase.table("return_items").insert(items_data).execute()
+    await supabase.table("return_items").insert(items_data).execute()
 
     return await get_return(return_id, supabase)
 
@@ -145,7 +148,7 @@ async def create_return(
 async def approve_return(
     return_id: str,
     approved_by: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """批准退货申请"""
     update_data = {
@@ -154,7 +157,7 @@ async def approve_return(
         "approved_at": datetime.now().isoformat()
     }
 
-    result = supabase.table("return_requests").update(update_data).eq("id", return_id).execute()
+    result = await supabase.table("return_requests").update(update_data).eq("id", return_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Return request not found")
@@ -168,7 +171,7 @@ async def reject_return(
     return_id: str,
     approved_by: str,
     notes: Optional[str] = None,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """拒绝退货申请"""
     update_data = {
@@ -180,7 +183,7 @@ async def reject_return(
     if notes:
         update_data["notes"] = notes
 
-    result = supabase.table("return_requests").update(update_data).eq("id", return_id).execute()
+    result = await supabase.table("return_requests").update(update_data).eq("id", return_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Return request not found")
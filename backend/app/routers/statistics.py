@@ -1,56 +1,136 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from supabase import AsyncClient
 from app.database import get_supabase
 from app.models import DashboardStats, MonthlyStats, MaterialUsageStats, Item
-from typing import Optional
+from postgrest.exceptions import APIError
+from typing import List, Optional
 from datetime import datetime, timedelta
 from decimal import Decimal
+import asyncio
 
 router = APIRouter(prefix="/statistics", tags=["Statistics"])
 
+# in_() 过滤每批的 ID 数量，避免 URL 超长
+IN_FILTER_CHUNK_SIZE = 200
+
+
+async def fetch_material_usage(
+    supabase: AsyncClient,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    date_to_inclusive: bool = True,
+    item_type: Optional[str] = None
+) -> List[dict]:
+    """按物品汇总已完成申请的使用量，按总数量降序（数据库函数 material_usage_stats）"""
+    try:
+        result = await supabase.rpc("material_usage_stats", {
+            "date_from": date_from,
+            "date_to": date_to,
+            "date_to_inclusive": date_to_inclusive,
+            "filter_type": item_type
+        }).execute()
+    except APIError as e:
+        # 数据库函数未部署 (PGRST202) 时退回到 Python 汇总
+        if e.code != "PGRST202":
+            raise
+        return await fetch_material_usage_fallback(supabase, date_from, date_to, date_to_inclusive, item_type)
+
+    return [
+        {
+            "item_id": row["item_id"],
+            "item_name": row["item_name"],
+            "total_quantity": float(row["total_quantity"]),
+            "unit": row["unit"],
+            "request_count": row["request_count"]
+        }
+        for row in result.data or []
+    ]
+
+
+async def fetch_material_usage_fallback(
+    supabase: AsyncClient,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    date_to_inclusive: bool = True,
+    item_type: Optional[str] = None
+) -> List[dict]:
+    """fetch_material_usage 的 Python 实现（未部署 statistics_functions.sql 时使用）"""
+    query = supabase.table("requests").select("id").eq("status", "completed")
+
+    if date_from:
+        query = query.gte("created_at", date_from)
+    if date_to:
+        query = query.lte("created_at", date_to) if date_to_inclusive else query.lt("created_at", date_to)
+
+    requests_result = await query.execute()
+
+    if not requests_result.data:
+        return []
+
+    request_ids = [req["id"] for req in requests_result.data]
+
+    # 分批获取申请单物品
+    chunks = [
+        request_ids[i:i + IN_FILTER_CHUNK_SIZE]
+        for i in range(0, len(request_ids), IN_FILTER_CHUNK_SIZE)
+    ]
+    items_results = await asyncio.gather(*[
+        supabase.table("request_items").select(
+            "item_id, quantity, unit, items(name, type)"
+        ).in_("request_id", chunk).execute()
+        for chunk in chunks
+    ])
+
+    # 按物品汇总
+    usage_dict = {}
+    for items_result in items_results:
+        for item in items_result.data or []:
+            item_id = item["item_id"]
+            item_data = item.get("items") or {}
+            item_name = item_data.get("name", "Unknown")
+            item_type_value = item_data.get("type", "")
+
+            # 类型过滤
+            if item_type and item_type_value != item_type:
+                continue
+
+            quantity = float(item["quantity"])
+            unit = item["unit"]
+
+            if item_id in usage_dict:
+                usage_dict[item_id]["total_quantity"] += quantity
+                usage_dict[item_id]["request_count"] += 1
+            else:
+                usage_dict[item_id] = {
+                    "item_id": item_id,
+                    "item_name": item_name,
+                    "total_quantity": quantity,
+                    "unit": unit,
+                    "request_count": 1
+                }
+
+    return sorted(
+        usage_dict.values(),
+        key=lambda x: x["total_quantity"],
+        reverse=True
+    )
+
 
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
-    """获取仪表板统计数据"""
+    """获取仪表板统计数据（计数表 + 低库存物料，见 database/dashboard_counters.sql）"""
     try:
-        today = datetime.now().date()
-
-        # 总申请数
-        total_requests = supabase.table("requests").select("id", count="exact").execute()
-
-        # 待处理申请
-        pending_requests = supabase.table("requests").select(
-            "id", count="exact"
-        ).eq("status", "pending").execute()
-
-        # 进行中的申请（已确认、准备中、已准备完成、已发货）
-        in_progress_requests = supabase.table("requests").select(
-            "id", count="exact"
-        ).in_("status", ["confirmed", "preparing", "ready", "shipped"]).execute()
-
-        # 今日完成
-        completed_today = supabase.table("requests").select(
-            "id", count="exact"
-        ).eq("status", "completed").gte("completed_at", str(today)).execute()
-
-        # 低库存物品
-        items_result = supabase.table("items").select("*").eq("is_active", True).execute()
-        low_stock_items = []
-        if items_result.data:
-            for item in items_result.data:
-                stock = float(item.get("stock_quantity", 0))
-                min_level = float(item.get("min_stock_level", 0))
-                if stock <= min_level:
-                    low_stock_items.append(item)
+        result = await supabase.rpc("get_dashboard_stats").execute()
+        stats = result.data or {}
 
         return {
-            "total_requests": total_requests.count or 0,
-            "pending_requests": pending_requests.count or 0,
-            "in_progress_requests": in_progress_requests.count or 0,
-            "completed_today": completed_today.count or 0,
-            "low_stock_items": low_stock_items
+            "total_requests": stats.get("total_requests") or 0,
+            "pending_requests": stats.get("pending_requests") or 0,
+            "in_progress_requests": stats.get("in_progress_requests") or 0,
+            "completed_today": stats.get("completed_today") or 0,
+            "low_stock_items": stats.get("low_stock_items") or []
         }
 
     except Exception as e:
@@ -64,7 +144,7 @@ async def get_dashboard_stats(
 async def get_monthly_stats(
     year: int = Query(..., description="Year"),
     month: int = Query(..., description="Month (1-12)"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取月度统计数据"""
     try:
@@ -75,58 +155,25 @@ async def get_monthly_stats(
         else:
             end_date = datetime(year, month + 1, 1)
 
-        # 总申请数
-        total_requests = supabase.table("requests").select(
-            "id", count="exact"
-        ).gte("created_at", start_date.isoformat()).lt("created_at", end_date.isoformat()).execute()
-
-        # 待处理申请
-        pending_requests = supabase.table("requests").select(
-            "id", count="exact"
-        ).eq("status", "pending").gte("created_at", start_date.isoformat()).lt("created_at", end_date.isoformat()).execute()
-
-        # 已完成申请
-        completed_requests = supabase.table("requests").select(
-            "id", count="exact"
-        ).eq("status", "completed").gte("created_at", start_date.isoformat()).lt("created_at", end_date.isoformat()).execute()
-
-        # 材料使用统计
-        # 获取该月份所有已完成的申请
-        requests_result = supabase.table("requests").select(
-            "id"
-        ).eq("status", "completed").gte("created_at", start_date.isoformat()).lt("created_at", end_date.isoformat()).execute()
-
-        material_usage = []
-        if requests_result.data:
-            request_ids = [req["id"] for req in requests_result.data]
-
-            # 获取这些申请的所有物品
-            items_result = supabase.table("request_items").select(
-                "item_id, quantity, unit, items(name)"
-            ).in_("request_id", request_ids).execute()
-
-            # 按物品汇总
-            usage_dict = {}
-            if items_result.data:
-                for item in items_result.data:
-                    item_id = item["item_id"]
-                    item_name = item["items"]["name"] if item.get("items") else "Unknown"
-                    quantity = float(item["quantity"])
-                    unit = item["unit"]
-
-                    if item_id in usage_dict:
-                        usage_dict[item_id]["total_quantity"] += quantity
-                        usage_dict[item_id]["request_count"] += 1
-                    else:
-                        usage_dict[item_id] = {
-                            "item_id": item_id,
-                            "item_name": item_name,
-                            "total_quantity": quantity,
-                            "unit": unit,
-                            "request_count": 1
-                        }
-
-            material_usage = list(usage_dict.values())
+        start_at = start_date.isoformat()
+        end_at = end_date.isoformat()
+
+        total_requests, pending_requests, completed_requests, material_usage = await asyncio.gather(
+            # 总申请数
+            supabase.table("requests").select(
+                "id", count="exact"
+            ).gte("created_at", start_at).lt("created_at", end_at).execute(),
+            # 待处理申请
+            supabase.table("requests").select(
+                "id", count="exact"
+            ).eq("status", "pending").gte("created_at", start_at).lt("created_at", end_at).execute(),
+            # 已完成申请
+            supabase.table("requests").select(
+                "id", count="exact"
+            ).eq("status", "completed").gte("created_at", start_at).lt("created_at", end_at).execute(),
+            # 材料使用统计
+            fetch_material_usage(supabase, start_at, end_at, date_to_inclusive=False)
+        )
 
         return {
             "total_requests": total_requests.count or 0,
@@ -147,66 +194,11 @@ async def get_material_usage(
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     item_type: Optional[str] = Query(None, description="Filter by type: material or maschine"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取材料/设备使用统计"""
     try:
-        # 构建查询
-        query = supabase.table("requests").select("id").eq("status", "completed")
-
-        if start_date:
-            query = query.gte("created_at", start_date)
-        if end_date:
-            query = query.lte("created_at", end_date)
-
-        requests_result = query.execute()
-
-        if not requests_result.data:
-            return {"material_usage": []}
-
-        request_ids = [req["id"] for req in requests_result.data]
-
-        # 获取申请单物品
-        items_query = supabase.table("request_items").select(
-            "item_id, quantity, unit, items(name, type)"
-        ).in_("request_id", request_ids)
-
-        items_result = items_query.execute()
-
-        # 按物品汇总
-        usage_dict = {}
-        if items_result.data:
-            for item in items_result.data:
-                item_id = item["item_id"]
-                item_data = item.get("items", {})
-                item_name = item_data.get("name", "Unknown")
-                item_type_value = item_data.get("type", "")
-
-                # 类型过滤
-                if item_type and item_type_value != item_type:
-                    continue
-
-                quantity = float(item["quantity"])
-                unit = item["unit"]
-
-                if item_id in usage_dict:
-                    usage_dict[item_id]["total_quantity"] += quantity
-                    usage_dict[item_id]["request_count"] += 1
-                else:
-                    usage_dict[item_id] = {
-                        "item_id": item_id,
-                        "item_name": item_name,
-                        "total_quantity": quantity,
-                        "unit": unit,
-                        "request_count": 1
-                    }
-
-        material_usage = sorted(
-            usage_dict.values(),
-            key=lambda x: x["total_quantity"],
-            reverse=True
-        )
-
+        material_usage = await fetch_material_usage(supabase, start_date, end_date, item_type=item_type)
         return {"material_usage": material_usage}
 
     except Exception as e:
@@ -221,42 +213,46 @@ async def get_baustelle_stats(
     baustelle_id: str = Query(..., description="Baustelle ID"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取指定工地的统计数据"""
     try:
-        query = supabase.table("requests").select("*").eq("baustelle_id", baustelle_id)
-
-        if start_date:
-            query = query.gte("created_at", start_date)
-        if end_date:
-            query = query.lte("created_at", end_date)
-
-        result = query.execute()
-
-        if not result.data:
-            return {
-                "total_requests": 0,
-                "by_status": {},
-                "by_priority": {}
-            }
-
-        requests = result.data
-
-        # 按状态统计
+        try:
+            result = await supabase.rpc("baustelle_request_stats", {
+                "site_id": baustelle_id,
+                "date_from": start_date,
+                "date_to": end_date
+            }).execute()
+            groups = result.data or []
+        except APIError as e:
+            # 数据库函数未部署 (PGRST202) 时只读取 status/priority 两列在 Python 中计数
+            if e.code != "PGRST202":
+                raise
+            query = supabase.table("requests").select("status, priority").eq("baustelle_id", baustelle_id)
+
+            if start_date:
+                query = query.gte("created_at", start_date)
+            if end_date:
+                query = query.lte("created_at", end_date)
+
+            result = await query.execute()
+            groups = [
+                {"status": req["status"], "priority": req["priority"], "request_count": 1}
+                for req in result.data or []
+            ]
+
+        # 按状态和优先级汇总
+        total_requests = 0
         by_status = {}
-        for req in requests:
-            status = req["status"]
-            by_status[status] = by_status.get(status, 0) + 1
-
-        # 按优先级统计
         by_priority = {}
-        for req in requests:
-            priority = req["priority"]
-            by_priority[priority] = by_priority.get(priority, 0) + 1
+        for group in groups:
+            count = group["request_count"]
+            total_requests += count
+            by_status[group["status"]] = by_status.get(group["status"], 0) + count
+            by_priority[group["priority"]] = by_priority.get(group["priority"], 0) + count
 
         return {
-            "total_requests": len(requests),
+            "total_requests": total_requests,
             "by_status": by_status,
             "by_priority": by_priority
         }
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from supabase import AsyncClient
 from app.database import get_supabase
 from pydantic import BaseModel
 from typing import Optional, List
@@ -33,7 +33,7 @@ class Subcontractor(SubcontractorBase):
 @router.get("/", response_model=List[Subcontractor])
 async def get_subcontractors(
     is_active: Optional[bool] = None,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取Sub承包商列表"""
     query = supabase.table("subcontractors").select("*")
@@ -41,16 +41,16 @@ async def get_subcontractors(
     if is_active is not None:
         query = query.eq("is_active", is_active)
 
-    result = query.order("created_at", desc=True).execute()
+    result = await query.order("created_at", desc=True).execute()
     return result.data
 
 @router.get("/{subcontractor_id}", response_model=Subcontractor)
 async def get_subcontractor(
     subcontractor_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取单个Sub承包商"""
-    result = supabase.table("subcontractors").select("*").eq("id", subcontractor_id).single().execute()
+    result = await supabase.table("subcontractors").select("*").eq("id", subcontractor_id).single().execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Subcontractor not found")
@@ -60,10 +60,10 @@ async def get_subcontractor(
 @router.post("/", response_model=Subcontractor, status_code=201)
 async def create_subcontractor(
     subcontractor: SubcontractorCreate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建新Sub承包商"""
-    result = supabase.table("subcontractors").insert(subcontractor.model_dump()).execute()
+    result = await supabase.table("subcontractors").insert(subcontractor.model_dump()).execute()
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create subcontractor")
@@ -74,7 +74,7 @@ async def create_subcontractor(
 async def update_subcontractor(
     subcontractor_id: str,
     subcontractor: SubcontractorUpdate,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """更新Sub承包商信息"""
     update_data = {k: v for k, v in subcontractor.model_dump().items() if v is not None}
@@ -82,7 +82,7 @@ async def update_subcontractor(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = supabase.table("subcontractors").update(update_data).eq("id", subcontractor_id).execute()
+    result = await supabase.table("subcontractors").update(update_data).eq("id", subcontractor_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Subcontractor not found")
@@ -92,10 +92,10 @@ async def update_subcontractor(
 @router.delete("/{subcontractor_id}")
 async def delete_subcontractor(
     subcontractor_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """删除Sub承包商（软删除）"""
-    result = supabase.table("subcontractors").update({"is_active": False}).eq("id", subcontractor_id).execute()
+    result = await supabase.table("subcontractors").update({"is_active": False}).eq("id", subcontractor_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Subcontractor not found")
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Response
+from supabase import AsyncClient
 from app.database import get_supabase
+from app.pagination import PageParams, paginate, finish_page
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -39,10 +40,12 @@ class Transfer(BaseModel):
 
 @router.get("/", response_model=List[Transfer])
 async def get_transfers(
+    response: Response,
     status: Optional[str] = None,
     from_project_id: Optional[str] = None,
     to_project_id: Optional[str] = None,
-    supabase: Client = Depends(get_supabase)
+    page: PageParams = Depends(),
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取材料转移列表"""
     query = supabase.table("material_transfers").select("""
@@ -60,10 +63,10 @@ async def get_transfers(
     if to_project_id:
         query = query.eq("to_project_id", to_project_id)
 
-    result = query.order("created_at", desc=True).execute()
+    result = await paginate(query, page, "created_at", desc=True).execute()
 
     transfers = []
-    for item in result.data:
+    for item in finish_page(result.data, page, "created_at", response):
         transfers.append({
             **item,
             "from_project_name": item.get("from_project", {}).get("name"),
@@ -77,10 +80,10 @@ async def get_transfers(
 @router.get("/{transfer_id}", response_model=Transfer)
 async def get_transfer(
     transfer_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """获取材料转移详情"""
-    result = supabase.table("material_transfers").select("""
+    result = await supabase.table("material_transfers").select("""
         *,
         from_project:projects!material_transfers_from_project_id_fkey(name),
         to_project:projects!material_transfers_to_project_id_fkey(name),
@@ -92,7 +95,7 @@ async def get_transfer(
         raise HTTPException(status_code=404, detail="Transfer not found")
 
     # 获取转移明细
-    items_result = supabase.table("transfer_items").select("""
+    items_result = await supabase.table("transfer_items").select("""
         *,
         item:items(id, name, unit, barcode)
     """).eq("transfer_id", transfer_id).execute()
@@ -111,11 +114,11 @@ async def get_transfer(
 async def create_transfer(
     transfer: TransferCreate,
     operator_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """创建材料转移"""
     # 生成转移单号
-    number_result = supabase.rpc("generate_transfer_number").execute()
+    number_result = await supabase.rpc("generate_transfer_number").execute()
     transfer_number = number_result.data
 
     # 创建转移申请
@@ -128,7 +131,7 @@ async def create_transfer(
         "status": "pending"
     }
 
-    result = supabase.table("material_transfers").insert(transfer_data).execute()
+    result = await supabase.table("material_transfers").insert(transfer_data).execute()
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create transfer")
@@ -144,7 +147,7 @@ async def create_transfer(
         for item in transfer.items
     ]
 
-    supabase.table("transfer_items").insert(items_data).execute()
+    await supabase.table("transfer_items").insert(items_data).execute()
 
     return await get_transfer(transfer_id, supabase)
 
@@ -152,7 +155,7 @@ async def create_transfer(
 async def approve_transfer(
     transfer_id: str,
     bauleiter_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """Bauleiter批准材料转移"""
     update_data = {
@@ -162,7 +165,7 @@ async def approve_transfer(
         "approved_at": datetime.now().isoformat()
     }
 
-    result = supabase.table("material_transfers").update(update_data).eq("id", transfer_id).execute()
+    result = await supabase.table("material_transfers").update(update_data).eq("id", transfer_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Transfer not found")
@@ -173,7 +176,7 @@ async def approve_transfer(
 async def complete_transfer(
     transfer_id: str,
     operator_id: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: AsyncClient = Depends(get_supabase)
 ):
     """完成材料转移"""
     update_data = {
@@ -181,7 +184,7 @@ async def complete_transfer(
         "completed_at": datetime.now().isoformat()
     }
 
-    result = supabase.table("material_transfers").update(update_data).eq("id", transfer_id).execute()
+    result = await supabase.table("material_transfers").update(update_data).eq("id", transfer_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Transfer not found")
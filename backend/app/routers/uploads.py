@@ -1,9 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from ..database import get_supabase, get_supabase_admin
-import uuid
-from typing import List, Optional
+from ..database import get_supabase
+from ..config import settings
+from ..middleware import etag_matches
+from ..services.image_objects import image_object_registry, object_path
+from ..services.image_processing import DEFAULT_RENDITIONS, rendition_prefix, save_renditions
+from ..services.storage import StorageBackend, LocalStorageBackend, get_storage
+import asyncio
+import hashlib
+import mimetypes
+import os
+import stat
+from typing import BinaryIO, List, Optional, Tuple
 import base64
 from datetime import datetime
 
@@ -12,6 +22,11 @@ router = APIRouter(prefix="/api/uploads", tags=["uploads"])
 # 允许的图片格式
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_CHUNK_SIZE = 256 * 1024  # 每次读取 256KB
+
+
+class FileTooLargeError(Exception):
+    """上传文件超过大小限制"""
 
 def get_file_extension(filename: str) -> str:
     """获取文件扩展名"""
@@ -21,13 +36,91 @@ def is_allowed_file(filename: str) -> bool:
     """检查文件类型是否允许"""
     return get_file_extension(filename) in ALLOWED_EXTENSIONS
 
+def hash_upload(file: BinaryIO, max_size: int = MAX_FILE_SIZE) -> Tuple[str, int]:
+    """分块计算文件的 SHA-256，超过 max_size 时立即抛出 FileTooLargeError"""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while True:
+        chunk = file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise FileTooLargeError()
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+async def store_upload(storage: StorageBackend, file: UploadFile, folder: str = "") -> dict:
+    """
+    按内容哈希保存上传文件，相同内容只存储一次
+    返回 {"url", "path", "size", "content_hash", "renditions"}（renditions 为已生成的图片版本）
+    """
+    # multipart 解析时已知大小的文件直接拒绝
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise FileTooLargeError(file.filename)
+
+    content_hash, size = await run_in_threadpool(hash_upload, file.file)
+    content_type = file.content_type or "image/jpeg"
+    storage_path = object_path(folder, content_hash, get_file_extension(file.filename))
+
+    async def save(path: str) -> None:
+        await storage.save_file(path, file.file, content_type)
+
+    # 登记时占用引用，直到客户端保存 request_images / item_images 之前文件都不会被删除；
+    # 已上传过的内容直接返回已有的文件
+    stored = await image_object_registry.store(
+        storage.storage_id, content_hash, storage_path, await storage.public_url(storage_path), size, content_type, save
+    )
+    return {
+        "url": stored["url"],
+        "path": stored["path"],
+        "size": stored["size"],
+        "content_hash": content_hash,
+        "renditions": stored["renditions"]
+    }
+
+def rendition_paths(path: str) -> List[str]:
+    """原图可能存在的所有版本文件（删除原图时一起删除）"""
+    prefix = rendition_prefix(path)
+    paths = []
+    for name in DEFAULT_RENDITIONS:
+        paths.append(f"{prefix}/{name}.jpg")
+        paths.append(f"{prefix}/{name}_webp.webp")
+    return paths
+
+def read_upload(file: BinaryIO) -> bytes:
+    file.seek(0)
+    return file.read()
+
+async def store_renditions(storage: StorageBackend, stored: dict, file: UploadFile, webp: bool = False) -> dict:
+    """
+    在进程池中生成图片的各个版本（缩略图、中图、原图）并同时保存；
+    相同内容之前已经生成过这些版本时直接返回，不再处理图片
+    返回 {版本: {"url", "path", "size", "width", "height"}}
+    """
+    names = [*DEFAULT_RENDITIONS, *(f"{name}_webp" for name in DEFAULT_RENDITIONS if webp)]
+    existing = stored["renditions"]
+    if all(name in existing for name in names):
+        return {name: existing[name] for name in names}
+
+    image_bytes = await run_in_threadpool(read_upload, file.file)
+    rendered = await save_renditions(image_bytes, stored["path"], storage.save, storage.public_url, webp=webp)
+    await image_object_registry.save_renditions(
+        storage.storage_id, stored["content_hash"], {**existing, **rendered}
+    )
+    return rendered
+
 @router.post("/image")
 async def upload_image(
     file: UploadFile = File(...),
-    db=Depends(get_supabase_admin)
+    renditions: bool = Query(False, description="Also store thumbnail/medium/full JPEG renditions"),
+    webp: bool = Query(False, description="Add WebP copies of the renditions")
 ):
     """
-    上传单个图片到 Supabase Storage
+    上传单个图片到存储后端（STORAGE_BACKEND）
+    renditions=true 时同时生成缩略图、中图和原图版本（只解码一次图片）
     """
     try:
         # 验证文件类型
@@ -37,45 +130,28 @@ async def upload_image(
                 detail=f"不支持的文件格式。允许的格式: {', '.join(ALLOWED_EXTENSIONS)}"
             )
 
-        # 读取文件内容
-        contents = await file.read()
-
-        # 验证文件大小
-        if len(contents) > MAX_FILE_SIZE:
+        # 上传到存储后端（按内容哈希命名，重复上传的图片不会再次写入）
+        # 注意：使用 Supabase 时需要先创建 "request-images" bucket
+        storage = get_storage("request-images")
+        try:
+            stored = await store_upload(storage, file, folder="request-images/")
+        except FileTooLargeError:
             raise HTTPException(
                 status_code=400,
                 detail=f"文件太大。最大允许 {MAX_FILE_SIZE / 1024 / 1024}MB"
             )
 
-        # 生成唯一文件名
-        file_ext = get_file_extension(file.filename)
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        storage_path = f"request-images/{unique_filename}"
-
-        # 上传到 Supabase Storage
-        # 注意：需要先在 Supabase 中创建 "request-images" bucket
-        result = db.storage.from_("request-images").upload(
-            storage_path,
-            contents,
-            {
-                "content-type": file.content_type or "image/jpeg",
-                "cache-control": "3600"
-            }
-        )
-
-        if hasattr(result, 'error') and result.error:
-            raise HTTPException(status_code=500, detail=f"上传失败: {result.error}")
-
-        # 获取公开 URL
-        public_url = db.storage.from_("request-images").get_public_url(storage_path)
-
-        return {
+        result = {
             "success": True,
-            "url": public_url,
+            "url": stored["url"],
             "filename": file.filename,
-            "size": len(contents),
-            "path": storage_path
+            "size": stored["size"],
+            "path": stored["path"]
         }
+        if renditions:
+            result["renditions"] = await store_renditions(storage, stored, file, webp)
+
+        return result
 
     except HTTPException:
         raise
@@ -83,91 +159,63 @@ async def upload_image(
         print(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
 
+async def upload_one_image(storage: StorageBackend, file: UploadFile, semaphore: asyncio.Semaphore) -> dict:
+    """读取并上传一个文件，返回上传结果或错误信息"""
+    # 验证文件类型
+    if not is_allowed_file(file.filename):
+        return {
+            "filename": file.filename,
+            "error": f"不支持的文件格式"
+        }
+
+    try:
+        # 上传到存储后端（限制同时写入的文件数）
+        try:
+            async with semaphore:
+                stored = await store_upload(storage, file)
+
+            return {
+                "url": stored["url"],
+                "filename": file.filename,
+                "size": stored["size"],
+                "path": stored["path"]
+            }
+        except FileTooLargeError:
+            return {
+                "filename": file.filename,
+                "error": f"文件太大"
+            }
+        except Exception as storage_error:
+            print(f"Storage exception for {file.filename}: {str(storage_error)}")
+            return {
+                "filename": file.filename,
+                "error": f"Storage exception: {str(storage_error)}"
+            }
+
+    except Exception as e:
+        print(f"General exception for {file.filename}: {str(e)}")
+        return {
+            "filename": file.filename,
+            "error": f"Exception: {str(e)}"
+        }
+
 @router.post("/images")
 async def upload_multiple_images(
-    files: List[UploadFile] = File(...),
-    db=Depends(get_supabase_admin)
+    files: List[UploadFile] = File(...)
 ):
     """
-    批量上传图片
+    批量上传图片（并发写入 Storage）
     """
     if len(files) > 5:
         raise HTTPException(status_code=400, detail="最多一次上传5张图片")
 
-    results = []
-    errors = []
+    storage = get_storage("request-images")
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    outcomes = await asyncio.gather(*(upload_one_image(storage, file, semaphore) for file in files))
 
-    for file in files:
-        try:
-            # 验证文件类型
-            if not is_allowed_file(file.filename):
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"不支持的文件格式"
-                })
-                continue
-
-            # 读取文件内容
-            contents = await file.read()
-
-            # 验证文件大小
-            if len(contents) > MAX_FILE_SIZE:
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"文件太大"
-                })
-                continue
-
-            # 生成唯一文件名
-            file_ext = get_file_extension(file.filename)
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            storage_path = f"{unique_filename}"  # 简化路径，不使用子文件夹
-
-            # 上传到 Supabase Storage
-            try:
-                result = db.storage.from_("request-images").upload(
-                    storage_path,
-                    contents,
-                    {
-                        "content-type": file.content_type or "image/jpeg",
-                        "cache-control": "3600",
-                        "upsert": "false"
-                    }
-                )
-
-                print(f"Upload result for {file.filename}: {result}")
-
-                if hasattr(result, 'error') and result.error:
-                    print(f"Upload error details: {result.error}")
-                    errors.append({
-                        "filename": file.filename,
-                        "error": f"Storage error: {str(result.error)}"
-                    })
-                    continue
-
-                # 获取公开 URL
-                public_url = db.storage.from_("request-images").get_public_url(storage_path)
-
-                results.append({
-                    "url": public_url,
-                    "filename": file.filename,
-                    "size": len(contents),
-                    "path": storage_path
-                })
-            except Exception as storage_error:
-                print(f"Storage exception for {file.filename}: {str(storage_error)}")
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"Storage exception: {str(storage_error)}"
-                })
-                continue
-
-        except Exception as e:
-            print(f"General exception for {file.filename}: {str(e)}")
-            errors.append({
-                "filename": file.filename,
-                "error": f"Exception: {str(e)}"
-            })
+    # 保持文件原来的顺序
+    results = [outcome for outcome in outcomes if "error" not in outcome]
+    errors = [outcome for outcome in outcomes if "error" in outcome]
 
     return {
         "success": len(results) > 0,
@@ -178,25 +226,136 @@ async def upload_multiple_images(
         "error_count": len(errors)
     }
 
+async def sweep_abandoned_uploads() -> int:
+    """
+    删除超过 IMAGE_CLAIM_TTL 仍没有被引用的图片（上传后放弃了表单）及其所有版本，
+    返回删除的对象数
+    """
+    deleted = 0
+    for bucket in settings.storage_buckets_list:
+        storage = get_storage(bucket)
+        objects = await image_object_registry.sweep(storage.storage_id)
+        if not objects:
+            continue
+        paths = []
+        for obj in objects:
+            paths.append(obj["path"])
+            paths.extend(rendition_paths(obj["path"]))
+            paths.extend(r["path"] for r in (obj.get("renditions") or {}).values() if r.get("path"))
+        await storage.delete(list(dict.fromkeys(paths)))
+        deleted += len(objects)
+    return deleted
+
 @router.delete("/image")
 async def delete_image(
-    path: str,
-    db=Depends(get_supabase_admin)
+    path: str
 ):
     """
     删除图片
     """
     try:
-        result = db.storage.from_("request-images").remove([path])
+        # 释放自己的登记；其他申请/物料仍在使用同一图片、或有其他正在进行的上传时只保留文件
+        storage = get_storage("request-images")
+        if not await image_object_registry.release(storage.storage_id, path):
+            return {"success": True, "deleted": False, "message": "图片仍在使用，已保留文件"}
 
-        if hasattr(result, 'error') and result.error:
-            raise HTTPException(status_code=500, detail=f"删除失败: {result.error}")
-
-        return {"success": True, "message": "图片已删除"}
+        await storage.delete([path, *rendition_paths(path)])
+        return {"success": True, "deleted": True, "message": "图片已删除"}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
 
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """解析单个 Range 头（bytes=start-end），无效时返回 None"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+        else:
+            # bytes=-N 表示最后 N 个字节
+            start = max(file_size - int(end_text), 0)
+            end = file_size - 1
+    except ValueError:
+        return None
+
+    end = min(end, file_size - 1)
+    if start > end:
+        return None
+    return start, end
+
+def iter_file_range(full_path: str, start: int, end: int):
+    """按块读取文件的一部分"""
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@router.get("/files/{bucket}/{path:path}")
+async def get_file(bucket: str, path: str, request: Request):
+    """
+    读取本地存储的文件（STORAGE_BACKEND=local），支持 ETag 和 Range
+    """
+    try:
+        storage = get_storage(bucket)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    if not isinstance(storage, LocalStorageBackend):
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    try:
+        full_path = storage.resolve(path)
+        stat_result = os.stat(full_path)
+    except (ValueError, OSError):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    # 目录等不是普通文件的路径
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    # 文件名唯一，内容不会变化，可以长期缓存
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "cache-control": "public, max-age=31536000, immutable"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = parse_range(range_header, stat_result.st_size)
+        if byte_range is None:
+            return Response(
+                status_code=416,
+                headers={"content-range": f"bytes */{stat_result.st_size}"}
+            )
+
+        start, end = byte_range
+        return StreamingResponse(
+            iter_file_range(full_path, start, end),
+            status_code=206,
+            media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+            headers={
+                **headers,
+                "content-range": f"bytes {start}-{end}/{stat_result.st_size}",
+                "content-length": str(end - start + 1)
+            }
+        )
+
+    return FileResponse(full_path, headers=headers, stat_result=stat_result)
+
 class ImageInfo(BaseModel):
     url: str
     filename: Optional[str] = None
@@ -229,7 +388,7 @@ async def save_request_images(
             })
 
         if image_records:
-            result = db.table("request_images").insert(image_records).execute()
+            result = await db.table("request_images").insert(image_records).execute()
 
             return {
                 "success": True,
@@ -2,14 +2,39 @@
 WMS (仓库管理系统) API路由
 包含库存管理、出入库操作、条码扫描等功能
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
+from uuid import UUID
+from postgrest.exceptions import APIError
+import asyncio
+import csv
+import io
 from ..database import get_supabase
+from ..services.reference_cache import reference_cache
+from ..services.search_index import material_search_index
+from ..fields import FieldSelection
+from ..models import Item
+from ..responses import fast_json, list_etag, not_modified
 
 router = APIRouter(prefix="/api/wms", tags=["wms"])
 
+TRANSACTION_TYPES = ("in", "out", "adjust", "initial")
+
+# apply_inventory_transaction 抛出的错误码: 22023 无效类型, 23514 库存不足
+TRANSACTION_ERROR_CODES = ("22023", "23514")
+
+# 批量初始化库存每次 RPC 处理的行数
+BULK_INIT_CHUNK_SIZE = 500
+BULK_INIT_NOTES = "初始盘点录入"
+# CSV 行的字段比表头多时，多出的值放在这个键下
+CSV_EXTRA_FIELDS_KEY = "__extra__"
+
+# 批量条码搜索每次最多的条码数量
+BARCODE_BATCH_MAX_SIZE = 200
+
 
 # ============ Pydantic 模型 ============
 
@@ -28,6 +53,17 @@ class StorageLocation(BaseModel):
     created_at: datetime
 
 
+class InventoryRecord(BaseModel):
+    id: str
+    item_id: str
+    location_id: str
+    quantity: float
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    items: Optional[Item] = None
+    storage_locations: Optional[StorageLocation] = None
+
+
 class InventoryCreate(BaseModel):
     item_id: str
     location_id: str
@@ -67,13 +103,26 @@ class InventoryTransaction(BaseModel):
     created_at: datetime
 
 
+class BulkInventoryEntry(BaseModel):
+    item_id: UUID
+    location_id: UUID
+    quantity: float
+    operator_id: UUID
+    notes: Optional[str] = None
+
+
 class BarcodeSearchResponse(BaseModel):
+    barcode: Optional[str] = None
     found: bool
     item: Optional[dict] = None
     current_stock: Optional[float] = None
     locations: Optional[List[dict]] = None
 
 
+class BarcodeBatchLookup(BaseModel):
+    barcodes: List[str]
+
+
 class PurchaseRequestCreate(BaseModel):
     item_id: str
     quantity: float
@@ -96,94 +145,186 @@ class PurchaseRequest(BaseModel):
 
 @router.get("/locations", response_model=List[StorageLocation])
 async def get_storage_locations(
+    request: Request,
+    response: Response,
     is_active: Optional[bool] = None,
     db=Depends(get_supabase)
 ):
-    """获取所有库位"""
-    query = db.table("storage_locations").select("*")
-    if is_active is not None:
-        query = query.eq("is_active", is_active)
-    result = query.order("name").execute()
-    return result.data
+    """获取所有库位（带缓存）"""
+    async def load_locations():
+        query = db.table("storage_locations").select("*")
+        if is_active is not None:
+            query = query.eq("is_active", is_active)
+        result = await query.order("name").execute()
+        return result.data
+
+    return await reference_cache.respond(
+        request, response, "storage_locations", {"is_active": is_active}, load_locations
+    )
 
 
 @router.post("/locations", response_model=StorageLocation)
 async def create_storage_location(location: StorageLocationCreate, db=Depends(get_supabase)):
     """创建新库位"""
-    result = db.table("storage_locations").insert(location.dict()).execute()
+    result = await db.table("storage_locations").insert(location.dict()).execute()
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create storage location")
+    await reference_cache.invalidate("storage_locations")
     return result.data[0]
 
 
 # ============ 条码扫描 API ============
 
-@router.get("/barcode/{barcode}", response_model=BarcodeSearchResponse)
-async def search_by_barcode(barcode: str, db=Depends(get_supabase)):
-    """通过条码搜索物料"""
-    # 查找物料
-    item_result = db.table("items").select("*").eq("barcode", barcode).execute()
+def _locations(inventory: List[dict]) -> List[dict]:
+    return [
+        {
+            "location_id": inv["location_id"],
+            "location_name": inv["storage_locations"]["name"] if inv.get("storage_locations") else None,
+            "quantity": inv["quantity"]
+        }
+        for inv in inventory or []
+    ]
+
+
+async def _lookup_indexed_stock(db, item_ids: List[str]) -> dict:
+    """索引命中的物料：只查询库存和库位，返回 {item_id: [库存行]}"""
+    if not item_ids:
+        return {}
+    result = (
+        await db.table("inventory")
+        .select("item_id, location_id, quantity, storage_locations(name)")
+        .in_("item_id", item_ids)
+        .execute()
+    )
+    stock = {item_id: [] for item_id in item_ids}
+    for row in result.data:
+        stock[row["item_id"]].append(row)
+    return stock
+
+
+async def _lookup_missing_barcodes(db, barcodes: List[str]) -> dict:
+    """索引中没有的条码：物料、库存和库位一次查询获取（条码有索引 idx_items_barcode）"""
+    if not barcodes:
+        return {}
+    result = (
+        await db.table("items")
+        .select("*, inventory(location_id, quantity, storage_locations(name))")
+        .in_("barcode", barcodes)
+        .execute()
+    )
+    items_by_barcode = {}
+    for row in result.data:
+        items_by_barcode.setdefault(row["barcode"], row)
+    return items_by_barcode
+
+
+async def resolve_barcodes(db, barcodes: List[str]) -> List[BarcodeSearchResponse]:
+    """
+    批量解析条码：物料来自材料搜索索引的条码表，只查询命中物料的库存和库位；
+    索引中没有的条码（新物料或索引尚未加载）再按条码查询数据库。两个查询并发执行
+    """
+    wanted = list(dict.fromkeys(barcodes))
+    indexed = material_search_index.lookup_barcodes(wanted)
+    missing = [barcode for barcode in wanted if barcode not in indexed]
+
+    stock_by_item, items_by_barcode = await asyncio.gather(
+        _lookup_indexed_stock(db, list(dict.fromkeys(item["id"] for item in indexed.values()))),
+        _lookup_missing_barcodes(db, missing)
+    )
 
-    if not item_result.data:
-        return BarcodeSearchResponse(found=False)
+    results = []
+    for barcode in barcodes:
+        if barcode in indexed:
+            item = indexed[barcode]
+            inventory = stock_by_item[item["id"]]
+            # current_stock 是各库位库存的合计（update_item_current_stock 触发器）
+            current_stock = sum(float(inv["quantity"] or 0) for inv in inventory)
+        elif barcode in items_by_barcode:
+            row = items_by_barcode[barcode]
+            item = {key: value for key, value in row.items() if key != "inventory"}
+            inventory = row.get("inventory")
+            current_stock = item.get("current_stock") or 0
+        else:
+            results.append(BarcodeSearchResponse(barcode=barcode, found=False))
+            continue
+
+        results.append(BarcodeSearchResponse(
+            barcode=barcode,
+            found=True,
+            item={**item, "current_stock": current_stock},
+            current_stock=current_stock,
+            locations=_locations(inventory)
+        ))
+
+    return results
 
-    item = item_result.data[0]
 
-    # 查找该物料的所有库存位置
-    inventory_result = (
-        db.table("inventory")
-        .select("*, storage_locations(*)")
-        .eq("item_id", item["id"])
-        .execute()
-    )
+@router.get("/barcode/{barcode}", response_model=BarcodeSearchResponse)
+async def search_by_barcode(barcode: str, db=Depends(get_supabase)):
+    """通过条码搜索物料"""
+    results = await resolve_barcodes(db, [barcode])
+    return results[0]
 
-    locations = []
-    for inv in inventory_result.data:
-        locations.append({
-            "location_id": inv["location_id"],
-            "location_name": inv["storage_locations"]["name"] if inv.get("storage_locations") else None,
-            "quantity": inv["quantity"]
-        })
 
-    return BarcodeSearchResponse(
-        found=True,
-        item=item,
-        current_stock=item.get("current_stock", 0),
-        locations=locations
-    )
+@router.post("/barcode/batch", response_model=List[BarcodeSearchResponse])
+async def search_by_barcodes(lookup: BarcodeBatchLookup, db=Depends(get_supabase)):
+    """批量条码搜索（入库时一次扫描整托盘标签），按请求顺序返回结果"""
+    if len(lookup.barcodes) > BARCODE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many barcodes (max {BARCODE_BATCH_MAX_SIZE})"
+        )
+    return await resolve_barcodes(db, lookup.barcodes)
 
 
 # ============ 库存查询 API ============
 
 @router.get("/inventory")
 async def get_inventory(
+    request: Request,
+    response: Response,
     item_id: Optional[str] = None,
     location_id: Optional[str] = None,
+    fields: FieldSelection = Depends(),
     db=Depends(get_supabase)
 ):
-    """获取库存信息"""
-    query = db.table("inventory").select("*, items(*), storage_locations(*)")
+    """
+    获取库存信息（fields=quantity,items.name,storage_locations.name 只返回需要的字段）
+    ETag 按库存、物料和库位的表版本计算，数据没有变化时返回 304，不执行列表查询
+    """
+    cached = not_modified(request, response, await list_etag(request, db, "inventory_list_version"))
+    if cached is not None:
+        return cached
+
+    select, shape = fields.resolve(
+        InventoryRecord,
+        default="*, items(*), storage_locations(*)",
+        embeds={"items": "items", "storage_locations": "storage_locations"}
+    )
+    query = db.table("inventory").select(select)
 
     if item_id:
         query = query.eq("item_id", item_id)
     if location_id:
         query = query.eq("location_id", location_id)
 
-    result = query.execute()
-    return result.data
+    result = await query.execute()
+    if shape is None:
+        return fast_json(result.data, response=response)
+    return fast_json(result.data, InventoryRecord, response, shape)
 
 
 @router.get("/inventory/summary")
 async def get_inventory_summary(db=Depends(get_supabase)):
     """获取库存摘要（使用视图）"""
-    result = db.table("inventory_summary").select("*").execute()
+    result = await db.table("inventory_summary").select("*").execute()
     return result.data
 
 
 @router.get("/inventory/low-stock")
 async def get_low_stock_items(db=Depends(get_supabase)):
     """获取低库存物料"""
-    result = db.table("low_stock_items").select("*").execute()
+    result = await db.table("low_stock_items").select("*").execute()
     return result.data
 
 
@@ -191,53 +332,35 @@ async def get_low_stock_items(db=Depends(get_supabase)):
 
 @router.post("/transactions", response_model=InventoryTransaction)
 async def create_transaction(transaction: InventoryTransactionCreate, db=Depends(get_supabase)):
-    """创建出入库记录"""
-    # 1. 获取当前库存
-    inventory_result = (
-        db.table("inventory")
-        .select("*")
-        .eq("item_id", transaction.item_id)
-        .eq("location_id", transaction.location_id)
-        .execute()
-    )
-
-    current_quantity = inventory_result.data[0]["quantity"] if inventory_result.data else 0
-
-    # 2. 计算新库存
-    if transaction.transaction_type == "in" or transaction.transaction_type == "initial":
-        new_quantity = current_quantity + transaction.quantity
-    elif transaction.transaction_type == "out":
-        new_quantity = current_quantity - transaction.quantity
-        if new_quantity < 0:
-            raise HTTPException(status_code=400, detail="Insufficient stock")
-    elif transaction.transaction_type == "adjust":
-        new_quantity = transaction.quantity
-    else:
+    """创建出入库记录（数据库函数 apply_inventory_transaction 在一个事务中加锁更新库存并记账）"""
+    if transaction.transaction_type not in TRANSACTION_TYPES:
         raise HTTPException(status_code=400, detail="Invalid transaction type")
 
-    # 3. 更新或创建库存记录
-    if inventory_result.data:
-        # 更新现有库存
-        db.table("inventory").update({"quantity": new_quantity}).eq("item_id", transaction.item_id).eq("location_id", transaction.location_id).execute()
-    else:
-        # 创建新库存记录
-        db.table("inventory").insert({
-            "item_id": transaction.item_id,
-            "location_id": transaction.location_id,
-            "quantity": new_quantity
+    try:
+        result = await db.rpc("apply_inventory_transaction", {
+            "p_item_id": transaction.item_id,
+            "p_location_id": transaction.location_id,
+            "p_transaction_type": transaction.transaction_type,
+            "p_quantity": transaction.quantity,
+            "p_operator_id": transaction.operator_id,
+            "p_notes": transaction.notes,
+            "p_reference_type": transaction.reference_type,
+            "p_reference_id": transaction.reference_id
         }).execute()
-
-    # 4. 记录交易历史
-    transaction_data = transaction.dict()
-    transaction_data["before_quantity"] = current_quantity
-    transaction_data["after_quantity"] = new_quantity
-
-    result = db.table("inventory_transactions").insert(transaction_data).execute()
+    except APIError as e:
+        # 库存不足 / 无效类型
+        if e.code in TRANSACTION_ERROR_CODES:
+            raise HTTPException(status_code=400, detail=e.message)
+        raise
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create transaction")
 
-    return result.data[0]
+    # 库存已变化，按 RPC 返回的前后数量更新材料搜索结果中的 current_stock（不再读取数据库）
+    material_search_index.apply_stock_changes([
+        (result.data["item_id"], result.data["before_quantity"], result.data["after_quantity"])
+    ])
+    return result.data
 
 
 @router.get("/transactions", response_model=List[InventoryTransaction])
@@ -255,7 +378,7 @@ async def get_transactions(
     if operator_id:
         query = query.eq("operator_id", operator_id)
 
-    result = query.execute()
+    result = await query.execute()
     return result.data
 
 
@@ -265,14 +388,14 @@ async def get_transactions(
 async def create_purchase_request(request: PurchaseRequestCreate, db=Depends(get_supabase)):
     """创建采购申请"""
     # 生成申请编号
-    number_result = db.rpc("generate_purchase_request_number").execute()
+    number_result = await db.rpc("generate_purchase_request_number").execute()
     request_number = number_result.data
 
     request_data = request.dict()
     request_data["request_number"] = request_number
     request_data["status"] = "pending"
 
-    result = db.table("purchase_requests").insert(request_data).execute()
+    result = await db.table("purchase_requests").insert(request_data).execute()
 
     if not result.data:
         raise HTTPException(status_code=400, detail="Failed to create purchase request")
@@ -291,7 +414,7 @@ async def get_purchase_requests(
     if status:
         query = query.eq("status", status)
 
-    result = query.execute()
+    result = await query.execute()
     return result.data
 
 
@@ -306,7 +429,7 @@ async def update_purchase_request_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
 
-    result = db.table("purchase_requests").update({"status": status}).eq("id", request_id).execute()
+    result = await db.table("purchase_requests").update({"status": status}).eq("id", request_id).execute()
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Purchase request not found")
@@ -316,27 +439,157 @@ async def update_purchase_request_status(
 
 # ============ 批量初始化库存 API ============
 
+def _validate_bulk_entry(row_index: int, raw: dict) -> Tuple[Optional[dict], Optional[str]]:
+    """校验一行盘点数据，返回 (RPC 参数, 错误信息)"""
+    try:
+        entry = BulkInventoryEntry(**raw)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+        )
+    except TypeError as e:
+        # 键不是字符串等无法作为参数的行
+        return None, str(e)
+
+    return {
+        "row_index": row_index,
+        "item_id": str(entry.item_id),
+        "location_id": str(entry.location_id),
+        "quantity": entry.quantity,
+        "operator_id": str(entry.operator_id),
+        "notes": entry.notes or BULK_INIT_NOTES
+    }, None
+
+
+async def _apply_bulk_chunk(db, entries: List[dict]) -> List[dict]:
+    """
+    一次 RPC 处理一批盘点数据（数据库函数 bulk_init_inventory），返回每行结果
+    每批在一个事务中执行：RPC 出错时这一批没有提交，每行作为失败返回，之前提交的批次不受影响
+    """
+    if not entries:
+        return []
+    try:
+        result = await db.rpc("bulk_init_inventory", {"entries": entries}).execute()
+    except APIError as e:
+        return [
+            {"row_index": entry["row_index"], "success": False, "error": f"Chunk not applied: {e.message}"}
+            for entry in entries
+        ]
+    return result.data or []
+
+
+def _read_csv_rows(reader: csv.DictReader, size: int) -> List[dict]:
+    """从 CSV 中读取最多 size 行（在线程池中执行）"""
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= size:
+            break
+    return rows
+
+
 @router.post("/inventory/bulk-init")
 async def bulk_init_inventory(
     items: List[dict],  # [{ item_id, location_id, quantity, operator_id }]
     db=Depends(get_supabase)
 ):
-    """批量初始化库存（首次盘点）"""
-    results = []
+    """批量初始化库存（首次盘点），每 BULK_INIT_CHUNK_SIZE 行一次 RPC"""
+    results = [None] * len(items)
+    entries = []
+    stock_changes = []
+
+    for row_index, item in enumerate(items):
+        entry, error = _validate_bulk_entry(row_index, item)
+        if error:
+            results[row_index] = {"success": False, "item_id": item.get("item_id"), "error": error}
+        else:
+            entries.append(entry)
+
+    for start in range(0, len(entries), BULK_INIT_CHUNK_SIZE):
+        for row in await _apply_bulk_chunk(db, entries[start:start + BULK_INIT_CHUNK_SIZE]):
+            item_id = items[row["row_index"]].get("item_id")
+            if row["success"]:
+                stock_changes.append((item_id, row["before_quantity"], row["after_quantity"]))
+                results[row["row_index"]] = {
+                    "success": True,
+                    "item_id": item_id,
+                    "data": {
+                        "id": row["transaction_id"],
+                        "before_quantity": row["before_quantity"],
+                        "after_quantity": row["after_quantity"]
+                    }
+                }
+            else:
+                results[row["row_index"]] = {"success": False, "item_id": item_id, "error": row["error"]}
+
+    material_search_index.apply_stock_changes(stock_changes)
+    return {"total": len(items), "results": results}
 
-    for item in items:
-        try:
-            transaction = InventoryTransactionCreate(
-                item_id=item["item_id"],
-                location_id=item["location_id"],
-                transaction_type="initial",
-                quantity=item["quantity"],
-                operator_id=item["operator_id"],
-                notes="初始盘点录入"
-            )
-            result = await create_transaction(transaction, db)
-            results.append({"success": True, "item_id": item["item_id"], "data": result})
-        except Exception as e:
-            results.append({"success": False, "item_id": item["item_id"], "error": str(e)})
 
-    return {"total": len(items), "results": results}
+@router.post("/inventory/bulk-init/csv")
+async def bulk_init_inventory_csv(
+    file: UploadFile = File(...),
+    operator_id: Optional[str] = None,
+    db=Depends(get_supabase)
+):
+    """
+    通过 CSV 批量初始化库存
+    列: item_id, location_id, quantity[, operator_id, notes]
+    按批次读取和提交，文件不会整体载入内存；只返回失败的行
+    """
+    reader = csv.DictReader(
+        io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""),
+        restkey=CSV_EXTRA_FIELDS_KEY
+    )
+
+    total = 0
+    success_count = 0
+    errors = []
+
+    while True:
+        rows = await run_in_threadpool(_read_csv_rows, reader, BULK_INIT_CHUNK_SIZE)
+        if not rows:
+            break
+
+        entries = []
+        for row in rows:
+            row_index = total
+            total += 1
+
+            if operator_id and not row.get("operator_id"):
+                row["operator_id"] = operator_id
+
+            extra = row.pop(CSV_EXTRA_FIELDS_KEY, None)
+            if extra is not None:
+                entry, error = None, f"Row has {len(extra)} more field(s) than the header"
+            else:
+                entry, error = _validate_bulk_entry(row_index, row)
+            if error:
+                errors.append({"row": row_index + 1, "item_id": row.get("item_id"), "error": error})
+            else:
+                entries.append(entry)
+
+        item_ids = {entry["row_index"]: entry["item_id"] for entry in entries}
+        stock_changes = []
+        for result in await _apply_bulk_chunk(db, entries):
+            if result["success"]:
+                success_count += 1
+                stock_changes.append(
+                    (item_ids[result["row_index"]], result["before_quantity"], result["after_quantity"])
+                )
+            else:
+                errors.append({
+                    "row": result["row_index"] + 1,
+                    "item_id": item_ids[result["row_index"]],
+                    "error": result["error"]
+                })
+        material_search_index.apply_stock_changes(stock_changes)
+
+    errors.sort(key=lambda error: error["row"])
+
+    return {
+        "total": total,
+        "success_count": success_count,
+        "error_count": len(errors),
+        "errors": errors
+    }
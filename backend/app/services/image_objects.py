@@ -0,0 +1,128 @@
+"""
+图片对象登记 - 按内容哈希去重的图片（database/image_objects.sql）
+对象按 (存储位置, 内容哈希) 登记，存储位置是 StorageBackend.storage_id / S3Service.storage_id，
+切换存储后端后不会复用另一个后端的文件。
+上传时先登记占用一个待引用计数，request_images / item_images 插入引用后转为引用计数；
+删除时先释放调用方自己的登记，没有引用、也没有其他正在进行的上传时才删除存储中的文件；
+超过 IMAGE_CLAIM_TTL 仍没有被引用的登记由 sweep 清理
+"""
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from app.config import settings
+from app.database import get_supabase_admin
+
+
+def claim_ttl() -> str:
+    """待引用登记的有效期（PostgreSQL INTERVAL）"""
+    return f"{settings.IMAGE_CLAIM_TTL} seconds"
+
+
+def object_path(prefix: str, content_hash: str, ext: str) -> str:
+    """
+    存储路径: <前缀><内容哈希>-<随机后缀><扩展名>
+    相同内容通过 image_objects 查到已有路径；对象被释放后重新上传时使用新路径，
+    不会被正在进行的删除误删
+    """
+    return f"{prefix}{content_hash}-{uuid.uuid4().hex[:8]}{ext}"
+
+
+class ImageObjectRegistry:
+    """image_objects 表的登记、保存和释放"""
+
+    async def claim(
+        self,
+        storage_id: str,
+        content_hash: str,
+        path: str,
+        url: str,
+        size: Optional[int],
+        content_type: str
+    ) -> dict:
+        """查找或创建对象并占用一个待引用计数，返回对象行（stored = false 时需要保存文件）"""
+        db = await get_supabase_admin()
+        result = await db.rpc("claim_image_object", {
+            "p_storage_id": storage_id,
+            "p_content_hash": content_hash,
+            "p_path": path,
+            "p_url": url,
+            "p_size": size,
+            "p_content_type": content_type
+        }).execute()
+        return result.data
+
+    async def _update(self, storage_id: str, content_hash: str, values: dict) -> None:
+        db = await get_supabase_admin()
+        await db.table("image_objects").update(values).eq(
+            "storage_id", storage_id
+        ).eq("content_hash", content_hash).execute()
+
+    async def mark_stored(self, storage_id: str, content_hash: str, size: Optional[int] = None) -> None:
+        values = {"stored": True}
+        if size is not None:
+            values["size"] = size
+        await self._update(storage_id, content_hash, values)
+
+    async def save_renditions(self, storage_id: str, content_hash: str, renditions: dict) -> None:
+        """保存已生成的图片版本（名称 -> {url, path, size, width, height}），相同内容再次上传时直接使用"""
+        await self._update(storage_id, content_hash, {"renditions": renditions})
+
+    async def abandon(self, storage_id: str, content_hash: str) -> None:
+        """撤销登记（保存文件失败时）"""
+        db = await get_supabase_admin()
+        await db.rpc("abandon_image_claim", {"p_storage_id": storage_id, "p_content_hash": content_hash}).execute()
+
+    async def release(self, storage_id: str, path: str) -> bool:
+        """释放调用方的登记（或引用），返回 true 时调用方删除存储中的文件"""
+        db = await get_supabase_admin()
+        result = await db.rpc("release_image_object", {
+            "p_storage_id": storage_id,
+            "p_path": path,
+            "p_claim_ttl": claim_ttl()
+        }).execute()
+        return bool(result.data)
+
+    async def sweep(self, storage_id: str) -> List[dict]:
+        """删除超过有效期仍没有被引用的对象，返回被删除的行（调用方删除存储中的文件）"""
+        db = await get_supabase_admin()
+        result = await db.rpc("sweep_image_objects", {
+            "p_storage_id": storage_id,
+            "p_claim_ttl": claim_ttl()
+        }).execute()
+        return result.data or []
+
+    async def store(
+        self,
+        storage_id: str,
+        content_hash: str,
+        path: str,
+        url: str,
+        size: Optional[int],
+        content_type: str,
+        save: Callable[[str], Awaitable[Optional[int]]]
+    ) -> dict:
+        """
+        登记对象，文件还没有保存时调用 save(路径) 保存（返回保存的大小或 None）
+        返回对象行，deduplicated 表示文件已经存在、没有再次保存；
+        renditions 为已生成的图片版本（没有时为空）
+        """
+        stored = await self.claim(storage_id, content_hash, path, url, size, content_type)
+        stored["renditions"] = stored.get("renditions") or {}
+        if stored["stored"]:
+            return {**stored, "deduplicated": True}
+
+        # 同一内容同时上传时各自保存到同一路径（内容相同）
+        try:
+            saved_size = await save(stored["path"])
+        except Exception:
+            await self.abandon(storage_id, content_hash)
+            raise
+        await self.mark_stored(storage_id, content_hash, saved_size)
+
+        if saved_size is not None:
+            stored["size"] = saved_size
+        return {**stored, "stored": True, "deduplicated": False}
+
+
+# 创建单例
+image_object_registry = ImageObjectRegistry()
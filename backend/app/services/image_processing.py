@@ -0,0 +1,159 @@
+"""
+图片处理 - 在进程池中解码一次图片并生成所有版本（缩略图、中图、原图）
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+# 默认生成的图片版本: 名称 -> 最大尺寸 (宽, 高)
+DEFAULT_RENDITIONS = {
+    'thumbnail': (300, 300),
+    'medium': (1024, 1024),
+    'full': (2048, 2048),
+}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """图片处理进程池（首次使用时创建）"""
+    global _process_pool
+    if _process_pool is None:
+        workers = os.getenv('IMAGE_WORKERS')
+        _process_pool = ProcessPoolExecutor(max_workers=int(workers) if workers else None)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """关闭进程池（应用关闭时调用），等待正在处理的图片完成"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+
+
+def _area(size: tuple) -> int:
+    return size[0] * size[1]
+
+
+def render_renditions(image_bytes: bytes, renditions: Dict[str, tuple], webp: bool = False) -> Dict[str, dict]:
+    """
+    解码一次图片并生成所有版本（在进程池中运行）
+
+    Args:
+        image_bytes: 原始图片
+        renditions: 名称 -> 最大尺寸 (宽, 高)
+        webp: 是否额外生成 WebP 版本（名称加 _webp 后缀）
+
+    Returns:
+        名称 -> {body, content_type, ext, width, height}
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+
+    # JPEG 缩小解码，12MP 照片解码快得多；宽和高分别取所有版本的最大值，
+    # 解码结果能容纳每个版本
+    img.draft('RGB', (
+        max(width for width, _ in renditions.values()),
+        max(height for _, height in renditions.values())
+    ))
+
+    # 转换 RGBA 到 RGB (如果需要)
+    if img.mode == 'RGBA':
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    results = {}
+    # 从大到小生成；已生成的版本的尺寸框能容纳当前版本时基于它缩放（更快），否则基于原图
+    rendered = []
+    for name, max_size in sorted(renditions.items(), key=lambda r: _area(r[1]), reverse=True):
+        sources = [
+            (size, image) for size, image in rendered
+            if size[0] >= max_size[0] and size[1] >= max_size[1]
+        ]
+        source = min(sources, key=lambda s: _area(s[0]))[1] if sources else img
+
+        current = source.copy()
+        current.thumbnail(max_size, Image.Resampling.LANCZOS)
+        rendered.append((max_size, current))
+
+        output = io.BytesIO()
+        current.save(output, format='JPEG', quality=85, optimize=True)
+        results[name] = {
+            'body': output.getvalue(),
+            'content_type': 'image/jpeg',
+            'ext': '.jpg',
+            'width': current.width,
+            'height': current.height
+        }
+
+        if webp:
+            output = io.BytesIO()
+            current.save(output, format='WEBP', quality=80)
+            results[f'{name}_webp'] = {
+                'body': output.getvalue(),
+                'content_type': 'image/webp',
+                'ext': '.webp',
+                'width': current.width,
+                'height': current.height
+            }
+
+    return results
+
+
+async def render_in_process_pool(
+    image_bytes: bytes,
+    renditions: Optional[Dict[str, tuple]] = None,
+    webp: bool = False
+) -> Dict[str, dict]:
+    """在进程池中生成图片版本，不阻塞事件循环（renditions 默认 DEFAULT_RENDITIONS）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_process_pool(),
+        render_renditions,
+        image_bytes,
+        renditions or DEFAULT_RENDITIONS,
+        webp
+    )
+
+
+def rendition_prefix(path: str) -> str:
+    """图片版本保存在原图路径去掉扩展名的目录下: <哈希>/<版本>.jpg"""
+    return os.path.splitext(path)[0]
+
+
+async def save_renditions(
+    image_bytes: bytes,
+    path: str,
+    save: Callable[[str, bytes, str], Awaitable[None]],
+    public_url: Callable[[str], Awaitable[str]],
+    renditions: Optional[Dict[str, tuple]] = None,
+    webp: bool = False
+) -> Dict[str, dict]:
+    """
+    在进程池中生成原图 path 的各个版本，并同时调用 save(路径, 内容, content_type) 保存
+
+    Returns:
+        名称 -> {url, path, size, width, height}（可以保存到 image_objects.renditions）
+    """
+    rendered = await render_in_process_pool(image_bytes, renditions, webp)
+    prefix = rendition_prefix(path)
+
+    async def save_one(name: str, rendition: dict) -> Tuple[str, dict]:
+        rendition_path = f"{prefix}/{name}{rendition['ext']}"
+        await save(rendition_path, rendition["body"], rendition["content_type"])
+        return name, {
+            "url": await public_url(rendition_path),
+            "path": rendition_path,
+            "size": len(rendition["body"]),
+            "width": rendition["width"],
+            "height": rendition["height"]
+        }
+
+    return dict(await asyncio.gather(*(save_one(name, rendition) for name, rendition in rendered.items())))
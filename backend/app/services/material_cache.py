@@ -0,0 +1,55 @@
+"""
+材料详情缓存 - 每个物料的详情（物料 + 分类 + 别名 + 图片，LRU + TTL）
+别名、图片、物料通过 API 修改时调用 invalidate()；
+库存数量等其他途径的变化在 TTL 到期后重新查询
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from app.config import settings
+
+
+class MaterialDetailCache:
+    """按 item_id 缓存材料详情"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._details: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # 每次失效时加一，查询期间发生失效的结果不写入缓存
+        self.generation = 0
+
+    def get_many(self, item_ids: Iterable[str]) -> Tuple[Dict[str, dict], List[str]]:
+        """返回 (已缓存的详情, 需要查询的 item_id)"""
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for item_id in item_ids:
+            entry = self._details.get(item_id)
+            if entry is None or entry[1] < now:
+                self._details.pop(item_id, None)
+                missing.append(item_id)
+            else:
+                self._details.move_to_end(item_id)
+                found[item_id] = entry[0]
+        return found, missing
+
+    def set_many(self, details: Dict[str, dict], generation: int) -> None:
+        """写入查询结果（generation 是查询开始前读取的值）"""
+        if generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for item_id, detail in details.items():
+            self._details[item_id] = (detail, expires_at)
+            self._details.move_to_end(item_id)
+        while len(self._details) > self.max_size:
+            self._details.popitem(last=False)
+
+    def invalidate(self, item_id: str) -> None:
+        self.generation += 1
+        self._details.pop(item_id, None)
+
+
+# 创建单例
+material_detail_cache = MaterialDetailCache(settings.MATERIAL_CACHE_SIZE, settings.MATERIAL_CACHE_TTL)
@@ -0,0 +1,193 @@
+"""
+通知推送服务 - 进程内按用户分发的 pub/sub
+数据来源是 Supabase Realtime 的 notifications 表变更（包括
+create_notification_on_request 触发器创建的通知），
+第一个客户端连接时（启用未读计数缓存时在启动时，见 start()）订阅，之后保持订阅直到应用关闭（close()）；
+最后一个客户端断开时不取消订阅，避免连接数在 0 和 1 之间变化时反复订阅
+（需先运行 database/notifications_realtime.sql，把 notifications 表加入 Realtime 发布）
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+from realtime import RealtimeSubscribeStates
+
+from app.database import get_supabase_admin
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多缓存的事件数，客户端读取太慢时丢弃缓存并通知客户端重新加载
+QUEUE_SIZE = 100
+
+# 等待 Realtime 确认订阅的时间（秒）
+JOIN_TIMEOUT = 10
+
+# 订阅中断后重新订阅的间隔（秒）
+RECONNECT_DELAY = 5
+
+
+class NotificationHub:
+    """按 user_id 分发通知事件"""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listeners: List[Callable[[str, dict], None]] = []
+        self._reset_listeners: List[Callable[[], None]] = []
+        self._keep_subscribed = False
+        self._channel = None
+        self._start_lock = asyncio.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Callable[[str, dict], None]) -> None:
+        """注册进程内监听器，每个事件都会调用"""
+        self._listeners.append(listener)
+
+    def add_reset_listener(self, listener: Callable[[], None]) -> None:
+        """注册订阅中断时调用的监听器（中断期间的事件已丢失）"""
+        self._reset_listeners.append(listener)
+
+    @property
+    def connected(self) -> bool:
+        """Realtime 订阅是否已确认（未确认时收不到其他途径产生的变更）"""
+        return self._channel is not None
+
+    async def start(self) -> None:
+        """
+        启动时订阅，没有客户端连接时也保持订阅（进程内监听器依赖这些事件）；
+        订阅失败时在后台重试，不影响启动
+        """
+        self._keep_subscribed = True
+        try:
+            await self._ensure_started()
+        except Exception:
+            logger.exception("Failed to subscribe notification channel")
+            self._schedule_reconnect()
+
+    async def subscribe(self, user_id: str) -> asyncio.Queue:
+        """为一个连接创建事件队列"""
+        await self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        """连接断开时移除队列"""
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: dict) -> None:
+        """向该用户的所有连接发送事件"""
+        for listener in self._listeners:
+            listener(user_id, event)
+
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 客户端跟不上：丢弃积压的事件，让客户端重新加载通知列表
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def _on_change(self, payload: dict) -> None:
+        """Supabase Realtime 回调"""
+        data = payload.get("data") or {}
+        # DELETE 事件只有 old_record（需要 REPLICA IDENTITY FULL 才包含 user_id）
+        record = data.get("record") or data.get("old_record") or {}
+        user_id = record.get("user_id")
+        if not user_id:
+            return
+        self.publish(user_id, {
+            "type": str(data.get("type", "")).lower(),
+            "notification": record
+        })
+
+    async def _ensure_started(self) -> None:
+        """订阅 notifications 表的变更（只订阅一次），等待 Realtime 确认，失败时抛出异常"""
+        if self._channel is not None:
+            return
+        async with self._start_lock:
+            if self._channel is not None:
+                return
+            db = await get_supabase_admin()
+            channel = db.channel("notification-hub")
+            channel.on_postgres_changes("INSERT", self._on_change, table="notifications", schema="public")
+            channel.on_postgres_changes("UPDATE", self._on_change, table="notifications", schema="public")
+            channel.on_postgres_changes("DELETE", self._on_change, table="notifications", schema="public")
+
+            joined = asyncio.get_running_loop().create_future()
+
+            def on_status(state: RealtimeSubscribeStates, error: Optional[Exception]) -> None:
+                if state == RealtimeSubscribeStates.SUBSCRIBED:
+                    if not joined.done():
+                        joined.set_result(None)
+                    return
+                if not joined.done():
+                    joined.set_exception(error or RuntimeError(f"Realtime subscription {state.value}"))
+                else:
+                    self._on_channel_lost(channel, state, error)
+
+            try:
+                await channel.subscribe(on_status)
+                await asyncio.wait_for(joined, timeout=JOIN_TIMEOUT)
+            except BaseException:
+                # 订阅失败时不保留 channel，下一个连接重新订阅
+                await self._remove_channel(channel)
+                raise
+            self._channel = channel
+
+    def _on_channel_lost(self, channel, state: RealtimeSubscribeStates, error: Optional[Exception]) -> None:
+        """订阅中断（CHANNEL_ERROR / TIMED_OUT / CLOSED）：重置 channel，仍有连接时重新订阅"""
+        if self._channel is not channel:
+            return
+        logger.warning("Notification channel %s: %s", state.value, error)
+        self._channel = None
+        asyncio.create_task(self._remove_channel(channel))
+        for listener in self._reset_listeners:
+            listener()
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        """仍有连接（或 start() 要求保持订阅）时在后台重新订阅"""
+        if self._needs_channel() and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    def _needs_channel(self) -> bool:
+        return self._keep_subscribed or bool(self._subscribers)
+
+    async def _reconnect(self) -> None:
+        """重新订阅，成功后通知所有连接重新加载（中断期间的事件已丢失）"""
+        while self._needs_channel() and self._channel is None:
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                await self._ensure_started()
+            except Exception:
+                logger.exception("Failed to resubscribe notification channel")
+                continue
+            for user_id in list(self._subscribers):
+                self.publish(user_id, {"type": "resync"})
+
+    async def _remove_channel(self, channel) -> None:
+        try:
+            await channel.unsubscribe()
+        except Exception:
+            logger.exception("Failed to close notification channel")
+
+    async def close(self) -> None:
+        """关闭 Realtime 订阅"""
+        self._keep_subscribed = False
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        channel, self._channel = self._channel, None
+        if channel is not None:
+            await self._remove_channel(channel)
+
+
+# 创建单例
+notification_hub = NotificationHub()
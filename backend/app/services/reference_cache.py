@@ -0,0 +1,128 @@
+"""
+参考数据缓存 - 分类、工地、项目、库位等很少变化的列表
+读取时先查缓存（TTL），写操作调用 invalidate() 使整个命名空间失效；
+每个缓存结果带 ETag，客户端带 If-None-Match 时返回 304。
+CACHE_BACKEND=redis 时多个 worker 共享缓存和失效（任何兼容 Redis 协议的服务均可）
+"""
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import redis.asyncio as redis
+from fastapi import Request, Response
+
+from app.config import settings
+from app.responses import not_modified
+
+
+class MemoryCacheBackend:
+    """进程内缓存（单 worker）"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[dict, float]] = {}
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._values[key]
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        self._values[key] = (value, time.monotonic() + ttl)
+
+    async def get_version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    async def bump_version(self, namespace: str) -> None:
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        # 旧版本的缓存不会再被读取，直接清理
+        prefix = f"ref:{namespace}:"
+        for key in [key for key in self._values if key.startswith(prefix)]:
+            del self._values[key]
+
+
+class RedisCacheBackend:
+    """Redis 缓存（多个 worker 共享）"""
+
+    def __init__(self, url: str):
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._redis.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        await self._redis.set(key, json.dumps(value, default=str), ex=ttl)
+
+    async def get_version(self, namespace: str) -> int:
+        version = await self._redis.get(f"ref-version:{namespace}")
+        return int(version) if version is not None else 0
+
+    async def bump_version(self, namespace: str) -> None:
+        # 旧版本的缓存由 TTL 自动过期
+        await self._redis.incr(f"ref-version:{namespace}")
+
+
+class ReferenceCache:
+    """按命名空间缓存列表查询结果"""
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        params: dict,
+        loader: Callable[[], Awaitable[Union[list, dict]]]
+    ) -> dict:
+        """返回 {"data", "etag"}，缓存没有时调用 loader 查询数据库"""
+        version = await self.backend.get_version(namespace)
+        key = f"ref:{namespace}:{version}:{json.dumps(params, sort_keys=True, default=str)}"
+
+        entry = await self.backend.get(key)
+        if entry is None:
+            data = await loader()
+            body = json.dumps(data, sort_keys=True, default=str).encode()
+            entry = {
+                "data": data,
+                "etag": f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+            }
+            await self.backend.set(key, entry, self.ttl)
+        return entry
+
+    async def invalidate(self, namespace: str) -> None:
+        """写操作后调用"""
+        await self.backend.bump_version(namespace)
+
+    async def respond(
+        self,
+        request: Request,
+        response: Response,
+        namespace: str,
+        params: dict,
+        loader: Callable[[], Awaitable[Union[list, dict]]]
+    ):
+        """读取缓存并处理 ETag：客户端已有最新数据时返回 304"""
+        entry = await self.get_or_load(namespace, params, loader)
+        cached = not_modified(request, response, entry["etag"])
+        if cached is not None:
+            return cached
+        return entry["data"]
+
+
+def _create_backend():
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+
+
+# 创建单例
+reference_cache = ReferenceCache(_create_backend(), settings.REFERENCE_CACHE_TTL)
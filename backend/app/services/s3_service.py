@@ -2,32 +2,106 @@
 AWS S3 服务 - 处理图片上传和管理
 """
 import os
-import uuid
+import asyncio
+import hashlib
+import threading
 from typing import Optional, BinaryIO
 from datetime import datetime, timedelta
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from PIL import Image
 import io
 
+from app.services.image_objects import image_object_registry, object_path
+from app.services.image_processing import DEFAULT_RENDITIONS, rendition_prefix, save_renditions
+
+
+# 超过 8MB 的文件使用分片上传
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+
+# 计算内容哈希时每次读取的大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
 
 class S3Service:
     """S3 图片上传和管理服务"""
 
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'eu-central-1')
-        )
         self.bucket_name = os.getenv('S3_BUCKET_NAME')
         self.cloudfront_domain = os.getenv('CLOUDFRONT_DOMAIN')
+        self.region = os.getenv('AWS_REGION', 'eu-central-1')
+        # 本地 S3 兼容服务（MinIO、moto_server 等），用于离线开发和性能测试
+        self.endpoint_url = os.getenv('S3_ENDPOINT_URL')
 
         if not self.bucket_name:
             raise ValueError("S3_BUCKET_NAME environment variable not set")
 
-    def upload_image(
+        self._s3_client = None
+        self._client_lock = threading.Lock()
+
+        # 超过阈值的文件自动使用分片上传，分片并发上传
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=int(os.getenv('S3_MAX_CONCURRENCY', '10'))
+        )
+
+    @property
+    def storage_id(self) -> str:
+        """image_objects 中的存储位置（对象键不带前缀，与 S3StorageBackend 的文件分开登记）"""
+        return f"s3:{self.bucket_name}"
+
+    @property
+    def s3_client(self):
+        """S3 客户端（首次使用时创建，所有线程共享同一个连接池）"""
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    self._s3_client = boto3.client(
+                        's3',
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                        region_name=self.region,
+                        endpoint_url=self.endpoint_url,
+                        config=Config(
+                            max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', '50')),
+                            tcp_keepalive=True,
+                            connect_timeout=5,
+                            read_timeout=60,
+                            retries={
+                                'max_attempts': int(os.getenv('S3_MAX_ATTEMPTS', '5')),
+                                'mode': 'adaptive'
+                            }
+                        )
+                    )
+        return self._s3_client
+
+    def put_object(self, s3_key: str, body: bytes, content_type: str, metadata: dict) -> None:
+        """上传对象（大文件自动分片上传；阻塞调用，在线程中执行）"""
+        self.s3_client.upload_fileobj(
+            io.BytesIO(body),
+            self.bucket_name,
+            s3_key,
+            ExtraArgs={
+                'ContentType': content_type,
+                'CacheControl': 'max-age=31536000',  # 1 year cache
+                'Metadata': metadata
+            },
+            Config=self.transfer_config
+        )
+
+    def _read_and_hash(self, file: BinaryIO) -> tuple:
+        """分块读取文件并计算内容哈希（只包含文件内容），返回 (哈希, 内容)"""
+        digest = hashlib.sha256()
+        chunks = []
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            chunks.append(chunk)
+        return digest.hexdigest(), b''.join(chunks)
+
+    async def upload_image(
         self,
         file: BinaryIO,
         filename: str,
@@ -36,7 +110,9 @@ class S3Service:
         max_size: tuple = (2048, 2048)
     ) -> dict:
         """
-        上传图片到 S3
+        上传图片到 S3（按内容哈希去重，登记到 image_objects 并占用一个引用）
+        原图只保存一次；优化后的尺寸作为图片版本在进程池中生成（一次解码生成所有版本），
+        相同内容再次上传时直接使用已生成的版本
 
         Args:
             file: 文件对象
@@ -46,44 +122,41 @@ class S3Service:
             max_size: 最大尺寸 (宽, 高)
 
         Returns:
-            包含 URL 和元数据的字典
+            包含 URL 和元数据的字典（优化时 url/size 为对应尺寸的版本，s3_key 为原图，用于删除）
         """
         try:
-            # 生成唯一文件名
             file_ext = os.path.splitext(filename)[1].lower()
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            s3_key = f"{folder}/{datetime.now().strftime('%Y/%m/%d')}/{unique_filename}"
-
-            # 读取图片
-            file_content = file.read()
+            optimize = optimize and file_ext in ['.jpg', '.jpeg', '.png', '.webp']
+            content_type = self._get_content_type(file_ext)
 
-            # 优化图片
-            if optimize and file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                file_content = self._optimize_image(file_content, max_size)
+            # 相同内容不论上传到哪个目录、需要什么尺寸都只存储一次，尺寸由图片版本区分
+            content_hash, file_content = await asyncio.to_thread(self._read_and_hash, file)
+            s3_key = object_path(f"{folder}/", content_hash, file_ext)
 
-            # 上传到 S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=file_content,
-                ContentType=self._get_content_type(file_ext),
-                CacheControl='max-age=31536000',  # 1 year cache
-                Metadata={
+            async def save(key: str) -> int:
+                await asyncio.to_thread(self.put_object, key, file_content, content_type, {
                     'original-filename': filename,
                     'upload-date': datetime.now().isoformat()
-                }
-            )
+                })
+                return len(file_content)
 
-            # 生成 URL
-            url = self._get_public_url(s3_key)
+            stored = await image_object_registry.store(
+                self.storage_id, content_hash, s3_key, self.get_public_url(s3_key), None, content_type, save
+            )
 
-            return {
+            result = {
                 'success': True,
-                'url': url,
-                's3_key': s3_key,
+                'url': stored['url'],
+                's3_key': stored['path'],
                 'bucket': self.bucket_name,
-                'size': len(file_content)
+                'size': stored['size'],
+                'deduplicated': stored['deduplicated']
             }
+            if optimize:
+                name = self._rendition_name(max_size)
+                renditions = await self._ensure_renditions(stored, file_content, {name: max_size})
+                result.update(url=renditions[name]['url'], size=renditions[name]['size'], renditions=renditions)
+            return result
 
         except Exception as e:
             return {
@@ -91,28 +164,35 @@ class S3Service:
                 'error': str(e)
             }
 
-    def _optimize_image(self, image_bytes: bytes, max_size: tuple) -> bytes:
-        """优化图片尺寸和质量"""
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
+    @staticmethod
+    def _rendition_name(max_size: tuple) -> str:
+        """尺寸对应的版本名称（默认尺寸使用 thumbnail/medium/full）"""
+        for name, size in DEFAULT_RENDITIONS.items():
+            if tuple(size) == tuple(max_size):
+                return name
+        return f"{max_size[0]}x{max_size[1]}"
 
-            # 转换 RGBA 到 RGB (如果需要)
-            if img.mode == 'RGBA':
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
+    async def _ensure_renditions(self, stored: dict, image_bytes: bytes, wanted: dict) -> dict:
+        """
+        返回图片所有已生成的版本；缺少 wanted 中的版本时在进程池中一次生成默认版本和 wanted
+        （之后同一内容的缩略图等其他尺寸不需要再解码图片）
+        """
+        existing = stored['renditions']
+        if all(name in existing for name in wanted):
+            return existing
 
-            # 调整大小
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        async def save(key: str, body: bytes, content_type: str) -> None:
+            await asyncio.to_thread(self.put_object, key, body, content_type, {})
 
-            # 保存为优化后的字节
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=85, optimize=True)
-            return output.getvalue()
+        async def public_url(key: str) -> str:
+            return self.get_public_url(key)
 
-        except Exception:
-            # 如果优化失败，返回原始图片
-            return image_bytes
+        rendered = await save_renditions(
+            image_bytes, stored['path'], save, public_url, {**DEFAULT_RENDITIONS, **wanted}
+        )
+        renditions = {**existing, **rendered}
+        await image_object_registry.save_renditions(self.storage_id, stored['content_hash'], renditions)
+        return renditions
 
     def _get_content_type(self, file_ext: str) -> str:
         """获取文件的 Content-Type"""
@@ -126,15 +206,17 @@ class S3Service:
         }
         return content_types.get(file_ext.lower(), 'application/octet-stream')
 
-    def _get_public_url(self, s3_key: str) -> str:
+    def get_public_url(self, s3_key: str) -> str:
         """获取公开访问 URL"""
         if self.cloudfront_domain:
             # 使用 CloudFront CDN
             return f"https://{self.cloudfront_domain}/{s3_key}"
+        elif self.endpoint_url:
+            # 本地 S3 兼容服务
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{s3_key}"
         else:
             # 直接使用 S3 URL
-            region = os.getenv('AWS_REGION', 'eu-central-1')
-            return f"https://{self.bucket_name}.s3.{region}.amazonaws.com/{s3_key}"
+            return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{s3_key}"
 
     def generate_presigned_url(
         self,
@@ -164,8 +246,8 @@ class S3Service:
         except ClientError:
             return None
 
-    def delete_image(self, s3_key: str) -> bool:
-        """删除 S3 中的图片"""
+    def delete_object(self, s3_key: str) -> bool:
+        """删除对象（不检查引用；阻塞调用，在线程中执行）"""
         try:
             self.s3_client.delete_object(
                 Bucket=self.bucket_name,
@@ -175,14 +257,32 @@ class S3Service:
         except ClientError:
             return False
 
-    def upload_thumbnail(
+    def _delete_with_renditions(self, s3_key: str) -> bool:
+        """删除原图和 <原图路径去掉扩展名>/ 下的所有图片版本"""
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{rendition_prefix(s3_key)}/"):
+                keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+                if keys:
+                    self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={'Objects': keys})
+        except ClientError:
+            return False
+        return self.delete_object(s3_key)
+
+    async def delete_image(self, s3_key: str) -> bool:
+        """删除 S3 中的图片和它的版本（仍有引用或其他正在进行的上传时只释放登记，保留对象）"""
+        if not await image_object_registry.release(self.storage_id, s3_key):
+            return True
+        return await asyncio.to_thread(self._delete_with_renditions, s3_key)
+
+    async def upload_thumbnail(
         self,
         file: BinaryIO,
         filename: str,
         size: tuple = (300, 300)
     ) -> dict:
-        """上传缩略图"""
-        return self.upload_image(
+        """上传缩略图（相同内容已上传过时直接使用已生成的缩略图版本，不再解码图片）"""
+        return await self.upload_image(
             file,
             filename,
             folder="thumbnails",
@@ -191,5 +291,15 @@ class S3Service:
         )
 
 
-# 创建单例
-s3_service = S3Service()
+_s3_service: Optional[S3Service] = None
+_s3_service_lock = threading.Lock()
+
+
+def get_s3_service() -> S3Service:
+    """获取 S3 服务单例（首次使用时创建，未配置 S3 时不影响应用启动）"""
+    global _s3_service
+    if _s3_service is None:
+        with _s3_service_lock:
+            if _s3_service is None:
+                _s3_service = S3Service()
+    return _s3_service
@@ -0,0 +1,409 @@
+"""
+材料搜索索引 - 进程内的 items / item_aliases / 条码 / 分类名称 索引
+代替每次按键都执行的 search_items() 数据库函数，返回相同的 SearchResult 结构：
+- exact_name / exact_barcode / exact_alias: 不区分大小写完全匹配，分数 1.0
+- fuzzy_name / fuzzy_alias: 包含关键词（n-gram 索引）或拼写相近（trigram 相似度），
+  分数与 pg_trgm 的 similarity() 相同
+扫码（/api/wms/barcode）也从这里按条码查找物料，只有库存和库位还需要查询数据库。
+启动时构建；通过 API 修改物料、别名和库存（出入库、盘点、到货）时增量更新；
+其他途径的修改（SQL 脚本等）在 TTL 到期后由后台重新加载
+"""
+import asyncio
+import heapq
+import logging
+import re
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# PostgREST 默认每次最多返回 1000 行
+PAGE_SIZE = 1000
+
+# 与 search_items() 相同
+RESULT_LIMIT = 20
+
+# 输入联想缓存的查询数
+TYPEAHEAD_CACHE_SIZE = 1000
+
+# pg_trgm.similarity_threshold 的默认值
+SIMILARITY_THRESHOLD = 0.3
+
+# 子串索引的 n-gram 长度（更长的关键词用 3-gram 取交集后再确认）
+MAX_GRAM = 3
+
+FUZZY_MATCH = {"name": "fuzzy_name", "alias": "fuzzy_alias"}
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """与 pg_trgm 相同的 trigram：按单词拆分，每个单词前补两个空格、后补一个空格"""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """pg_trgm similarity(): 共同 trigram 数 / 全部 trigram 数"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def _grams(text: str) -> Set[str]:
+    """text 中所有长度 1..MAX_GRAM 的子串"""
+    return {
+        text[i:i + n]
+        for n in range(1, MAX_GRAM + 1)
+        for i in range(len(text) - n + 1)
+    }
+
+
+class SearchIndexData:
+    """索引数据（重新加载时整体替换）"""
+
+    def __init__(self):
+        self.items: Dict[str, dict] = {}
+        self.categories: Dict[str, str] = {}
+        # 搜索词：名称和别名，term_id -> (小写文本, item_id, "name" | "alias", trigram)
+        self.terms: Dict[int, Tuple[str, str, str, Set[str]]] = {}
+        self.exact: Dict[str, Set[int]] = {}
+        self.barcodes: Dict[str, Set[str]] = {}
+        self.grams: Dict[str, Set[int]] = {}
+        self.trigrams: Dict[str, Set[int]] = {}
+        self.name_terms: Dict[str, int] = {}
+        self.alias_terms: Dict[str, int] = {}
+        self._ids = count()
+
+    # ---------- 写入 ----------
+
+    def _add_term(self, text: str, item_id: str, kind: str) -> int:
+        term_id = next(self._ids)
+        text = text.lower()
+        term_trigrams = trigrams(text)
+        self.terms[term_id] = (text, item_id, kind, term_trigrams)
+        self.exact.setdefault(text, set()).add(term_id)
+        for gram in _grams(text):
+            self.grams.setdefault(gram, set()).add(term_id)
+        for gram in term_trigrams:
+            self.trigrams.setdefault(gram, set()).add(term_id)
+        return term_id
+
+    def _remove_term(self, term_id: int) -> None:
+        text, _, _, term_trigrams = self.terms.pop(term_id)
+        for index, keys in ((self.exact, (text,)), (self.grams, _grams(text)), (self.trigrams, term_trigrams)):
+            for key in keys:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(term_id)
+                    if not ids:
+                        del index[key]
+
+    def upsert_item(self, item: dict) -> None:
+        """新增或更新物料（名称、条码变化时更新索引）"""
+        item_id = item["id"]
+        old = self.items.get(item_id)
+        row = {**(old or {}), **item}
+
+        if old is None or old.get("name") != row.get("name"):
+            if item_id in self.name_terms:
+                self._remove_term(self.name_terms.pop(item_id))
+            if row.get("name"):
+                self.name_terms[item_id] = self._add_term(row["name"], item_id, "name")
+
+        if old is not None and old.get("barcode"):
+            self.barcodes.get(old["barcode"].lower(), set()).discard(item_id)
+        if row.get("barcode"):
+            self.barcodes.setdefault(row["barcode"].lower(), set()).add(item_id)
+
+        self.items[item_id] = row
+
+    def adjust_stock(self, item_id: str, delta: float) -> bool:
+        """按库存变化量更新物料的 current_stock；物料不在索引中时返回 False"""
+        item = self.items.get(item_id)
+        if item is None:
+            return False
+        item["current_stock"] = float(item.get("current_stock") or 0) + delta
+        return True
+
+    def remove_item(self, item_id: str) -> None:
+        """删除物料及其别名"""
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        if item.get("barcode"):
+            self.barcodes.get(item["barcode"].lower(), set()).discard(item_id)
+        if item_id in self.name_terms:
+            self._remove_term(self.name_terms.pop(item_id))
+        for alias_id in [alias_id for alias_id, term_id in self.alias_terms.items()
+                         if self.terms[term_id][1] == item_id]:
+            self._remove_term(self.alias_terms.pop(alias_id))
+
+    def add_alias(self, alias: dict) -> None:
+        if alias["id"] in self.alias_terms:
+            self.remove_alias(alias["id"])
+        self.alias_terms[alias["id"]] = self._add_term(alias["alias"], alias["item_id"], "alias")
+
+    def remove_alias(self, alias_id: str) -> None:
+        term_id = self.alias_terms.pop(alias_id, None)
+        if term_id is not None:
+            self._remove_term(term_id)
+
+    # ---------- 查询 ----------
+
+    def _substring_terms(self, query: str) -> Set[int]:
+        """包含 query 的搜索词（相当于 LIKE '%query%'）"""
+        if len(query) <= MAX_GRAM:
+            return self.grams.get(query, set())
+
+        postings = []
+        for i in range(len(query) - MAX_GRAM + 1):
+            ids = self.grams.get(query[i:i + MAX_GRAM])
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set.intersection(*postings)
+        return {term_id for term_id in candidates if query in self.terms[term_id][0]}
+
+    def _similar_terms(self, query_trigrams: Set[str], exclude: Set[int]) -> Dict[int, float]:
+        """trigram 相似度达到阈值的搜索词（拼写错误）"""
+        shared: Dict[int, int] = {}
+        for gram in query_trigrams:
+            for term_id in self.trigrams.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+
+        similar = {}
+        for term_id, common in shared.items():
+            if term_id in exclude:
+                continue
+            score = common / (len(query_trigrams) + len(self.terms[term_id][3]) - common)
+            if score >= SIMILARITY_THRESHOLD:
+                similar[term_id] = score
+        return similar
+
+    def lookup_barcode(self, barcode: str) -> Optional[dict]:
+        """条码完全匹配（区分大小写，与 items.barcode = barcode 相同）的物料"""
+        matches = [
+            self.items[item_id] for item_id in self.barcodes.get(barcode.lower(), ())
+            if self.items[item_id].get("barcode") == barcode
+        ]
+        return min(matches, key=lambda item: item["id"]) if matches else None
+
+    def _is_active(self, item_id: str) -> bool:
+        item = self.items.get(item_id)
+        return item is not None and bool(item.get("is_active"))
+
+    def _result(self, item_id: str, match_type: str, score: float) -> dict:
+        item = self.items[item_id]
+        return {
+            "id": item_id,
+            "name": item["name"],
+            "barcode": item.get("barcode"),
+            "category_name": self.categories.get(item.get("category_id")),
+            "current_stock": item.get("current_stock"),
+            "unit": item["unit"],
+            "match_type": match_type,
+            "similarity_score": score
+        }
+
+    def search(self, query: str, limit: int = RESULT_LIMIT) -> List[dict]:
+        query = query.lower()
+        # (分数, 匹配类型, item_id)，最后只为前 limit 个生成结果
+        matches = []
+
+        for term_id in self.exact.get(query, ()):
+            _, item_id, kind, _ = self.terms[term_id]
+            matches.append((1.0, f"exact_{kind}", item_id))
+
+        for item_id in self.barcodes.get(query, ()):
+            matches.append((1.0, "exact_barcode", item_id))
+
+        query_trigrams = trigrams(query)
+        matched = set(self._substring_terms(query))
+        for term_id in matched:
+            text, item_id, kind, term_trigrams = self.terms[term_id]
+            if text != query:
+                matches.append((similarity(term_trigrams, query_trigrams), FUZZY_MATCH[kind], item_id))
+
+        matches = [match for match in matches if self._is_active(match[2])]
+
+        # 包含关键词的结果不够时，再按拼写相近补充（已经匹配的物料不重复返回）
+        if len(matches) < limit:
+            found = {match[2] for match in matches}
+            matched.update(self.exact.get(query, ()))
+            for term_id, score in self._similar_terms(query_trigrams, matched).items():
+                _, item_id, kind, _ = self.terms[term_id]
+                if item_id not in found and self._is_active(item_id):
+                    matches.append((score, FUZZY_MATCH[kind], item_id))
+
+        top = heapq.nsmallest(limit, matches, key=lambda match: (-match[0], match[1]))
+        return [self._result(item_id, match_type, score) for score, match_type, item_id in top]
+
+
+class MaterialSearchIndex:
+    """材料搜索索引（单例）"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data: Optional[SearchIndexData] = None
+        self._loaded_at: Optional[float] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # 输入联想：最近查询的结果（索引变化时清空）和正在执行的查询
+        self._recent: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def _fetch_all(self, db, table: str, columns: str) -> List[dict]:
+        rows = []
+        start = 0
+        while True:
+            result = await db.table(table).select(columns).order("id").range(
+                start, start + PAGE_SIZE - 1
+            ).execute()
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    @staticmethod
+    def _build(items: List[dict], aliases: List[dict], categories: List[dict]) -> SearchIndexData:
+        data = SearchIndexData()
+        data.categories = {category["id"]: category["name"] for category in categories}
+        for item in items:
+            data.upsert_item(item)
+        for alias in aliases:
+            data.add_alias(alias)
+        return data
+
+    async def _load(self, db) -> None:
+        generation = self._generation
+        items, aliases, categories = await asyncio.gather(
+            self._fetch_all(db, "items", "*"),
+            self._fetch_all(db, "item_aliases", "id, item_id, alias"),
+            self._fetch_all(db, "categories", "id, name")
+        )
+        # 构建索引是纯 CPU 操作，放到线程池中
+        self._data = await run_in_threadpool(self._build, items, aliases, categories)
+        self._recent.clear()
+        # 加载期间有增量更新时不标记为最新，下次查询时再加载一次
+        self._loaded_at = time.monotonic() if generation == self._generation else None
+
+    async def load(self, db) -> None:
+        """从数据库加载并构建索引"""
+        async with self._lock:
+            await self._load(db)
+
+    async def _refresh(self, db) -> None:
+        try:
+            await self.load(db)
+        except Exception:
+            logger.exception("Failed to refresh material search index")
+
+    async def search(self, db, query: str, limit: int = RESULT_LIMIT) -> List[dict]:
+        """搜索材料；索引过期时先返回当前结果，在后台重新加载"""
+        if self._data is None:
+            async with self._lock:
+                if self._data is None:
+                    await self._load(db)
+        elif self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh(db))
+
+        return self._data.search(query, limit)
+
+    async def _typeahead_search(self, db, key: str) -> List[dict]:
+        generation = self._generation
+        results = await self.search(db, key)
+        if generation == self._generation:
+            self._recent[key] = results
+            while len(self._recent) > TYPEAHEAD_CACHE_SIZE:
+                self._recent.popitem(last=False)
+        return results
+
+    async def typeahead(self, db, query: str, limit: int = RESULT_LIMIT) -> List[dict]:
+        """输入联想：最近查询过的关键词直接返回缓存结果，
+        相同的关键词同时到达时（例如索引正在加载）只查询一次"""
+        key = query.lower()
+        results = self._recent.get(key)
+        if results is not None:
+            self._recent.move_to_end(key)
+            return results[:limit]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._typeahead_search(db, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return (await asyncio.shield(task))[:limit]
+
+    def lookup_barcodes(self, barcodes: Iterable[str]) -> Dict[str, dict]:
+        """按条码查找物料，返回 {条码: 物料行}（未找到的条码和索引尚未加载时不包含在内）"""
+        if self._data is None:
+            return {}
+        found = {}
+        for barcode in barcodes:
+            item = self._data.lookup_barcode(barcode)
+            if item is not None:
+                found[barcode] = item
+        return found
+
+    def _update(self, method: str, *args) -> None:
+        self._generation += 1
+        self._recent.clear()
+        if self._data is not None:
+            getattr(self._data, method)(*args)
+
+    def invalidate(self) -> None:
+        """标记为过期，下次搜索时在后台重新加载"""
+        self._generation += 1
+        self._loaded_at = None
+        self._recent.clear()
+
+    def upsert_item(self, item: dict) -> None:
+        self._update("upsert_item", item)
+
+    def apply_stock_changes(self, changes: Iterable[Tuple[str, float, float]]) -> None:
+        """
+        出入库后调用：按 (item_id, before_quantity, after_quantity) 更新 current_stock，
+        数据来自出入库 RPC 的返回值，不再读取数据库（current_stock 是各库位库存的合计，
+        每次变化量为 after - before）。物料不在索引中时标记为过期
+        """
+        if self._data is None:
+            return
+
+        stale = False
+        for item_id, before, after in changes:
+            delta = float(after or 0) - float(before or 0)
+            if not self._data.adjust_stock(item_id, delta):
+                stale = True
+
+        self._generation += 1
+        self._recent.clear()
+        if stale:
+            self.invalidate()
+
+    def remove_item(self, item_id: str) -> None:
+        self._update("remove_item", item_id)
+
+    def add_alias(self, alias: dict) -> None:
+        self._update("add_alias", alias)
+
+    def remove_alias(self, alias_id: str) -> None:
+        self._update("remove_alias", alias_id)
+
+
+# 创建单例
+material_search_index = MaterialSearchIndex(settings.SEARCH_INDEX_TTL)
@@ -0,0 +1,193 @@
+"""
+存储服务 - 统一的文件存储接口
+支持 Supabase Storage、AWS S3 和本地磁盘（STORAGE_BACKEND 配置）
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Optional
+
+from app.config import settings
+from app.database import get_supabase_admin
+from app.services.s3_service import get_s3_service
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    @property
+    def storage_id(self) -> str:
+        """存储位置（后端类型和 bucket），image_objects 按它区分不同后端中的文件"""
+        raise NotImplementedError
+
+    async def save(self, path: str, data: bytes, content_type: str) -> None:
+        """保存文件内容"""
+        raise NotImplementedError
+
+    async def save_file(self, path: str, file: BinaryIO, content_type: str) -> None:
+        """保存文件对象（默认读入内存后调用 save）"""
+        file.seek(0)
+        data = await asyncio.to_thread(file.read)
+        await self.save(path, data, content_type)
+
+    async def delete(self, paths: List[str]) -> None:
+        """删除文件"""
+        raise NotImplementedError
+
+    async def public_url(self, path: str) -> str:
+        """获取公开访问 URL"""
+        raise NotImplementedError
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """Supabase Storage"""
+
+    @property
+    def storage_id(self) -> str:
+        return f"supabase:{self.bucket}"
+
+    async def save(self, path: str, data: bytes, content_type: str) -> None:
+        db = await get_supabase_admin()
+        # 路径由内容哈希生成，同一路径重复写入的是相同内容
+        await db.storage.from_(self.bucket).upload(
+            path,
+            data,
+            {
+                "content-type": content_type,
+                "cache-control": "3600",
+                "upsert": "true"
+            }
+        )
+
+    async def delete(self, paths: List[str]) -> None:
+        db = await get_supabase_admin()
+        await db.storage.from_(self.bucket).remove(paths)
+
+    async def public_url(self, path: str) -> str:
+        db = await get_supabase_admin()
+        return await db.storage.from_(self.bucket).get_public_url(path)
+
+
+class S3StorageBackend(StorageBackend):
+    """AWS S3（bucket 作为对象键的前缀）"""
+
+    @property
+    def storage_id(self) -> str:
+        return f"s3:{get_s3_service().bucket_name}/{self.bucket}"
+
+    def _key(self, path: str) -> str:
+        return f"{self.bucket}/{path}"
+
+    async def save(self, path: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(get_s3_service().put_object, self._key(path), data, content_type, {})
+
+    async def delete(self, paths: List[str]) -> None:
+        service = get_s3_service()
+        # 引用计数已由调用方释放（image_object_registry.release），这里直接删除对象
+        await asyncio.gather(*(asyncio.to_thread(service.delete_object, self._key(path)) for path in paths))
+
+    async def public_url(self, path: str) -> str:
+        return get_s3_service().get_public_url(self._key(path))
+
+
+class LocalStorageBackend(StorageBackend):
+    """本地磁盘，文件由 /api/uploads/files 提供访问"""
+
+    def __init__(self, bucket: str, root: str, base_url: str):
+        super().__init__(bucket)
+        self.root = os.path.realpath(os.path.join(root, bucket))
+        self.base_url = base_url.rstrip("/")
+
+    @property
+    def storage_id(self) -> str:
+        return f"local:{self.bucket}"
+
+    def resolve(self, path: str) -> str:
+        """存储路径 -> 磁盘路径（禁止访问存储目录之外的文件）"""
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([full_path, self.root]) != self.root or full_path == self.root:
+            raise ValueError(f"Invalid storage path: {path}")
+        return full_path
+
+    def _write(self, path: str, write) -> None:
+        """先写入临时文件再重命名，读取方不会看到写了一半的文件"""
+        full_path = self.resolve(path)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                write(out)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def save(self, path: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(self._write, path, lambda out: out.write(data))
+
+    async def save_file(self, path: str, file: BinaryIO, content_type: str) -> None:
+        def copy(out):
+            file.seek(0)
+            try:
+                # 有文件描述符的文件直接由内核复制，不经过 Python
+                # （还在内存中的 SpooledTemporaryFile 调用 fileno() 时会先写入临时文件）
+                in_fd = file.fileno()
+                size = os.fstat(in_fd).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset == size:
+                    return
+            except (AttributeError, OSError):
+                # 不支持 fileno/sendfile 的文件对象（BytesIO 等）或平台
+                pass
+            file.seek(0)
+            out.seek(0)
+            out.truncate()
+            shutil.copyfileobj(file, out)
+
+        await asyncio.to_thread(self._write, path, copy)
+
+    async def delete(self, paths: List[str]) -> None:
+        def remove():
+            for path in paths:
+                try:
+                    os.remove(self.resolve(path))
+                except FileNotFoundError:
+                    pass
+
+        await asyncio.to_thread(remove)
+
+    async def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{self.bucket}/{path}"
+
+
+_backends: Dict[str, StorageBackend] = {}
+
+
+def get_storage(bucket: str = "request-images") -> StorageBackend:
+    """获取存储后端（每个 bucket 一个实例），bucket 不在 STORAGE_BUCKETS 中时抛出 ValueError"""
+    backend: Optional[StorageBackend] = _backends.get(bucket)
+    if backend is None:
+        # bucket 可能来自请求路径，只为配置的 bucket 创建实例
+        if bucket not in settings.storage_buckets_list:
+            raise ValueError(f"Unknown storage bucket: {bucket}")
+        if settings.STORAGE_BACKEND == "local":
+            backend = LocalStorageBackend(bucket, settings.LOCAL_STORAGE_PATH, settings.LOCAL_STORAGE_URL)
+        elif settings.STORAGE_BACKEND == "s3":
+            backend = S3StorageBackend(bucket)
+        elif settings.STORAGE_BACKEND == "supabase":
+            backend = SupabaseStorageBackend(bucket)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+        _backends[bucket] = backend
+    return backend
@@ -0,0 +1,70 @@
+"""
+未读通知计数缓存 - 每个用户的未读数量（LRU + TTL）
+通知 API 的写操作直接更新计数；其他途径（触发器）创建的通知
+由 notification_hub 事件失效，或在 TTL 到期后重新查询；
+notification_hub 没有订阅时不使用缓存（GET /notifications/unread-count）
+"""
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import settings
+
+
+class UnreadCounterCache:
+    """按 user_id 缓存未读通知数量"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._counts: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[int]:
+        """返回缓存的数量，没有缓存或已过期时返回 None"""
+        entry = self._counts.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            self._counts.pop(user_id, None)
+            self.misses += 1
+            return None
+
+        self._counts.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id: str, count: int) -> None:
+        """写入数量（超过容量时移除最久未使用的用户）"""
+        self._counts[user_id] = (max(count, 0), time.monotonic() + self.ttl)
+        self._counts.move_to_end(user_id)
+        while len(self._counts) > self.max_size:
+            self._counts.popitem(last=False)
+
+    def adjust(self, user_id: str, delta: int) -> None:
+        """增减已缓存的数量（没有缓存时不处理，下次查询时从数据库读取）"""
+        entry = self._counts.get(user_id)
+        if entry is not None:
+            self._counts[user_id] = (max(entry[0] + delta, 0), entry[1])
+
+    def invalidate(self, user_id: str) -> None:
+        self._counts.pop(user_id, None)
+
+    def clear(self) -> None:
+        """清空所有缓存（notification_hub 订阅中断时）"""
+        self._counts.clear()
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._counts),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# 创建单例
+unread_counter = UnreadCounterCache(settings.UNREAD_CACHE_SIZE, settings.UNREAD_CACHE_TTL)
@@ -0,0 +1,81 @@
+"""
+传输字节基准测试 - ConditionalCompressionMiddleware（app/middleware.py）
+
+对典型的列表响应分别请求 identity / gzip / br，以及带 If-None-Match 的重新验证，
+输出每种方式的传输字节数和中间件耗时
+
+用法（在 backend 目录下）:
+    python -m scripts.bench_compression --rows 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.middleware import ConditionalCompressionMiddleware, brotli
+from app.models import Item, RequestWithDetails
+from app.responses import fast_json
+from scripts.bench_serialization import make_items, make_requests
+
+
+def create_app(rows: int) -> FastAPI:
+    requests = make_requests(rows, 5)
+    items = make_items(rows * 10)
+
+    app = FastAPI()
+    app.add_middleware(ConditionalCompressionMiddleware, minimum_size=1024)
+
+    @app.get("/requests")
+    async def list_requests():
+        return fast_json(requests, RequestWithDetails)
+
+    @app.get("/items")
+    async def list_items():
+        return fast_json(items, Item)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict, repeat: int) -> tuple:
+    """返回 (响应, 平均耗时秒)"""
+    response = await client.get(path, headers=headers)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await client.get(path, headers=headers)
+    return response, (time.perf_counter() - start) / repeat
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes on the wire with ETag/gzip/brotli")
+    parser.add_argument("--rows", type=int, default=100, help="Requests per page (items: rows x 10)")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    transport = httpx.ASGITransport(app=create_app(args.rows))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/requests", "/items"):
+            identity_size = None
+            for encoding in encodings:
+                response, elapsed = await measure(client, path, {"accept-encoding": encoding}, args.repeat)
+                size = len(response.content) if encoding == "identity" else int(response.headers["content-length"])
+                identity_size = identity_size or size
+                print(
+                    f"{path:<10} {encoding:<9} {size / 1024:8.1f} KB  "
+                    f"{size / identity_size:6.1%}  {elapsed * 1000:6.2f} ms"
+                )
+
+            etag = response.headers["etag"]
+            revalidated, elapsed = await measure(
+                client, path, {"accept-encoding": encodings[-1], "if-none-match": etag}, args.repeat
+            )
+            print(
+                f"{path:<10} {'304':<9} {len(revalidated.content):8d} B   "
+                f"{'-':>6}  {elapsed * 1000:6.2f} ms  (status {revalidated.status_code})"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""
+序列化基准测试 - 对比 FastAPI response_model 序列化与 fast_json（app/responses.py）
+
+用同样的数据分别走两条路径：
+- response_model: FastAPI 的 serialize_response（逐行校验 + jsonable_encoder）+ json.dumps
+- fast_json: 按模型字段裁剪 + orjson
+并检查两者输出的字段相同
+
+用法（在 backend 目录下）:
+    python -m scripts.bench_serialization --rows 100 --items 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import Item, RequestWithDetails
+from app.responses import fast_json
+
+TIMESTAMP = "2024-05-01T10:00:00.123456+00:00"
+
+
+def make_requests(count: int, items_per_request: int) -> List[dict]:
+    """与 GET /requests 的数据库返回结构相同的数据（包含模型以外的列）"""
+    worker = {
+        "id": "worker-1", "email": "worker@example.com", "full_name": "Max Müller", "role": "worker",
+        "phone": None, "company": "MAFC", "created_at": TIMESTAMP, "updated_at": TIMESTAMP
+    }
+    baustelle = {
+        "id": "baustelle-1", "name": "Baustelle Nord", "address": "Hauptstraße 1", "city": "Berlin",
+        "postal_code": "10115", "is_active": True, "created_at": TIMESTAMP, "updated_at": TIMESTAMP
+    }
+    item = {
+        "id": "item-1", "name": "Schraube M8", "type": "material", "unit": "Stk", "description": None,
+        "stock_quantity": 12.5, "min_stock_level": 3, "image_url": None, "is_active": True,
+        "barcode": "4006381333931", "current_stock": 12.5, "min_stock": 3, "category_id": None,
+        "baustelle_id": None, "created_at": TIMESTAMP, "updated_at": TIMESTAMP
+    }
+    return [
+        {
+            "id": f"request-{i}", "request_number": f"REQ-{i:05d}", "worker_id": "worker-1",
+            "baustelle_id": "baustelle-1", "priority": "normal", "needed_date": "2024-05-02",
+            "delivery_time": None, "notes": None, "status": "pending", "created_at": TIMESTAMP,
+            "updated_at": TIMESTAMP, "confirmed_at": None, "confirmed_by": None, "completed_at": None,
+            "worker": worker,
+            "baustelle": baustelle,
+            "items": [
+                {
+                    "id": f"request-item-{i}-{j}", "request_id": f"request-{i}", "item_id": "item-1",
+                    "quantity": 2, "unit": "Stk", "notes": None, "created_at": TIMESTAMP, "item": item
+                }
+                for j in range(items_per_request)
+            ],
+            "images": [
+                {"id": f"image-{i}", "request_id": f"request-{i}", "image_url": "https://example.com/a.jpg",
+                 "uploaded_at": TIMESTAMP}
+            ]
+        }
+        for i in range(count)
+    ]
+
+
+def make_items(count: int) -> List[dict]:
+    return [
+        {
+            "id": f"item-{i}", "name": f"Schraube M{i % 20}", "type": "material", "unit": "Stk",
+            "description": "Verzinkt", "stock_quantity": i, "min_stock_level": 5, "image_url": None,
+            "is_active": True, "barcode": f"400638{i:07d}", "current_stock": i, "min_stock": 5,
+            "category_id": "category-1", "baustelle_id": None, "created_at": TIMESTAMP, "updated_at": TIMESTAMP
+        }
+        for i in range(count)
+    ]
+
+
+async def response_model_body(field, rows) -> bytes:
+    """FastAPI 处理 response_model 的方式（JSONResponse 的 json.dumps 参数）"""
+    content = await serialize_response(field=field, response_content=rows, is_coroutine=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def field_names(value):
+    """输出的字段结构（忽略值的表示方式，例如 Decimal 与数字）"""
+    if isinstance(value, dict):
+        return {key: field_names(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [field_names(item) for item in value[:1]]
+    return None
+
+
+async def bench(name: str, model, rows: List[dict], repeat: int) -> None:
+    field = create_response_field(name=name, type_=List[model])
+
+    slow_body = await response_model_body(field, rows)
+    fast_body = fast_json(rows, model).body
+    if field_names(json.loads(slow_body)) != field_names(json.loads(fast_body)):
+        raise SystemExit(f"{name}: fast_json output fields differ from response_model")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await response_model_body(field, rows)
+    slow = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fast_json(rows, model)
+    fast = (time.perf_counter() - start) / repeat
+
+    print(
+        f"{name:<28} response_model {slow * 1000:8.2f} ms   fast_json {fast * 1000:7.2f} ms   "
+        f"{slow / fast:4.1f}x   {len(fast_body) / 1024:7.1f} KB"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="response_model vs fast_json serialization benchmark")
+    parser.add_argument("--rows", type=int, default=100, help="Requests per page")
+    parser.add_argument("--items", type=int, default=5, help="Items per request")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    await bench(
+        f"requests x{args.rows} ({args.items} items)", RequestWithDetails,
+        make_requests(args.rows, args.items), args.repeat
+    )
+    await bench(f"items x{args.rows * 10}", Item, make_items(args.rows * 10), args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
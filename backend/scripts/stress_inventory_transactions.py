@@ -0,0 +1,141 @@
+"""
+出入库并发压力测试 - 验证 apply_inventory_transaction() 在并发调用时不丢失库存更新
+
+对同一物料/库位并发发起 N 次入库 RPC，再并发发起 N 次出库 RPC，检查：
+- 每个阶段结束后 inventory.quantity 和 items.current_stock 等于预期值
+- 出入库记录的 before/after 数量首尾相接（每次更新都基于上一次的结果）
+两个阶段数量相抵，运行结束后库存恢复原值，但会留下 2N 条出入库记录（notes 带运行标记），
+请在测试/预发布数据库上运行。
+
+用法（在 backend 目录下，使用 .env 中的 Supabase 配置）:
+    python -m scripts.stress_inventory_transactions \\
+        --item-id <物料ID> --location-id <库位ID> --operator-id <用户ID> --calls 50
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from decimal import Decimal
+from typing import List
+
+from supabase import AsyncClient, acreate_client
+
+from app.config import settings
+
+
+async def read_stock(supabase: AsyncClient, item_id: str, location_id: str) -> tuple:
+    """返回 (inventory.quantity, items.current_stock)"""
+    inventory_result, item_result = await asyncio.gather(
+        supabase.table("inventory").select("quantity")
+        .eq("item_id", item_id).eq("location_id", location_id).execute(),
+        supabase.table("items").select("current_stock").eq("id", item_id).execute()
+    )
+    if not item_result.data:
+        raise SystemExit(f"Item {item_id} not found")
+    quantity = Decimal(str(inventory_result.data[0]["quantity"])) if inventory_result.data else Decimal(0)
+    return quantity, Decimal(str(item_result.data[0]["current_stock"] or 0))
+
+
+async def run_phase(
+    supabase: AsyncClient,
+    item_id: str,
+    location_id: str,
+    operator_id: str,
+    transaction_type: str,
+    calls: int,
+    notes: str
+) -> List[str]:
+    """并发调用 calls 次 apply_inventory_transaction（每次数量 1），返回错误信息"""
+    async def call():
+        try:
+            await supabase.rpc("apply_inventory_transaction", {
+                "p_item_id": item_id,
+                "p_location_id": location_id,
+                "p_transaction_type": transaction_type,
+                "p_quantity": 1,
+                "p_operator_id": operator_id,
+                "p_notes": notes
+            }).execute()
+        except Exception as e:
+            return str(e)
+        return None
+
+    results = await asyncio.gather(*[call() for _ in range(calls)])
+    return [error for error in results if error is not None]
+
+
+def check_ledger(rows: List[dict], start: Decimal, end: Decimal) -> List[str]:
+    """出入库记录按 before_quantity 串起来应从 start 连续走到 end"""
+    problems = []
+    by_before = {}
+    for row in rows:
+        before = Decimal(str(row["before_quantity"]))
+        if before in by_before:
+            problems.append(f"two transactions started from the same quantity {before} (lost update)")
+        by_before[before] = Decimal(str(row["after_quantity"]))
+
+    quantity = start
+    for _ in range(len(rows)):
+        if quantity not in by_before:
+            problems.append(f"ledger chain broken at {quantity}")
+            return problems
+        quantity = by_before[quantity]
+    if quantity != end:
+        problems.append(f"ledger chain ends at {quantity}, expected {end}")
+    return problems
+
+
+async def stress(supabase: AsyncClient, item_id: str, location_id: str, operator_id: str, calls: int) -> bool:
+    notes = f"stress-test {uuid.uuid4()}"
+    start_quantity, start_stock = await read_stock(supabase, item_id, location_id)
+    print(f"start: inventory.quantity={start_quantity} items.current_stock={start_stock}")
+
+    ok = True
+    phases = (("in", calls), ("out", -calls))
+    expected_quantity = start_quantity
+    for transaction_type, delta in phases:
+        errors = await run_phase(supabase, item_id, location_id, operator_id, transaction_type, calls, notes)
+        phase_start = expected_quantity
+        expected_quantity += delta
+        quantity, stock = await read_stock(supabase, item_id, location_id)
+
+        ledger = await supabase.table("inventory_transactions").select(
+            "before_quantity, after_quantity"
+        ).eq("notes", notes).eq("transaction_type", transaction_type).execute()
+        problems = check_ledger(ledger.data or [], phase_start, expected_quantity)
+
+        print(
+            f"{transaction_type} x{calls}: inventory.quantity={quantity} (expected {expected_quantity}), "
+            f"items.current_stock={stock} (expected {start_stock + expected_quantity - start_quantity}), "
+            f"ledger rows={len(ledger.data or [])}, errors={len(errors)}"
+        )
+        for message in errors[:5] + problems[:5]:
+            print(f"  {message}")
+
+        if (
+            errors or problems
+            or quantity != expected_quantity
+            or stock != start_stock + expected_quantity - start_quantity
+            or len(ledger.data or []) != calls
+        ):
+            ok = False
+
+    print("OK: no lost updates" if ok else "FAILED")
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent apply_inventory_transaction stress test")
+    parser.add_argument("--item-id", required=True)
+    parser.add_argument("--location-id", required=True)
+    parser.add_argument("--operator-id", required=True)
+    parser.add_argument("--calls", type=int, default=50, help="Concurrent RPC calls per phase")
+    args = parser.parse_args()
+
+    supabase = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    ok = await stress(supabase, args.item_id, args.location_id, args.operator_id, args.calls)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,84 @@
+"""
+测试工具 - 用 httpx.MockTransport 模拟 PostgREST，记录每次数据库请求
+"""
+import asyncio
+import os
+from typing import Callable, Dict, List, Union
+
+# app.config 在导入时读取环境变量
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+
+import httpx
+import pytest
+from supabase import AsyncClientOptions, acreate_client
+
+from app.database import get_supabase, get_supabase_admin
+from app.main import app
+
+Fixture = Union[list, dict, Callable[[httpx.Request], httpx.Response]]
+
+
+class FakeSupabase:
+    """按表名（或 rpc/函数名）返回固定数据的 PostgREST"""
+
+    def __init__(self):
+        self.fixtures: Dict[str, Fixture] = {}
+        self.calls: List[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        resource = request.url.path.split("/rest/v1/", 1)[-1]
+        data = self.fixtures.get(resource, [])
+        if callable(data):
+            return data(request)
+        headers = {}
+        if isinstance(data, list):
+            headers["content-range"] = f"0-{max(len(data) - 1, 0)}/{len(data)}"
+        return httpx.Response(200, json=data, headers=headers)
+
+    def calls_to(self, resource: str) -> List[httpx.Request]:
+        return [call for call in self.calls if call.url.path.endswith(f"/rest/v1/{resource}")]
+
+    async def client(self):
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return await acreate_client(
+            os.environ["SUPABASE_URL"],
+            os.environ["SUPABASE_KEY"],
+            AsyncClientOptions(httpx_client=http_client)
+        )
+
+
+class ApiClient:
+    """同步调用 ASGI 应用（不运行 lifespan）"""
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return asyncio.run(self._request(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.request(method, url, **kwargs)
+
+
+@pytest.fixture
+def fake_supabase():
+    return FakeSupabase()
+
+
+@pytest.fixture
+def api(fake_supabase):
+    """数据库依赖替换为 fake_supabase 的 API 客户端"""
+    app.dependency_overrides[get_supabase] = fake_supabase.client
+    app.dependency_overrides[get_supabase_admin] = fake_supabase.client
+    try:
+        yield ApiClient()
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,60 @@
+"""POST /api/wms/barcode/batch: 物料来自搜索索引的条码表，只查询库存；索引中没有的条码查询数据库"""
+import pytest
+
+from app.services import search_index
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = search_index.MaterialSearchIndex(ttl=3600)
+    monkeypatch.setattr("app.routers.wms.material_search_index", fresh)
+    return fresh
+
+
+def test_missing_barcodes_are_one_query(api, fake_supabase, index):
+    fake_supabase.fixtures["items"] = [
+        {"id": "item-1", "name": "Schraube", "barcode": "4001", "current_stock": 12,
+         "inventory": [{"location_id": "loc-1", "quantity": 12, "storage_locations": {"name": "A-01"}}]},
+        {"id": "item-2", "name": "Kabel", "barcode": "4002", "current_stock": None, "inventory": []},
+    ]
+
+    response = api.post("/api/wms/barcode/batch", json={"barcodes": ["4002", "9999", "4001"]})
+
+    assert response.status_code == 200
+    assert [row["found"] for row in response.json()] == [True, False, True]
+    kabel, missing, schraube = response.json()
+    assert kabel["current_stock"] == 0
+    assert missing["barcode"] == "9999"
+    assert schraube["locations"] == [{"location_id": "loc-1", "location_name": "A-01", "quantity": 12}]
+    assert "inventory" not in schraube["item"]
+
+    (call,) = fake_supabase.calls
+    assert call.url.params["barcode"] == "in.(4002,9999,4001)"
+
+
+def test_indexed_barcodes_only_query_inventory(api, fake_supabase, index):
+    index._data = index._build(
+        [{"id": "item-1", "name": "Schraube", "barcode": "AB-4001", "unit": "Stk",
+          "current_stock": 5, "is_active": True, "description": "M8"}],
+        [], []
+    )
+    fake_supabase.fixtures["inventory"] = [
+        {"item_id": "item-1", "location_id": "loc-1", "quantity": 12, "storage_locations": {"name": "A-01"}},
+        {"item_id": "item-1", "location_id": "loc-2", "quantity": 3, "storage_locations": {"name": "B-02"}},
+    ]
+
+    response = api.post("/api/wms/barcode/batch", json={"barcodes": ["AB-4001", "ab-4001"]})
+
+    assert response.status_code == 200
+    schraube, lowercase = response.json()
+    assert schraube["found"] is True
+    assert schraube["item"]["description"] == "M8"
+    assert schraube["current_stock"] == 15
+    assert [location["location_name"] for location in schraube["locations"]] == ["A-01", "B-02"]
+
+    # 条码区分大小写：ab-4001 不在索引中，按条码查询数据库
+    assert lowercase["found"] is False
+    inventory_call, = fake_supabase.calls_to("inventory")
+    assert inventory_call.url.params["item_id"] == "in.(item-1)"
+    items_call, = fake_supabase.calls_to("items")
+    assert items_call.url.params["barcode"] == "in.(ab-4001)"
@@ -0,0 +1,98 @@
+"""GET /statistics/baustelle-stats: 按 (状态, 优先级) 分组计数，数据库函数未部署 (PGRST202) 时的 Python 计数结果相同"""
+import json
+from collections import Counter
+
+import httpx
+
+REQUESTS = [
+    {"status": status, "priority": priority, "created_at": f"2024-01-{day:02d}T08:00:00"}
+    for day, (status, priority) in enumerate([
+        ("pending", "normal"), ("pending", "urgent"), ("completed", "normal"),
+        ("completed", "normal"), ("cancelled", "low"), ("pending", "normal"),
+    ], start=1)
+]
+
+
+def in_range(request, date_from, date_to):
+    return (date_from is None or request["created_at"] >= date_from) and \
+        (date_to is None or request["created_at"] <= date_to)
+
+
+def use_rpc(fake_supabase):
+    """baustelle_request_stats() 的查询语义（statistics_functions.sql）"""
+    def rpc(request: httpx.Request) -> httpx.Response:
+        args = json.loads(request.content)
+        groups = Counter(
+            (row["status"], row["priority"]) for row in REQUESTS
+            if in_range(row, args["date_from"], args["date_to"])
+        )
+        return httpx.Response(200, json=[
+            {"status": status, "priority": priority, "request_count": count}
+            for (status, priority), count in groups.items()
+        ])
+
+    fake_supabase.fixtures["rpc/baustelle_request_stats"] = rpc
+
+
+def use_fallback(fake_supabase):
+    def missing_function(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={
+            "code": "PGRST202",
+            "message": "Could not find the function public.baustelle_request_stats in the schema cache",
+            "details": None,
+            "hint": None
+        })
+
+    def requests(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["select"] == "status,priority"
+        assert request.url.params["baustelle_id"] == "eq.baustelle-1"
+        filters = request.url.params.get_list("created_at")
+        date_from = next((f[len("gte."):] for f in filters if f.startswith("gte.")), None)
+        date_to = next((f[len("lte."):] for f in filters if f.startswith("lte.")), None)
+        return httpx.Response(200, json=[
+            {"status": row["status"], "priority": row["priority"]}
+            for row in REQUESTS if in_range(row, date_from, date_to)
+        ])
+
+    fake_supabase.fixtures["rpc/baustelle_request_stats"] = missing_function
+    fake_supabase.fixtures["requests"] = requests
+
+
+def baustelle_stats(api, **params):
+    response = api.get("/statistics/baustelle-stats", params={"baustelle_id": "baustelle-1", **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_groups_are_summed(api, fake_supabase):
+    use_rpc(fake_supabase)
+
+    assert baustelle_stats(api) == {
+        "total_requests": 6,
+        "by_status": {"pending": 3, "completed": 2, "cancelled": 1},
+        "by_priority": {"normal": 4, "urgent": 1, "low": 1},
+    }
+    assert fake_supabase.calls_to("requests") == []
+
+
+def test_fallback_matches_rpc(api, fake_supabase):
+    for params in ({}, {"start_date": "2024-01-02", "end_date": "2024-01-04T23:59:59"}):
+        use_rpc(fake_supabase)
+        from_rpc = baustelle_stats(api, **params)
+
+        use_fallback(fake_supabase)
+        assert baustelle_stats(api, **params) == from_rpc
+
+    # 日期范围内只有 1 月 2 日到 4 日的申请
+    assert from_rpc["total_requests"] == 3
+
+
+def test_other_errors_are_not_swallowed(api, fake_supabase):
+    fake_supabase.fixtures["rpc/baustelle_request_stats"] = lambda request: httpx.Response(
+        400, json={"code": "22P02", "message": "invalid input syntax for type uuid", "details": None, "hint": None}
+    )
+
+    response = api.get("/statistics/baustelle-stats", params={"baustelle_id": "baustelle-1"})
+
+    assert response.status_code == 500
+    assert fake_supabase.calls_to("requests") == []
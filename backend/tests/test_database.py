@@ -0,0 +1,40 @@
+"""init_supabase: anon 客户端和 service role 客户端各自带自己的密钥"""
+import asyncio
+
+import httpx
+
+from app import database
+
+
+def test_admin_and_anon_clients_send_their_own_keys(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[])
+
+    monkeypatch.setattr(
+        database, "_create_http_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+    async def run():
+        await database.close_supabase()
+        try:
+            admin = await database.get_supabase_admin()
+            anon = await database.get_supabase()
+            await admin.table("items").select("id").execute()
+            await anon.table("items").select("id").execute()
+            await admin.table("items").select("id").execute()
+        finally:
+            await database.close_supabase()
+
+    asyncio.run(run())
+
+    admin_first, anon_call, admin_second = requests
+    for call in (admin_first, admin_second):
+        assert call.headers["apikey"] == "test-service-key"
+        assert call.headers["authorization"] == "Bearer test-service-key"
+    assert anon_call.headers["apikey"] == "test-anon-key"
+    assert anon_call.headers["authorization"] == "Bearer test-anon-key"
+    assert all(call.url.path == "/rest/v1/items" for call in requests)
@@ -0,0 +1,13 @@
+"""fields=: 只查询和返回选择的字段，没有选择的嵌入数据不查询"""
+
+
+def test_unselected_embeds_are_not_queried(api, fake_supabase):
+    fake_supabase.fixtures["requests"] = [
+        {"id": f"req-{i}", "status": "pending"} for i in range(10)
+    ]
+
+    response = api.get("/requests/", params={"limit": 10, "fields": "id,status"})
+
+    assert response.status_code == 200
+    assert response.json()[0] == {"id": "req-0", "status": "pending"}
+    assert [call.url.path.rsplit("/", 1)[-1] for call in fake_supabase.calls] == ["requests"]
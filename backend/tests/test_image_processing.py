@@ -0,0 +1,43 @@
+"""render_renditions: 每个版本的尺寸与单独从原图缩放的结果相同"""
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.image_processing import DEFAULT_RENDITIONS, render_renditions
+
+
+def jpeg(width, height):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 80, 40)).save(output, format="JPEG")
+    return output.getvalue()
+
+
+def expected_size(source, max_size):
+    image = Image.new("RGB", source)
+    image.thumbnail(max_size)
+    return image.size
+
+
+@pytest.mark.parametrize("renditions", [
+    DEFAULT_RENDITIONS,
+    # 宽幅和方形版本：面积小的 banner 不能基于 square 缩放
+    {"banner": (2000, 100), "square": (500, 500), "icon": (64, 64)},
+    {"tall": (200, 1600), "wide": (1600, 200)},
+])
+@pytest.mark.parametrize("source", [(4000, 3000), (3000, 4000), (4000, 400)])
+def test_renditions_match_direct_resize(renditions, source):
+    rendered = render_renditions(jpeg(*source), renditions)
+
+    for name, max_size in renditions.items():
+        width, height = expected_size(source, max_size)
+        # 基于较大版本缩放时最多有 1 像素的取整误差
+        assert abs(rendered[name]["width"] - width) <= 1, name
+        assert abs(rendered[name]["height"] - height) <= 1, name
+
+
+def test_webp_copies():
+    rendered = render_renditions(jpeg(1200, 900), {"thumbnail": (300, 300)}, webp=True)
+
+    assert rendered["thumbnail_webp"]["content_type"] == "image/webp"
+    assert Image.open(io.BytesIO(rendered["thumbnail_webp"]["body"])).size == (300, 225)
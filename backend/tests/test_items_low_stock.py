@@ -0,0 +1,33 @@
+"""GET /items?low_stock=true: 在数据库中筛选；未部署 is_low_stock 列时在 Python 中过滤"""
+import httpx
+
+
+def test_low_stock_is_filtered_in_the_database(api, fake_supabase):
+    fake_supabase.fixtures["items"] = [{"id": "item-1", "name": "Schraube"}]
+
+    response = api.get("/items/", params={"low_stock": "true"})
+
+    assert response.status_code == 200
+    (call,) = fake_supabase.calls_to("items")
+    assert call.url.params["is_low_stock"] == "eq.true"
+
+
+def test_missing_column_falls_back_to_python_filter(api, fake_supabase):
+    rows = [
+        {"id": "item-1", "name": "Kabel", "stock_quantity": "5", "min_stock_level": "5"},
+        {"id": "item-2", "name": "Schraube", "stock_quantity": "12", "min_stock_level": "5"},
+    ]
+
+    def items(request):
+        if "is_low_stock" in request.url.params:
+            return httpx.Response(400, json={
+                "code": "42703", "message": "column items.is_low_stock does not exist", "details": None, "hint": None
+            })
+        return httpx.Response(200, json=rows)
+
+    fake_supabase.fixtures["items"] = items
+
+    response = api.get("/items/", params={"low_stock": "true"})
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == ["item-1"]
@@ -0,0 +1,47 @@
+"""GET /items, /api/wms/inventory: ETag 按表版本计算，数据没有变化时不执行列表查询"""
+import httpx
+import pytest
+
+
+@pytest.mark.parametrize("url, table, version_function", [
+    ("/items/", "items", "items_list_version"),
+    ("/api/wms/inventory", "inventory", "inventory_list_version"),
+])
+def test_not_modified_skips_the_list_query(api, fake_supabase, url, table, version_function):
+    fake_supabase.fixtures[f"rpc/{version_function}"] = "3-2024-01-01 00:00:00"
+    fake_supabase.fixtures[table] = [{"id": "row-1", "name": "Schraube"}]
+
+    first = api.get(url)
+    etag = first.headers["etag"]
+    assert fake_supabase.calls_to(table)
+
+    fake_supabase.calls.clear()
+    second = api.get(url, headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert [call.url.path for call in fake_supabase.calls] == [f"/rest/v1/rpc/{version_function}"]
+
+    # 数据变化后 ETag 不同，返回完整列表
+    fake_supabase.fixtures[f"rpc/{version_function}"] = "4-2024-01-02 00:00:00"
+    third = api.get(url, headers={"If-None-Match": etag})
+    assert third.status_code == 200
+    assert third.headers["etag"] != etag
+
+
+def test_query_parameters_are_part_of_the_etag(api, fake_supabase):
+    fake_supabase.fixtures["rpc/items_list_version"] = "3-2024-01-01 00:00:00"
+
+    assert api.get("/items/").headers["etag"] != api.get("/items/", params={"type": "maschine"}).headers["etag"]
+
+
+def test_missing_version_function_falls_back_to_body_etag(api, fake_supabase):
+    fake_supabase.fixtures["rpc/items_list_version"] = lambda request: httpx.Response(
+        404, json={"code": "PGRST202", "message": "Could not find the function", "details": None, "hint": None}
+    )
+    fake_supabase.fixtures["items"] = [{"id": "item-1", "name": "Schraube"}]
+
+    first = api.get("/items/")
+    second = api.get("/items/", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
@@ -0,0 +1,90 @@
+"""GET /materials/details?ids=: 一次请求加载多个物料（物料、别名、图片各一次查询），按物料缓存"""
+import httpx
+import pytest
+
+from app.services import material_cache
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    fresh = material_cache.MaterialDetailCache(max_size=100, ttl=3600)
+    monkeypatch.setattr("app.routers.materials.material_detail_cache", fresh)
+    return fresh
+
+
+def item(item_id, name):
+    return {"id": item_id, "name": name, "barcode": None, "category_id": "cat-1",
+            "category": {"name": "Befestigung"}, "type": "material", "unit": "Stk",
+            "description": None, "current_stock": 5, "min_stock": 1, "is_active": True}
+
+
+def rows_in(column, rows):
+    """按 column=in.(...) 过滤的表"""
+    def handler(request):
+        wanted = request.url.params[column][len("in.("):-1].split(",")
+        return httpx.Response(200, json=[row for row in rows if row[column] in wanted])
+    return handler
+
+
+@pytest.fixture
+def materials(fake_supabase):
+    fake_supabase.fixtures["items"] = rows_in("id", [item("item-2", "Mutter"), item("item-1", "Schraube")])
+    fake_supabase.fixtures["item_aliases"] = rows_in("item_id", [{"item_id": "item-1", "alias": "Schr."}])
+    fake_supabase.fixtures["item_images"] = rows_in("item_id", [{
+        "id": "img-1", "item_id": "item-2", "image_url": "https://example.com/mutter.jpg",
+        "is_primary": True, "description": None, "created_at": "2024-01-01T00:00:00"
+    }])
+    return fake_supabase
+
+
+def test_details_are_loaded_with_one_query_per_table(api, materials):
+    response = api.get("/materials/details", params={"ids": "item-1,unknown,item-2,item-1"})
+
+    assert response.status_code == 200
+    details = response.json()
+    # 请求顺序，不存在的 ID 忽略
+    assert [detail["id"] for detail in details] == ["item-1", "item-2"]
+    assert details[0]["aliases"] == ["Schr."]
+    assert details[0]["category_name"] == "Befestigung"
+    assert [image["id"] for image in details[1]["images"]] == ["img-1"]
+
+    for table, column in [("items", "id"), ("item_aliases", "item_id"), ("item_images", "item_id")]:
+        calls = materials.calls_to(table)
+        assert len(calls) == 1
+        assert calls[0].url.params[column] == "in.(item-1,unknown,item-2)"
+
+
+def test_cached_details_are_not_queried_again(api, materials):
+    api.get("/materials/details", params={"ids": "item-1"})
+    materials.calls.clear()
+
+    details = api.get("/materials/details", params={"ids": "item-1,item-2"}).json()
+
+    assert [detail["id"] for detail in details] == ["item-1", "item-2"]
+    assert materials.calls_to("items")[0].url.params["id"] == "in.(item-2)"
+
+
+def test_adding_an_alias_invalidates_the_cached_detail(api, materials):
+    api.get("/materials/details", params={"ids": "item-1"})
+
+    select_aliases = rows_in("item_id", [{"item_id": "item-1", "alias": "Schr."},
+                                         {"item_id": "item-1", "alias": "M6"}])
+
+    def aliases(request):
+        if request.method == "POST":
+            return httpx.Response(201, json=[{"id": "alias-2", "item_id": "item-1", "alias": "M6",
+                                              "created_at": "2024-01-01T00:00:00"}])
+        return select_aliases(request)
+
+    materials.fixtures["item_aliases"] = aliases
+    assert api.post("/materials/item-1/aliases", json={"alias": "M6"}).status_code == 201
+
+    details = api.get("/materials/details", params={"ids": "item-1"}).json()
+    assert details[0]["aliases"] == ["Schr.", "M6"]
+
+
+def test_too_many_ids_are_rejected(api, materials):
+    ids = ",".join(f"item-{n}" for n in range(101))
+
+    assert api.get("/materials/details", params={"ids": ids}).status_code == 400
+    assert not materials.calls
@@ -0,0 +1,168 @@
+"""NotificationHub: 等待 Realtime 确认订阅，订阅失败或中断后重新订阅"""
+import asyncio
+
+import pytest
+from realtime import RealtimeSubscribeStates
+
+from app.services import notification_hub as hub_module
+from app.services.notification_hub import NotificationHub
+
+
+class FakeChannel:
+    def __init__(self, join_state):
+        self.join_state = join_state
+        self.callback = None
+        self.unsubscribed = False
+
+    def on_postgres_changes(self, event, callback, table, schema):
+        pass
+
+    async def subscribe(self, callback):
+        self.callback = callback
+        # 确认在 subscribe() 返回之后才到达
+        if self.join_state is not None:
+            asyncio.get_running_loop().call_soon(callback, self.join_state, None)
+        return self
+
+    async def unsubscribe(self):
+        self.unsubscribed = True
+
+
+class FakeRealtime:
+    def __init__(self, *join_states):
+        self.join_states = list(join_states)
+        self.channels = []
+
+    def channel(self, topic):
+        channel = FakeChannel(self.join_states.pop(0))
+        self.channels.append(channel)
+        return channel
+
+
+@pytest.fixture
+def realtime(monkeypatch):
+    fake = FakeRealtime()
+
+    async def get_admin():
+        return fake
+
+    monkeypatch.setattr(hub_module, "get_supabase_admin", get_admin)
+    monkeypatch.setattr(hub_module, "RECONNECT_DELAY", 0)
+    monkeypatch.setattr(hub_module, "JOIN_TIMEOUT", 0.1)
+    return fake
+
+
+def test_failed_join_is_reported_and_retried(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.CHANNEL_ERROR, None, RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+
+    async def run():
+        with pytest.raises(Exception):
+            await hub.subscribe("user-1")
+        assert hub._channel is None
+        # 没有确认（超时）
+        with pytest.raises(asyncio.TimeoutError):
+            await hub.subscribe("user-1")
+        assert hub._channel is None
+
+        await hub.subscribe("user-1")
+        assert hub._channel is realtime.channels[2]
+
+    asyncio.run(run())
+    assert realtime.channels[0].unsubscribed and realtime.channels[1].unsubscribed
+
+
+def test_lost_channel_is_resubscribed(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.SUBSCRIBED, RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+
+    async def run():
+        queue = await hub.subscribe("user-1")
+        first = realtime.channels[0]
+
+        first.callback(RealtimeSubscribeStates.TIMED_OUT, None)
+        assert hub._channel is None
+
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        assert event == {"type": "resync"}
+        assert hub._channel is realtime.channels[1]
+        assert first.unsubscribed
+
+        await hub.close()
+        assert realtime.channels[1].unsubscribed
+
+    asyncio.run(run())
+
+
+def test_events_are_published_to_the_user(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+
+    async def run():
+        queue = await hub.subscribe("user-1")
+        hub._on_change({"data": {"type": "INSERT", "record": {"id": "n1", "user_id": "user-1"}}})
+        hub._on_change({"data": {"type": "INSERT", "record": {"id": "n2", "user_id": "user-2"}}})
+        return await asyncio.wait_for(queue.get(), timeout=1), queue.qsize()
+
+    event, remaining = asyncio.run(run())
+    assert event == {"type": "insert", "notification": {"id": "n1", "user_id": "user-1"}}
+    assert remaining == 0
+
+
+def test_delete_events_use_the_old_record(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+
+    async def run():
+        queue = await hub.subscribe("user-1")
+        hub._on_change({"data": {"type": "DELETE", "record": None, "old_record": {"id": "n1", "user_id": "user-1"}}})
+        return await asyncio.wait_for(queue.get(), timeout=1)
+
+    assert asyncio.run(run()) == {"type": "delete", "notification": {"id": "n1", "user_id": "user-1"}}
+
+
+@pytest.mark.parametrize("event_type", ["insert", "update", "delete"])
+def test_changes_from_elsewhere_invalidate_the_unread_count(event_type):
+    from app.routers.notifications import _on_notification_event
+    from app.services.unread_counter import unread_counter
+
+    unread_counter.set("user-1", 3)
+    _on_notification_event("user-1", {"type": event_type, "notification": {"user_id": "user-1"}})
+
+    assert unread_counter.get("user-1") is None
+
+
+def test_started_hub_stays_subscribed_without_clients(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.SUBSCRIBED, RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+    resets = []
+    hub.add_reset_listener(lambda: resets.append(True))
+
+    async def run():
+        await hub.start()
+        assert hub.connected
+
+        # 没有客户端连接时中断，仍然重新订阅
+        realtime.channels[0].callback(RealtimeSubscribeStates.CHANNEL_ERROR, None)
+        assert not hub.connected
+        await asyncio.wait_for(hub._reconnect_task, timeout=1)
+        assert hub._channel is realtime.channels[1]
+
+        await hub.close()
+
+    asyncio.run(run())
+    assert resets == [True]
+
+
+def test_failed_start_is_retried_in_the_background(realtime):
+    realtime.join_states = [RealtimeSubscribeStates.CHANNEL_ERROR, RealtimeSubscribeStates.SUBSCRIBED]
+    hub = NotificationHub()
+
+    async def run():
+        await hub.start()
+        assert not hub.connected
+        await asyncio.wait_for(hub._reconnect_task, timeout=1)
+        assert hub.connected
+        await hub.close()
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+"""列表接口的游标分页：默认每页 DEFAULT_PAGE_SIZE 行，按 X-Next-Cursor 请求下一页"""
+import asyncio
+
+from app.pagination import DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor
+from app.services.reference_cache import reference_cache
+
+
+def make_items(count):
+    return [{"id": f"item-{i:03d}", "name": f"Material {i:03d}"} for i in range(count)]
+
+
+def test_default_page_size_applies_without_limit(api, fake_supabase):
+    fake_supabase.fixtures["items"] = make_items(DEFAULT_PAGE_SIZE + 1)
+
+    response = api.get("/items/")
+
+    assert response.status_code == 200
+    assert len(response.json()) == DEFAULT_PAGE_SIZE
+    (call,) = fake_supabase.calls_to("items")
+    assert call.url.params["limit"] == str(DEFAULT_PAGE_SIZE + 1)
+    assert call.url.params["order"] == "name.asc,id.asc"
+    last = response.json()[-1]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == [last["name"], last["id"]]
+
+
+def test_next_page_filters_after_the_cursor(api, fake_supabase):
+    fake_supabase.fixtures["items"] = make_items(3)
+    first = api.get("/items/", params={"limit": 2})
+
+    fake_supabase.calls.clear()
+    fake_supabase.fixtures["items"] = make_items(3)[2:]
+    second = api.get("/items/", params={"limit": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]})
+
+    assert [item["id"] for item in second.json()] == ["item-002"]
+    assert NEXT_CURSOR_HEADER not in second.headers
+    (call,) = fake_supabase.calls_to("items")
+    assert call.url.params["or"] == '(name.gt."Material 001",and(name.eq."Material 001",id.gt."item-001"))'
+
+
+def test_last_page_has_no_cursor(api, fake_supabase):
+    fake_supabase.fixtures["suppliers"] = [{"id": "s-1", "name": "Würth"}]
+
+    response = api.get("/api/einkaufs/suppliers")
+
+    assert response.status_code == 200
+    assert NEXT_CURSOR_HEADER not in response.headers
+    (call,) = fake_supabase.calls_to("suppliers")
+    assert call.url.params["limit"] == str(DEFAULT_PAGE_SIZE + 1)
+
+
+def test_invalid_cursor_is_rejected(api, fake_supabase):
+    response = api.get("/items/", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+def test_cached_first_page_keeps_the_cursor(api, fake_supabase):
+    asyncio.run(reference_cache.invalidate("projects"))
+
+    fake_supabase.fixtures["projects"] = [
+        {"id": f"p-{i}", "name": f"Projekt {i}", "created_at": f"2024-01-0{i + 1}T00:00:00",
+         "updated_at": "2024-01-01T00:00:00", "bauleiter": None}
+        for i in range(2)
+    ]
+
+    first = api.get("/projects/", params={"limit": 1})
+    fake_supabase.calls.clear()
+    second = api.get("/projects/", params={"limit": 1})
+
+    assert first.json() == second.json()
+    assert second.headers[NEXT_CURSOR_HEADER] == first.headers[NEXT_CURSOR_HEADER]
+    assert not fake_supabase.calls_to("projects")
+
+
+def test_offset_page_has_no_cursor(api, fake_supabase):
+    fake_supabase.fixtures["requests"] = [
+        {"id": f"req-{i}", "request_number": f"REQ-{i}", "worker_id": "worker-1", "baustelle_id": "baustelle-1",
+         "status": "pending", "priority": "normal", "created_at": f"2024-01-01T00:00:0{i}",
+         "updated_at": "2024-01-01T00:00:00"}
+        for i in range(2)
+    ]
+
+    response = api.get("/requests/", params={"limit": 2, "offset": 4})
+
+    assert response.status_code == 200
+    assert NEXT_CURSOR_HEADER not in response.headers
+    (call,) = fake_supabase.calls_to("requests")
+    assert call.url.params["offset"] == "4"
+    assert call.url.params["limit"] == "2"
+
+
+def test_offset_and_cursor_are_rejected(api, fake_supabase):
+    response = api.get("/requests/", params={"offset": 4, "cursor": "WyIyMDI0IiwicmVxLTEiXQ"})
+
+    assert response.status_code == 400
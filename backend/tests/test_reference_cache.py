@@ -0,0 +1,50 @@
+"""参考数据缓存：缓存命中时不查询数据库，ETag 未变化时返回 304，写操作后失效"""
+import pytest
+
+from app.services.reference_cache import MemoryCacheBackend, reference_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(reference_cache, "backend", MemoryCacheBackend())
+
+
+def location(name):
+    return {"id": f"loc-{name}", "name": name, "description": None, "zone": None,
+            "is_active": True, "created_at": "2024-01-01T00:00:00"}
+
+
+def test_cached_list_is_served_without_query(api, fake_supabase):
+    fake_supabase.fixtures["storage_locations"] = [location("A-01")]
+
+    first = api.get("/api/wms/locations")
+    second = api.get("/api/wms/locations")
+
+    assert second.json() == first.json()
+    assert len(fake_supabase.calls_to("storage_locations")) == 1
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "{opaque}", '"other", {etag}', "*"])
+def test_matching_etag_returns_304(api, fake_supabase, if_none_match):
+    fake_supabase.fixtures["storage_locations"] = [location("A-01")]
+    etag = api.get("/api/wms/locations").headers["etag"]
+
+    response = api.get("/api/wms/locations", headers={
+        "If-None-Match": if_none_match.format(etag=etag, opaque=etag.removeprefix("W/"))
+    })
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_write_invalidates_the_namespace(api, fake_supabase):
+    fake_supabase.fixtures["storage_locations"] = [location("A-01")]
+    etag = api.get("/api/wms/locations").headers["etag"]
+
+    api.post("/api/wms/locations", json={"name": "B-02"})
+    fake_supabase.fixtures["storage_locations"] = [location("A-01"), location("B-02")]
+    response = api.get("/api/wms/locations", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert [row["name"] for row in response.json()] == ["A-01", "B-02"]
+    assert response.headers["etag"] != etag
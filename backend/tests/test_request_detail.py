@@ -0,0 +1,76 @@
+"""GET /requests/{id}: 一次嵌入查询加载申请详情，PostgREST 不支持嵌入时改为并行查询"""
+import httpx
+
+REQUEST = {
+    "id": "req-1", "request_number": "REQ-0001", "worker_id": "worker-1", "baustelle_id": "baustelle-1",
+    "status": "pending", "priority": "normal",
+    "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"
+}
+WORKER = {"id": "worker-1", "email": "worker@example.com", "role": "worker",
+          "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}
+BAUSTELLE = {"id": "baustelle-1", "name": "Neubau Nord",
+             "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}
+ITEM = {"id": "item-1", "name": "Schraube", "type": "material", "unit": "Stk",
+        "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}
+ITEMS = [{"id": "ri-1", "request_id": "req-1", "item_id": "item-1", "quantity": "2", "unit": "Stk",
+          "created_at": "2024-01-01T00:00:00", "item": ITEM}]
+IMAGES = [{"id": "img-1", "request_id": "req-1", "image_url": "https://example.com/a.jpg",
+           "created_at": "2024-01-01T00:00:00"}]
+
+
+def embedding_error(code):
+    return httpx.Response(400, json={"code": code, "message": "Could not find a relationship",
+                                     "details": None, "hint": None})
+
+
+def assert_hydrated(detail):
+    assert detail["worker"]["email"] == "worker@example.com"
+    assert detail["baustelle"]["name"] == "Neubau Nord"
+    assert [item["id"] for item in detail["items"]] == ["ri-1"]
+    assert [image["id"] for image in detail["images"]] == ["img-1"]
+
+
+def test_detail_is_loaded_with_one_embedded_select(api, fake_supabase):
+    fake_supabase.fixtures["requests"] = [{**REQUEST, "worker": WORKER, "baustelle": BAUSTELLE,
+                                           "request_items": ITEMS, "request_images": IMAGES}]
+
+    response = api.get("/requests/req-1")
+
+    assert response.status_code == 200
+    assert_hydrated(response.json())
+    assert len(fake_supabase.calls) == 1
+    assert "request_items(" in fake_supabase.calls[0].url.params["select"]
+
+
+def test_relationship_errors_fall_back_to_parallel_lookups(api, fake_supabase):
+    def requests(request):
+        if "request_items(" in request.url.params["select"]:
+            return embedding_error("PGRST200")
+        return httpx.Response(200, json=[REQUEST])
+
+    fake_supabase.fixtures.update({
+        "requests": requests, "request_items": ITEMS, "request_images": IMAGES,
+        "profiles": [WORKER], "baustellen": [BAUSTELLE],
+    })
+
+    response = api.get("/requests/req-1")
+
+    assert response.status_code == 200
+    assert_hydrated(response.json())
+    for table in ("request_items", "request_images", "profiles", "baustellen"):
+        assert len(fake_supabase.calls_to(table)) == 1
+
+
+def test_other_errors_are_not_retried(api, fake_supabase):
+    fake_supabase.fixtures["requests"] = lambda request: embedding_error("42501")
+
+    response = api.get("/requests/req-1")
+
+    assert response.status_code == 500
+    assert len(fake_supabase.calls) == 1
+
+
+def test_missing_request_is_404(api, fake_supabase):
+    fake_supabase.fixtures["requests"] = []
+
+    assert api.get("/requests/req-1").status_code == 404
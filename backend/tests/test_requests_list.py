@@ -0,0 +1,55 @@
+"""GET /requests: 每页的数据库请求数与页大小无关"""
+import pytest
+
+
+def make_requests(count):
+    return [
+        {
+            "id": f"req-{i}",
+            "request_number": f"REQ-{i:04d}",
+            "worker_id": "worker-1",
+            "baustelle_id": "baustelle-1",
+            "status": "pending",
+            "priority": "normal",
+            "created_at": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}",
+            "updated_at": "2024-01-01T00:00:00"
+        }
+        for i in range(count)
+    ]
+
+
+def list_requests(api, fake_supabase, limit):
+    fake_supabase.fixtures["requests"] = make_requests(limit)
+    fake_supabase.fixtures["request_items"] = [
+        {"id": "ri-1", "request_id": "req-0", "item_id": "item-1", "quantity": "2", "unit": "Stk",
+         "created_at": "2024-01-01T00:00:00", "item": {"id": "item-1", "name": "Schraube"}}
+    ]
+    fake_supabase.fixtures["request_images"] = [
+        {"id": "img-1", "request_id": f"req-{limit - 1}", "image_url": "https://example.com/a.jpg",
+         "created_at": "2024-01-01T00:00:00"}
+    ]
+    fake_supabase.calls.clear()
+
+    response = api.get("/requests/", params={"limit": limit})
+    assert response.status_code == 200
+    return response.json(), len(fake_supabase.calls)
+
+
+@pytest.mark.parametrize("limit", [10, 100])
+def test_items_and_images_are_stitched(api, fake_supabase, limit):
+    requests, _ = list_requests(api, fake_supabase, limit)
+
+    assert len(requests) == limit
+    assert [item["id"] for item in requests[0]["items"]] == ["ri-1"]
+    assert [image["id"] for image in requests[-1]["images"]] == ["img-1"]
+    assert all(request["items"] == [] for request in requests[1:])
+
+
+def test_round_trips_do_not_grow_with_limit(api, fake_supabase):
+    _, small_page_calls = list_requests(api, fake_supabase, 10)
+    _, large_page_calls = list_requests(api, fake_supabase, 100)
+
+    # requests + request_items + request_images
+    assert small_page_calls == large_page_calls == 3
+    assert len(fake_supabase.calls_to("request_items")) == 1
+
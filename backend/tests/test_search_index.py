@@ -0,0 +1,89 @@
+"""GET /materials/search: 出入库后搜索结果中的库存立即更新"""
+import pytest
+
+from app.services import search_index
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = search_index.MaterialSearchIndex(ttl=3600)
+    monkeypatch.setattr(search_index, "material_search_index", fresh)
+    monkeypatch.setattr("app.routers.materials.material_search_index", fresh)
+    monkeypatch.setattr("app.routers.wms.material_search_index", fresh)
+    return fresh
+
+
+def item(stock):
+    return {"id": "item-1", "name": "Schraube", "barcode": "4001", "category_id": None,
+            "current_stock": stock, "unit": "Stk", "is_active": True}
+
+
+def test_transaction_updates_indexed_stock(api, fake_supabase, index):
+    fake_supabase.fixtures["items"] = [item(10)]
+    assert api.get("/materials/search", params={"q": "Schraube"}).json()[0]["current_stock"] == 10
+
+    # apply_inventory_transaction 更新了库存（由触发器汇总到 items.current_stock）
+    fake_supabase.fixtures["items"] = [item(4)]
+    fake_supabase.fixtures["rpc/apply_inventory_transaction"] = {
+        "id": "tx-1", "item_id": "item-1", "location_id": "loc-1", "transaction_type": "out",
+        "quantity": 6, "before_quantity": 10, "after_quantity": 4, "operator_id": "user-1",
+        "notes": None, "created_at": "2024-01-01T00:00:00"
+    }
+    response = api.post("/api/wms/transactions", json={
+        "item_id": "item-1", "location_id": "loc-1", "transaction_type": "out",
+        "quantity": 6, "operator_id": "user-1"
+    })
+
+    assert response.status_code == 200
+    assert api.get("/materials/search", params={"q": "Schraube"}).json()[0]["current_stock"] == 4
+
+
+def test_transaction_does_not_reread_items(api, fake_supabase, index):
+    fake_supabase.fixtures["items"] = [item(10)]
+    api.get("/materials/search", params={"q": "Schraube"})
+
+    fake_supabase.calls.clear()
+    fake_supabase.fixtures["rpc/apply_inventory_transaction"] = {
+        "id": "tx-1", "item_id": "item-1", "location_id": "loc-1", "transaction_type": "in",
+        "quantity": 1.5, "before_quantity": 2, "after_quantity": 3.5, "operator_id": "user-1",
+        "notes": None, "created_at": "2024-01-01T00:00:00"
+    }
+    response = api.post("/api/wms/transactions", json={
+        "item_id": "item-1", "location_id": "loc-1", "transaction_type": "in",
+        "quantity": 1.5, "operator_id": "user-1"
+    })
+
+    assert response.status_code == 200
+    assert [call.url.path for call in fake_supabase.calls] == ["/rest/v1/rpc/apply_inventory_transaction"]
+    assert api.get("/materials/search", params={"q": "Schraube"}).json()[0]["current_stock"] == 11.5
+
+
+def test_bulk_init_updates_indexed_stock(api, fake_supabase, index):
+    item_id = "00000000-0000-0000-0000-000000000001"
+    fake_supabase.fixtures["items"] = [{**item(0), "id": item_id}]
+    api.get("/materials/search", params={"q": "Schraube"})
+
+    fake_supabase.fixtures["rpc/bulk_init_inventory"] = [
+        {"row_index": 0, "success": True, "error": None, "transaction_id": "tx-1",
+         "before_quantity": 0, "after_quantity": 5},
+        {"row_index": 1, "success": True, "error": None, "transaction_id": "tx-2",
+         "before_quantity": 0, "after_quantity": 7},
+    ]
+    entry = {"item_id": item_id,
+             "operator_id": "00000000-0000-0000-0000-000000000003", "quantity": 5}
+    response = api.post("/api/wms/inventory/bulk-init", json=[
+        {**entry, "location_id": "00000000-0000-0000-0000-000000000002"},
+        {**entry, "location_id": "00000000-0000-0000-0000-000000000004", "quantity": 7},
+    ])
+
+    assert response.status_code == 200
+    assert api.get("/materials/search", params={"q": "Schraube"}).json()[0]["current_stock"] == 12
+
+
+def test_unknown_item_marks_index_stale(api, fake_supabase, index):
+    fake_supabase.fixtures["items"] = [item(10)]
+    api.get("/materials/search", params={"q": "Schraube"})
+
+    index.apply_stock_changes([("item-unknown", 0, 3)])
+
+    assert index._loaded_at is None
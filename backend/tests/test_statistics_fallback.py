@@ -0,0 +1,146 @@
+"""GET /statistics/material-usage: 数据库函数未部署 (PGRST202) 时的 Python 汇总与 material_usage_stats() 结果一致"""
+import json
+import math
+from collections import defaultdict
+
+import httpx
+
+from app.routers.statistics import IN_FILTER_CHUNK_SIZE
+
+ITEMS = {
+    "item-a": {"name": "Schraube", "type": "material"},
+    "item-b": {"name": "Bohrmaschine", "type": "maschine"},
+    "item-c": {"name": "Kabel", "type": "material"},
+}
+
+# 超过一批 in_() 的申请单数，覆盖分批查询
+REQUEST_COUNT = IN_FILTER_CHUNK_SIZE * 2 + 50
+
+
+def make_data():
+    requests = [
+        {"id": f"req-{i}", "status": "completed" if i % 3 else "pending"}
+        for i in range(REQUEST_COUNT)
+    ]
+    request_items = []
+    for i, request in enumerate(requests):
+        request_items.append({"request_id": request["id"], "item_id": "item-a", "quantity": "1.5", "unit": "Stk"})
+        if i % 2:
+            request_items.append({"request_id": request["id"], "item_id": "item-b", "quantity": "1", "unit": "Stk"})
+        if i % 5 == 0:
+            request_items.append({"request_id": request["id"], "item_id": "item-c", "quantity": "12.25", "unit": "m"})
+        # 已删除的物料（LEFT JOIN 为空）
+        if i % 7 == 0:
+            request_items.append({"request_id": request["id"], "item_id": "item-gone", "quantity": "0.5", "unit": "Stk"})
+    return requests, request_items
+
+
+def material_usage_stats(requests, request_items, filter_type=None):
+    """material_usage_stats() 的查询语义（statistics_functions.sql）"""
+    completed = {request["id"] for request in requests if request["status"] == "completed"}
+    groups = defaultdict(list)
+    for row in request_items:
+        item = ITEMS.get(row["item_id"])
+        if row["request_id"] not in completed:
+            continue
+        if filter_type is not None and (item is None or item["type"] != filter_type):
+            continue
+        groups[row["item_id"]].append(row)
+
+    rows = [
+        {
+            "item_id": item_id,
+            "item_name": ITEMS[item_id]["name"] if item_id in ITEMS else "Unknown",
+            "total_quantity": sum(float(row["quantity"]) for row in rows),
+            "unit": min(row["unit"] for row in rows),
+            "request_count": len(rows)
+        }
+        for item_id, rows in groups.items()
+    ]
+    return sorted(rows, key=lambda row: row["total_quantity"], reverse=True)
+
+
+def use_rpc(fake_supabase, requests, request_items):
+    def rpc(request: httpx.Request) -> httpx.Response:
+        filter_type = json.loads(request.content)["filter_type"]
+        return httpx.Response(200, json=material_usage_stats(requests, request_items, filter_type))
+
+    fake_supabase.fixtures["rpc/material_usage_stats"] = rpc
+
+
+def use_fallback(fake_supabase, requests, request_items):
+    def missing_function(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={
+            "code": "PGRST202",
+            "message": "Could not find the function public.material_usage_stats in the schema cache",
+            "details": None,
+            "hint": None
+        })
+
+    def completed_requests(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["status"] == "eq.completed"
+        return httpx.Response(200, json=[{"id": r["id"]} for r in requests if r["status"] == "completed"])
+
+    def items_for_requests(request: httpx.Request) -> httpx.Response:
+        request_ids = set(request.url.params["request_id"][len("in.("):-1].split(","))
+        assert len(request_ids) <= IN_FILTER_CHUNK_SIZE
+        return httpx.Response(200, json=[
+            {
+                "item_id": row["item_id"],
+                "quantity": row["quantity"],
+                "unit": row["unit"],
+                "items": ITEMS.get(row["item_id"])
+            }
+            for row in request_items if row["request_id"] in request_ids
+        ])
+
+    fake_supabase.fixtures["rpc/material_usage_stats"] = missing_function
+    fake_supabase.fixtures["requests"] = completed_requests
+    fake_supabase.fixtures["request_items"] = items_for_requests
+
+
+def material_usage(api, params=None):
+    response = api.get("/statistics/material-usage", params=params or {})
+    assert response.status_code == 200, response.text
+    return response.json()["material_usage"]
+
+
+def test_fallback_matches_rpc(api, fake_supabase):
+    requests, request_items = make_data()
+
+    use_rpc(fake_supabase, requests, request_items)
+    from_rpc = material_usage(api)
+
+    use_fallback(fake_supabase, requests, request_items)
+    fake_supabase.calls.clear()
+    from_fallback = material_usage(api)
+
+    assert [row["item_id"] for row in from_rpc] == ["item-c", "item-a", "item-b", "item-gone"]
+    assert from_fallback == from_rpc
+
+    completed = sum(1 for request in requests if request["status"] == "completed")
+    assert len(fake_supabase.calls_to("request_items")) == math.ceil(completed / IN_FILTER_CHUNK_SIZE)
+
+
+def test_fallback_matches_rpc_with_type_filter(api, fake_supabase):
+    requests, request_items = make_data()
+
+    use_rpc(fake_supabase, requests, request_items)
+    from_rpc = material_usage(api, {"item_type": "material"})
+
+    use_fallback(fake_supabase, requests, request_items)
+    from_fallback = material_usage(api, {"item_type": "material"})
+
+    assert [row["item_id"] for row in from_rpc] == ["item-c", "item-a"]
+    assert from_fallback == from_rpc
+
+
+def test_other_errors_are_not_swallowed(api, fake_supabase):
+    fake_supabase.fixtures["rpc/material_usage_stats"] = lambda request: httpx.Response(
+        400, json={"code": "42703", "message": "column does not exist", "details": None, "hint": None}
+    )
+
+    response = api.get("/statistics/material-usage")
+
+    assert response.status_code == 500
+    assert fake_supabase.calls_to("request_items") == []
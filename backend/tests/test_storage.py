@@ -0,0 +1,64 @@
+"""存储后端：只为配置的 bucket 创建后端；本地文件的保存和读取"""
+import asyncio
+import io
+import tempfile
+
+import pytest
+
+from app.routers import uploads
+from app.services import storage
+
+
+def test_unknown_bucket_is_rejected_and_not_cached():
+    with pytest.raises(ValueError):
+        storage.get_storage("not-configured")
+
+    assert "not-configured" not in storage._backends
+
+
+def test_file_route_does_not_create_backends(api):
+    before = dict(storage._backends)
+
+    for i in range(20):
+        response = api.get(f"/api/uploads/files/bucket-{i}/image.jpg")
+        assert response.status_code == 404
+
+    assert storage._backends == before
+
+
+@pytest.mark.parametrize("make_file", [
+    lambda: io.BytesIO(),
+    lambda: tempfile.SpooledTemporaryFile(max_size=1024 * 1024),
+    lambda: tempfile.SpooledTemporaryFile(max_size=1),
+])
+def test_local_save_file_copies_any_file_object(tmp_path, make_file):
+    backend = storage.LocalStorageBackend("request-images", str(tmp_path), "http://testserver/files")
+    file = make_file()
+    file.write(b"image-bytes" * 1000)
+
+    asyncio.run(backend.save_file("a/b.jpg", file, "image/jpeg"))
+
+    assert (tmp_path / "request-images" / "a" / "b.jpg").read_bytes() == b"image-bytes" * 1000
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    backend = storage.LocalStorageBackend("request-images", str(tmp_path), "http://testserver/api/uploads/files")
+    monkeypatch.setattr(uploads, "get_storage", lambda bucket="request-images": backend)
+    (tmp_path / "request-images" / "folder").mkdir(parents=True)
+    (tmp_path / "request-images" / "folder" / "a.jpg").write_bytes(b"image-bytes")
+    return backend
+
+
+def test_directory_path_is_not_found(api, local_storage):
+    response = api.get("/api/uploads/files/request-images/folder")
+
+    assert response.status_code == 404
+
+
+def test_weak_and_listed_etags_match(api, local_storage):
+    etag = api.get("/api/uploads/files/request-images/folder/a.jpg").headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        response = api.get("/api/uploads/files/request-images/folder/a.jpg", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
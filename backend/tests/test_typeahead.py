@@ -0,0 +1,83 @@
+"""GET /materials/typeahead: 相同关键词同时到达时只查询一次，最近的结果按 LRU 缓存，索引变化时清空"""
+import asyncio
+
+import pytest
+
+from app.services import search_index
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = search_index.MaterialSearchIndex(ttl=3600)
+    monkeypatch.setattr(search_index, "material_search_index", fresh)
+    monkeypatch.setattr("app.routers.materials.material_search_index", fresh)
+    return fresh
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """记录在索引中执行的搜索"""
+    queries = []
+    search = search_index.SearchIndexData.search
+
+    def counting_search(self, query, limit=search_index.RESULT_LIMIT):
+        queries.append(query)
+        return search(self, query, limit)
+
+    monkeypatch.setattr(search_index.SearchIndexData, "search", counting_search)
+    return queries
+
+
+def item(item_id, name, stock=10):
+    return {"id": item_id, "name": name, "barcode": None, "category_id": None,
+            "current_stock": stock, "unit": "Stk", "is_active": True}
+
+
+def test_concurrent_requests_share_one_search(fake_supabase, index, searches):
+    fake_supabase.fixtures["items"] = [item("item-1", "Schraube")]
+
+    async def run():
+        db = await fake_supabase.client()
+        # 索引还没有加载：第一次输入的关键词同时到达
+        return await asyncio.gather(*(index.typeahead(db, query) for query in ["Schr", "schr", "SCHR"]))
+
+    results = asyncio.run(run())
+
+    assert [len(found) for found in results] == [1, 1, 1]
+    assert searches == ["schr"]
+    assert len(fake_supabase.calls_to("items")) == 1
+
+
+def test_recent_queries_are_served_from_the_cache(api, fake_supabase, index, searches):
+    fake_supabase.fixtures["items"] = [item("item-1", "Schraube")]
+
+    first = api.get("/materials/typeahead", params={"q": "Schr"})
+    second = api.get("/materials/typeahead", params={"q": "schr", "limit": 1})
+
+    assert first.json() == second.json()
+    assert first.headers["cache-control"] == "private, max-age=10"
+    assert searches == ["schr"]
+
+
+def test_least_recently_used_query_is_evicted(fake_supabase, index, searches, monkeypatch):
+    monkeypatch.setattr(search_index, "TYPEAHEAD_CACHE_SIZE", 2)
+    fake_supabase.fixtures["items"] = [item("item-1", "Schraube"), item("item-2", "Mutter")]
+
+    async def run():
+        db = await fake_supabase.client()
+        for query in ["schr", "mutt", "schr", "dueb", "schr", "mutt"]:
+            await index.typeahead(db, query)
+
+    asyncio.run(run())
+
+    # "mutt" 在 "dueb" 加入时是最久未使用的
+    assert searches == ["schr", "mutt", "dueb", "mutt"]
+
+
+def test_index_changes_clear_cached_results(api, fake_supabase, index):
+    fake_supabase.fixtures["items"] = [item("item-1", "Schraube", stock=10)]
+    assert api.get("/materials/typeahead", params={"q": "schr"}).json()[0]["current_stock"] == 10
+
+    index.apply_stock_changes([("item-1", 10, 4)])
+
+    assert api.get("/materials/typeahead", params={"q": "schr"}).json()[0]["current_stock"] == 4
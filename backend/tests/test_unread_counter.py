@@ -0,0 +1,86 @@
+"""GET /notifications/unread-count: 通知 API 的写操作直接更新缓存的计数，Realtime 没有订阅时不使用缓存"""
+import httpx
+import pytest
+
+from app.services.notification_hub import notification_hub
+from app.services.unread_counter import unread_counter
+
+USER = "user-1"
+
+
+def notification(is_read=False):
+    return {"id": "n1", "user_id": USER, "title": "Neue Anfrage", "message": "…", "type": "request",
+            "related_request_id": None, "is_read": is_read, "created_at": "2024-01-01T00:00:00"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_counter():
+    unread_counter.clear()
+    yield
+    unread_counter.clear()
+
+
+@pytest.fixture
+def connected(monkeypatch):
+    monkeypatch.setattr(notification_hub, "_channel", object())
+
+
+def unread_count(api):
+    return api.get("/notifications/unread-count", params={"user_id": USER}).json()["count"]
+
+
+def count_response(count):
+    return lambda request: httpx.Response(200, json=[], headers={"content-range": f"*/{count}"})
+
+
+def test_writes_adjust_the_cached_count(api, fake_supabase, connected):
+    fake_supabase.fixtures["notifications"] = count_response(2)
+    assert unread_count(api) == 2
+
+    fake_supabase.fixtures["notifications"] = [notification()]
+    assert api.post("/notifications/", json={
+        "user_id": USER, "title": "Neue Anfrage", "message": "…", "type": "request"
+    }).status_code == 201
+    assert api.request("PATCH", "/notifications/n1/read").status_code == 200
+    assert api.request("DELETE", "/notifications/n1").status_code == 204
+    assert api.post("/notifications/", json={
+        "user_id": USER, "title": "Neue Anfrage", "message": "…", "type": "request"
+    }).status_code == 201
+
+    # 2 + 1 - 1 - 1 + 1，从缓存读取
+    fake_supabase.calls.clear()
+    assert unread_count(api) == 2
+    assert not fake_supabase.calls
+
+    assert api.request("PATCH", "/notifications/mark-all-read", params={"user_id": USER}).status_code == 200
+    assert unread_count(api) == 0
+
+
+def test_already_read_notifications_do_not_change_the_count(api, fake_supabase, connected):
+    fake_supabase.fixtures["notifications"] = count_response(1)
+    assert unread_count(api) == 1
+
+    fake_supabase.fixtures["notifications"] = [notification(is_read=True)]
+    assert api.request("DELETE", "/notifications/n1").status_code == 204
+
+    assert unread_count(api) == 1
+
+
+def test_count_is_not_cached_without_realtime(api, fake_supabase, monkeypatch):
+    monkeypatch.setattr(notification_hub, "_channel", None)
+    fake_supabase.fixtures["notifications"] = count_response(1)
+    assert unread_count(api) == 1
+
+    # 触发器创建的通知没有 Realtime 事件使缓存失效
+    fake_supabase.fixtures["notifications"] = count_response(2)
+    assert unread_count(api) == 2
+    assert unread_counter.stats()["size"] == 0
+
+
+def test_lost_channel_clears_cached_counts():
+    unread_counter.set(USER, 3)
+
+    for listener in notification_hub._reset_listeners:
+        listener()
+
+    assert unread_counter.get(USER) is None
@@ -0,0 +1,226 @@
+"""POST/DELETE /api/uploads/image: 按内容哈希去重，登记时占用引用，删除时释放自己的登记"""
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.routers import uploads
+from app.services import image_objects, image_processing
+
+
+class FakeImageObjects:
+    """image_objects 表和 claim/abandon/release/sweep 函数（database/image_objects.sql）"""
+
+    def __init__(self, fake_supabase):
+        self.rows = {}
+        fake_supabase.fixtures["rpc/claim_image_object"] = self.claim
+        fake_supabase.fixtures["rpc/abandon_image_claim"] = self.abandon
+        fake_supabase.fixtures["rpc/release_image_object"] = self.release
+        fake_supabase.fixtures["rpc/sweep_image_objects"] = self.sweep
+        fake_supabase.fixtures["image_objects"] = self.update
+
+    def claim(self, request):
+        args = json.loads(request.content)
+        key = (args["p_storage_id"], args["p_content_hash"])
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = {
+                "storage_id": args["p_storage_id"], "content_hash": args["p_content_hash"],
+                "path": args["p_path"], "url": args["p_url"],
+                "size": args["p_size"], "ref_count": 0, "pending_uploads": 0, "stored": False
+            }
+        row["pending_uploads"] += 1
+        return httpx.Response(200, json=row)
+
+    def abandon(self, request):
+        args = json.loads(request.content)
+        key = (args["p_storage_id"], args["p_content_hash"])
+        row = self.rows[key]
+        row["pending_uploads"] -= 1
+        if not row["stored"] and row["ref_count"] == 0 and row["pending_uploads"] == 0:
+            del self.rows[key]
+        return httpx.Response(200, json=None)
+
+    def release(self, request):
+        args = json.loads(request.content)
+        for key, row in list(self.rows.items()):
+            if key[0] == args["p_storage_id"] and row["path"] == args["p_path"]:
+                if row["pending_uploads"]:
+                    row["pending_uploads"] -= 1
+                if row["ref_count"] or row["pending_uploads"]:
+                    return httpx.Response(200, json=False)
+                del self.rows[key]
+        return httpx.Response(200, json=True)
+
+    def sweep(self, request):
+        # expired 代替 last_claimed_at < NOW() - p_claim_ttl
+        args = json.loads(request.content)
+        swept = [
+            self.rows.pop(key) for key, row in list(self.rows.items())
+            if key[0] == args["p_storage_id"] and row["ref_count"] == 0 and row.get("expired")
+        ]
+        return httpx.Response(200, json=swept)
+
+    def update(self, request):
+        key = (request.url.params["storage_id"][len("eq."):], request.url.params["content_hash"][len("eq."):])
+        self.rows[key].update(json.loads(request.content))
+        return httpx.Response(200, json=[self.rows[key]])
+
+
+class MemoryStorage(uploads.StorageBackend):
+    def __init__(self, fail=False, name="memory"):
+        super().__init__("request-images")
+        self.files = {}
+        self.fail = fail
+        self.name = name
+
+    @property
+    def storage_id(self):
+        return f"{self.name}:{self.bucket}"
+
+    async def save(self, path, data, content_type):
+        if self.fail:
+            raise IOError("storage unavailable")
+        self.files[path] = data
+
+    async def delete(self, paths):
+        for path in paths:
+            self.files.pop(path, None)
+
+    async def public_url(self, path):
+        return f"https://{self.name}.example.com/{path}"
+
+
+@pytest.fixture
+def registry(fake_supabase, monkeypatch):
+    monkeypatch.setattr(image_objects, "get_supabase_admin", fake_supabase.client)
+    return FakeImageObjects(fake_supabase)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    backend = MemoryStorage()
+    monkeypatch.setattr(uploads, "get_storage", lambda bucket="request-images": backend)
+    return backend
+
+
+def upload(api, content=b"\xff\xd8jpeg-bytes", filename="photo.jpg"):
+    return api.post("/api/uploads/image", files={"file": (filename, content, "image/jpeg")})
+
+
+def test_same_content_is_stored_once(api, registry, storage):
+    first = upload(api).json()
+    second = upload(api, filename="resent.jpg").json()
+
+    assert first["path"] == second["path"]
+    assert first["url"] == second["url"]
+    assert list(storage.files) == [first["path"]]
+    assert first["path"].startswith("request-images/")
+
+
+def test_deleting_own_unreferenced_upload_removes_it(api, registry, storage):
+    path = upload(api).json()["path"]
+
+    response = api.request("DELETE", "/api/uploads/image", params={"path": path})
+
+    assert response.json()["deleted"] is True
+    assert storage.files == {}
+    assert registry.rows == {}
+
+
+def test_file_claimed_by_another_upload_is_kept(api, registry, storage):
+    path = upload(api).json()["path"]
+    # 另一个客户端上传了相同内容，还没有保存 request_images
+    upload(api, filename="resent.jpg")
+
+    response = api.request("DELETE", "/api/uploads/image", params={"path": path})
+
+    assert response.status_code == 200
+    assert response.json()["deleted"] is False
+    assert path in storage.files
+    assert registry.rows[next(iter(registry.rows))]["pending_uploads"] == 1
+
+
+def test_referenced_file_is_kept(api, registry, storage):
+    path = upload(api).json()["path"]
+    row = registry.rows[next(iter(registry.rows))]
+    # 保存 request_images 后触发器把待引用计数转为引用计数
+    row["pending_uploads"], row["ref_count"] = 0, 1
+
+    response = api.request("DELETE", "/api/uploads/image", params={"path": path})
+
+    assert response.json()["deleted"] is False
+    assert path in storage.files
+
+
+def test_failed_save_releases_the_claim(api, registry, storage):
+    storage.fail = True
+
+    response = upload(api)
+
+    assert response.status_code == 500
+    assert registry.rows == {}
+
+    storage.fail = False
+    assert upload(api).status_code == 200
+    assert len(storage.files) == 1
+
+
+def test_renditions_are_not_rendered_again_for_duplicate_content(api, registry, storage, monkeypatch):
+    renders = []
+
+    async def render(image_bytes, renditions=None, webp=False):
+        renders.append(image_bytes)
+        return image_processing.render_renditions(image_bytes, renditions or image_processing.DEFAULT_RENDITIONS, webp)
+
+    monkeypatch.setattr(image_processing, "render_in_process_pool", render)
+    output = io.BytesIO()
+    Image.new("RGB", (1600, 1200)).save(output, format="JPEG")
+
+    first = api.post("/api/uploads/image", params={"renditions": "true"},
+                     files={"file": ("photo.jpg", output.getvalue(), "image/jpeg")}).json()
+    second = api.post("/api/uploads/image", params={"renditions": "true"},
+                      files={"file": ("resent.jpg", output.getvalue(), "image/jpeg")}).json()
+
+    assert len(renders) == 1
+    assert second["renditions"] == first["renditions"]
+    assert first["renditions"]["thumbnail"]["path"] in storage.files
+
+
+def test_switching_backends_does_not_reuse_the_other_backends_file(api, registry, storage, monkeypatch):
+    old = upload(api).json()
+
+    # STORAGE_BACKEND 切换后，相同内容保存到新的后端
+    switched = MemoryStorage(name="switched")
+    monkeypatch.setattr(uploads, "get_storage", lambda bucket="request-images": switched)
+    new = upload(api).json()
+
+    assert new["url"].startswith("https://switched.example.com/")
+    assert list(switched.files) == [new["path"]]
+
+    # 删除旧后端的路径不会释放旧后端的登记，也不会删除新后端的文件
+    response = api.request("DELETE", "/api/uploads/image", params={"path": old["path"]})
+
+    assert response.status_code == 200
+    assert old["path"] in storage.files
+    assert ("memory:request-images", old["path"].split("/")[-1].split("-")[0]) in registry.rows
+    assert list(switched.files) == [new["path"]]
+
+
+def test_sweep_deletes_expired_unreferenced_uploads(api, registry, storage):
+    abandoned = upload(api).json()
+    referenced = upload(api, content=b"\xff\xd8other-bytes").json()
+    for row in registry.rows.values():
+        row["expired"] = True
+        if row["path"] == referenced["path"]:
+            row["ref_count"] = 1
+            row["pending_uploads"] = 0
+    storage.files[f"{abandoned['path'].rsplit('.', 1)[0]}/thumbnail.jpg"] = b"thumbnail"
+
+    assert asyncio.run(uploads.sweep_abandoned_uploads()) == 1
+
+    assert list(storage.files) == [referenced["path"]]
+    assert [row["path"] for row in registry.rows.values()] == [referenced["path"]]
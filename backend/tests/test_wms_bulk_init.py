@@ -0,0 +1,71 @@
+"""POST /api/wms/inventory/bulk-init[/csv]: 格式错误的行和未提交的批次作为失败行返回"""
+import json
+
+import httpx
+
+from app.routers import wms
+
+ITEM_ID = "11111111-1111-1111-1111-111111111111"
+LOCATION_ID = "22222222-2222-2222-2222-222222222222"
+OPERATOR_ID = "33333333-3333-3333-3333-333333333333"
+
+
+def bulk_init(request: httpx.Request) -> httpx.Response:
+    entries = json.loads(request.content)["entries"]
+    return httpx.Response(200, json=[
+        {"row_index": entry["row_index"], "success": True, "error": None,
+         "transaction_id": f"tx-{entry['row_index']}", "before_quantity": 0, "after_quantity": entry["quantity"]}
+        for entry in entries
+    ])
+
+
+def upload(api, csv_text):
+    return api.post(
+        "/api/wms/inventory/bulk-init/csv",
+        params={"operator_id": OPERATOR_ID},
+        files={"file": ("inventory.csv", csv_text.encode(), "text/csv")}
+    )
+
+
+def test_row_with_extra_fields_is_reported(api, fake_supabase):
+    fake_supabase.fixtures["rpc/bulk_init_inventory"] = bulk_init
+    csv_text = (
+        "item_id,location_id,quantity\n"
+        f"{ITEM_ID},{LOCATION_ID},5\n"
+        f"{ITEM_ID},{LOCATION_ID},3,unexpected\n"
+        f"{ITEM_ID},{LOCATION_ID},abc\n"
+    )
+
+    response = upload(api, csv_text)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 3
+    assert body["success_count"] == 1
+    assert [error["row"] for error in body["errors"]] == [2, 3]
+    assert "more field" in body["errors"][0]["error"]
+    assert len(json.loads(fake_supabase.calls_to("rpc/bulk_init_inventory")[0].content)["entries"]) == 1
+
+
+def test_failed_chunk_is_reported_per_row(api, fake_supabase, monkeypatch):
+    monkeypatch.setattr(wms, "BULK_INIT_CHUNK_SIZE", 2)
+    calls = []
+
+    def flaky_bulk_init(request):
+        calls.append(request)
+        if len(calls) == 2:
+            return httpx.Response(400, json={"code": "23503", "message": "foreign key violation",
+                                             "details": None, "hint": None})
+        return bulk_init(request)
+
+    fake_supabase.fixtures["rpc/bulk_init_inventory"] = flaky_bulk_init
+    rows = [{"item_id": ITEM_ID, "location_id": LOCATION_ID, "quantity": i, "operator_id": OPERATOR_ID}
+            for i in range(5)]
+
+    response = api.post("/api/wms/inventory/bulk-init", json=rows)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    # 第一批和第三批已提交，第二批整体失败
+    assert [result["success"] for result in results] == [True, True, False, False, True]
+    assert "foreign key violation" in results[2]["error"]
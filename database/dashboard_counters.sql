@@ -0,0 +1,142 @@
+-- ============================================
+-- 仪表板计数器 (Dashboard Counters)
+-- ============================================
+-- 由 requests 触发器增量维护的计数表，
+-- /statistics/dashboard 只需调用一次 get_dashboard_stats()
+-- 在 Supabase SQL Editor 中运行（需先运行 schema.sql）
+
+-- ============================================
+-- 1. 计数表
+-- ============================================
+-- 每个状态的申请数量
+CREATE TABLE IF NOT EXISTS request_status_counters (
+  status TEXT PRIMARY KEY,
+  request_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- 每天完成的申请数量（按 completed_at 日期）
+CREATE TABLE IF NOT EXISTS request_completed_daily (
+  day DATE PRIMARY KEY,
+  request_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- ============================================
+-- 2. 触发器：增量维护计数
+-- ============================================
+CREATE OR REPLACE FUNCTION maintain_request_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+  -- 状态和完成时间都没变时不需要更新计数（避免计数行上的锁竞争）
+  IF (TG_OP = 'UPDATE'
+      AND OLD.status IS NOT DISTINCT FROM NEW.status
+      AND OLD.completed_at IS NOT DISTINCT FROM NEW.completed_at) THEN
+    RETURN NULL;
+  END IF;
+
+  -- 移除旧值
+  IF (TG_OP IN ('UPDATE', 'DELETE')) THEN
+    UPDATE request_status_counters
+    SET request_count = request_count - 1
+    WHERE status = OLD.status;
+
+    IF (OLD.status = 'completed' AND OLD.completed_at IS NOT NULL) THEN
+      UPDATE request_completed_daily
+      SET request_count = request_count - 1
+      WHERE day = OLD.completed_at::DATE;
+    END IF;
+  END IF;
+
+  -- 加入新值
+  IF (TG_OP IN ('INSERT', 'UPDATE')) THEN
+    IF (NEW.status IS NOT NULL) THEN
+      INSERT INTO request_status_counters (status, request_count)
+      VALUES (NEW.status, 1)
+      ON CONFLICT (status) DO UPDATE
+      SET request_count = request_status_counters.request_count + 1;
+    END IF;
+
+    IF (NEW.status = 'completed' AND NEW.completed_at IS NOT NULL) THEN
+      INSERT INTO request_completed_daily (day, request_count)
+      VALUES (NEW.completed_at::DATE, 1)
+      ON CONFLICT (day) DO UPDATE
+      SET request_count = request_completed_daily.request_count + 1;
+    END IF;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS maintain_request_counters ON requests;
+CREATE TRIGGER maintain_request_counters AFTER INSERT OR UPDATE OR DELETE ON requests
+  FOR EACH ROW EXECUTE FUNCTION maintain_request_counters();
+
+-- ============================================
+-- 3. 用现有数据初始化计数
+-- ============================================
+TRUNCATE request_status_counters;
+INSERT INTO request_status_counters (status, request_count)
+SELECT status, COUNT(*)
+FROM requests
+WHERE status IS NOT NULL
+GROUP BY status;
+
+TRUNCATE request_completed_daily;
+INSERT INTO request_completed_daily (day, request_count)
+SELECT completed_at::DATE, COUNT(*)
+FROM requests
+WHERE status = 'completed' AND completed_at IS NOT NULL
+GROUP BY completed_at::DATE;
+
+-- ============================================
+-- 4. 仪表板统计函数（一次调用返回全部数据）
+-- ============================================
+-- 低库存物料与 GET /items?low_stock=true 使用同一条件（stock_quantity <= min_stock_level，
+-- 见 items_low_stock.sql），返回完整的 items 行
+CREATE OR REPLACE FUNCTION get_dashboard_stats()
+RETURNS JSON AS $$
+  SELECT json_build_object(
+    'total_requests', COALESCE((
+      SELECT SUM(request_count) FROM request_status_counters
+    ), 0),
+    'pending_requests', COALESCE((
+      SELECT request_count FROM request_status_counters WHERE status = 'pending'
+    ), 0),
+    'in_progress_requests', COALESCE((
+      SELECT SUM(request_count) FROM request_status_counters
+      WHERE status IN ('confirmed', 'preparing', 'ready', 'shipped')
+    ), 0),
+    'completed_today', COALESCE((
+      SELECT SUM(request_count) FROM request_completed_daily WHERE day >= CURRENT_DATE
+    ), 0),
+    'low_stock_items', COALESCE((
+      SELECT json_agg(i ORDER BY i.name)
+      FROM items i
+      WHERE i.is_active
+        AND COALESCE(i.stock_quantity, 0) <= COALESCE(i.min_stock_level, 0)
+    ), '[]'::JSON)
+  );
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- ============================================
+-- 5. 权限：计数表只读
+-- ============================================
+-- 计数只由 maintain_request_counters 触发器修改（SECURITY DEFINER，
+-- 受限角色插入 requests 时触发器也能更新计数）
+ALTER TABLE request_status_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE request_completed_daily ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can view request status counters" ON request_status_counters;
+CREATE POLICY "Anyone can view request status counters" ON request_status_counters
+  FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view request completed daily" ON request_completed_daily;
+CREATE POLICY "Anyone can view request completed daily" ON request_completed_daily
+  FOR SELECT USING (true);
+
+REVOKE INSERT, UPDATE, DELETE, TRUNCATE ON request_status_counters FROM anon, authenticated;
+REVOKE INSERT, UPDATE, DELETE, TRUNCATE ON request_completed_daily FROM anon, authenticated;
+
+COMMENT ON TABLE request_status_counters IS '申请状态计数 - 由 maintain_request_counters 触发器维护';
+COMMENT ON TABLE request_completed_daily IS '每日完成申请计数 - 由 maintain_request_counters 触发器维护';
+COMMENT ON FUNCTION get_dashboard_stats() IS '仪表板统计 - 读取计数表和低库存物料';
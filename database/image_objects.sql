@@ -0,0 +1,225 @@
+-- ============================================
+-- 图片去重 (Content-Addressed Image Objects)
+-- ============================================
+-- 上传的图片按内容 SHA-256 存储，相同内容在同一个存储位置只存储一次。
+-- 存储位置 storage_id（后端和 bucket，例如 local:request-images）是键的一部分：
+-- 切换 STORAGE_BACKEND 后不会返回另一个后端的文件，删除时也只释放当前后端的对象。
+-- 上传时先登记 (claim_image_object)，占用一个待引用计数 pending_uploads，
+-- 保存失败时撤销 (abandon_image_claim)；request_images / item_images 插入引用时
+-- 触发器把待引用计数转为引用计数 ref_count。
+-- 删除图片时先释放调用方自己的登记，没有引用、也没有其他正在进行的上传时才删除存储中的文件。
+-- 上传后一直没有被引用的登记（客户端放弃了表单）超过有效期后视为放弃，
+-- 由后端定期调用 sweep_image_objects 清理（见第 5 节）。
+-- 表和函数只对 service role 开放（见第 6 节）
+-- 在 Supabase SQL Editor 中运行（需先运行 fix_images_column.sql 和 material_management_upgrade.sql）
+
+-- ============================================
+-- 1. 图片对象表（存储位置 + 哈希 -> 存储路径/URL）
+-- ============================================
+CREATE TABLE IF NOT EXISTS image_objects (
+  storage_id TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  path TEXT NOT NULL,
+  url TEXT NOT NULL,
+  size BIGINT,
+  content_type TEXT,
+  ref_count INTEGER NOT NULL DEFAULT 0,
+  -- 已登记、还没有被 request_images / item_images 引用的上传
+  pending_uploads INTEGER NOT NULL DEFAULT 0,
+  last_claimed_at TIMESTAMPTZ,
+  -- 文件是否已经保存到存储（登记后、保存完成前为 false）
+  stored BOOLEAN NOT NULL DEFAULT true,
+  -- 已生成的图片版本：名称 -> {url, path, size, width, height}
+  renditions JSONB NOT NULL DEFAULT '{}'::JSONB,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (storage_id, content_hash),
+  UNIQUE (storage_id, path)
+);
+
+-- 已运行过旧版本时补充列
+ALTER TABLE image_objects ADD COLUMN IF NOT EXISTS pending_uploads INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE image_objects ADD COLUMN IF NOT EXISTS last_claimed_at TIMESTAMPTZ;
+ALTER TABLE image_objects ADD COLUMN IF NOT EXISTS stored BOOLEAN NOT NULL DEFAULT true;
+ALTER TABLE image_objects ADD COLUMN IF NOT EXISTS renditions JSONB NOT NULL DEFAULT '{}'::JSONB;
+
+CREATE INDEX IF NOT EXISTS idx_image_objects_url ON image_objects(url);
+-- 清理过期登记时只扫描没有引用的对象
+CREATE INDEX IF NOT EXISTS idx_image_objects_unreferenced
+  ON image_objects(storage_id, last_claimed_at)
+  WHERE ref_count = 0;
+
+-- ============================================
+-- 2. 触发器：维护引用计数
+-- ============================================
+CREATE OR REPLACE FUNCTION maintain_image_refcount()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF (TG_OP = 'UPDATE' AND OLD.image_url IS NOT DISTINCT FROM NEW.image_url) THEN
+    RETURN NULL;
+  END IF;
+
+  IF (TG_OP IN ('UPDATE', 'DELETE')) THEN
+    UPDATE image_objects
+    SET ref_count = ref_count - 1
+    WHERE url = OLD.image_url;
+  END IF;
+
+  -- 新引用接替一个待引用的上传
+  IF (TG_OP IN ('INSERT', 'UPDATE')) THEN
+    UPDATE image_objects
+    SET ref_count = ref_count + 1,
+        pending_uploads = GREATEST(pending_uploads - 1, 0)
+    WHERE url = NEW.image_url;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS maintain_image_refcount ON request_images;
+CREATE TRIGGER maintain_image_refcount AFTER INSERT OR UPDATE OR DELETE ON request_images
+  FOR EACH ROW EXECUTE FUNCTION maintain_image_refcount();
+
+DROP TRIGGER IF EXISTS maintain_image_refcount ON item_images;
+CREATE TRIGGER maintain_image_refcount AFTER INSERT OR UPDATE OR DELETE ON item_images
+  FOR EACH ROW EXECUTE FUNCTION maintain_image_refcount();
+
+-- 用现有数据初始化计数
+UPDATE image_objects o
+SET ref_count = (
+  SELECT COUNT(*) FROM request_images WHERE image_url = o.url
+) + (
+  SELECT COUNT(*) FROM item_images WHERE image_url = o.url
+);
+
+-- ============================================
+-- 3. 登记上传
+-- ============================================
+-- 在同一个语句中查找或创建对象并占用一个待引用计数，
+-- 之后到 request_images / item_images 插入引用之前，release_image_object 不会删除文件。
+-- 返回对象行：stored = false 时调用方保存文件后设置 stored = true，
+-- 保存失败时调用 abandon_image_claim
+CREATE OR REPLACE FUNCTION claim_image_object(
+  p_storage_id TEXT,
+  p_content_hash TEXT,
+  p_path TEXT,
+  p_url TEXT,
+  p_size BIGINT,
+  p_content_type TEXT
+)
+RETURNS image_objects AS $$
+  INSERT INTO image_objects (
+    storage_id, content_hash, path, url, size, content_type,
+    pending_uploads, last_claimed_at, stored
+  )
+  VALUES (p_storage_id, p_content_hash, p_path, p_url, p_size, p_content_type, 1, NOW(), false)
+  ON CONFLICT (storage_id, content_hash) DO UPDATE
+  SET pending_uploads = image_objects.pending_uploads + 1,
+      last_claimed_at = NOW()
+  RETURNING *;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- 撤销登记（保存文件失败时）。文件从未保存成功、且没有其他上传和引用时删除记录，
+-- 下次上传重新保存
+CREATE OR REPLACE FUNCTION abandon_image_claim(p_storage_id TEXT, p_content_hash TEXT)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE image_objects
+  SET pending_uploads = GREATEST(pending_uploads - 1, 0)
+  WHERE storage_id = p_storage_id AND content_hash = p_content_hash;
+
+  DELETE FROM image_objects
+  WHERE storage_id = p_storage_id
+    AND content_hash = p_content_hash
+    AND NOT stored
+    AND ref_count = 0
+    AND pending_uploads = 0;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- ============================================
+-- 4. 释放图片对象
+-- ============================================
+-- 调用方删除自己上传、还没有被引用的图片：先释放它占用的待引用计数。
+-- 之后没有引用、也没有其他待引用的上传时删除 image_objects 行并返回 true（调用方再删除存储中的文件）；
+-- 否则返回 false，文件保留。超过 p_claim_ttl 仍未被引用的上传视为已放弃。
+-- 当前存储位置没有这个路径（去重之前上传的图片）时直接返回 true。
+-- 存储路径带随机后缀（见 image_objects.object_path），释放后重新上传的相同内容使用新路径，
+-- 不会被这里正在进行的删除影响
+-- 增加 p_claim_ttl 之前的版本（两个参数），避免重载后调用不明确
+DROP FUNCTION IF EXISTS release_image_object(TEXT, TEXT);
+CREATE OR REPLACE FUNCTION release_image_object(
+  p_storage_id TEXT,
+  p_path TEXT,
+  p_claim_ttl INTERVAL DEFAULT INTERVAL '1 day'
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+  v_object image_objects;
+BEGIN
+  SELECT * INTO v_object
+  FROM image_objects
+  WHERE storage_id = p_storage_id AND path = p_path
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN true;
+  END IF;
+
+  IF v_object.pending_uploads > 0 THEN
+    UPDATE image_objects
+    SET pending_uploads = pending_uploads - 1
+    WHERE storage_id = p_storage_id AND path = p_path
+    RETURNING * INTO v_object;
+  END IF;
+
+  IF v_object.ref_count > 0
+     OR (v_object.pending_uploads > 0 AND v_object.last_claimed_at > NOW() - p_claim_ttl) THEN
+    RETURN false;
+  END IF;
+
+  DELETE FROM image_objects WHERE storage_id = p_storage_id AND path = p_path;
+  RETURN true;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- ============================================
+-- 5. 清理放弃的上传
+-- ============================================
+-- 最后一次登记超过 p_claim_ttl、没有被引用的对象：上传后没有保存 request_images / item_images
+-- 的登记，以及引用都已删除的文件。删除记录并返回被删除的行，由调用方删除存储中的文件。
+-- 同时有新的上传登记相同内容时 last_claimed_at 已更新，不会被删除；
+-- 在这之后登记的上传创建新记录，使用新的存储路径
+CREATE OR REPLACE FUNCTION sweep_image_objects(
+  p_storage_id TEXT,
+  p_claim_ttl INTERVAL DEFAULT INTERVAL '1 day'
+)
+RETURNS SETOF image_objects AS $$
+  DELETE FROM image_objects
+  WHERE storage_id = p_storage_id
+    AND ref_count = 0
+    AND COALESCE(last_claimed_at, created_at) < NOW() - p_claim_ttl
+  RETURNING *;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- ============================================
+-- 6. 权限：只有后端（service role）可以读写
+-- ============================================
+-- 引用计数只由触发器和上面的函数修改；客户端直接写入会导致仍在使用的文件被删除
+ALTER TABLE image_objects ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON image_objects FROM anon, authenticated;
+
+REVOKE EXECUTE ON FUNCTION claim_image_object(TEXT, TEXT, TEXT, TEXT, BIGINT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION abandon_image_claim(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION release_image_object(TEXT, TEXT, INTERVAL) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION sweep_image_objects(TEXT, INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_image_object(TEXT, TEXT, TEXT, TEXT, BIGINT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION abandon_image_claim(TEXT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION release_image_object(TEXT, TEXT, INTERVAL) TO service_role;
+GRANT EXECUTE ON FUNCTION sweep_image_objects(TEXT, INTERVAL) TO service_role;
+
+COMMENT ON TABLE image_objects IS '图片对象 - 按内容哈希去重，ref_count 由 maintain_image_refcount 触发器维护，pending_uploads 为已登记未引用的上传';
+COMMENT ON FUNCTION claim_image_object(TEXT, TEXT, TEXT, TEXT, BIGINT, TEXT) IS '登记上传 - 查找或创建图片对象并占用一个待引用计数';
+COMMENT ON FUNCTION abandon_image_claim(TEXT, TEXT) IS '撤销登记 - 保存文件失败时释放待引用计数';
+COMMENT ON FUNCTION release_image_object(TEXT, TEXT, INTERVAL) IS '释放图片对象 - 释放调用方的登记，没有引用和其他待引用的上传时删除记录并返回 true';
+COMMENT ON FUNCTION sweep_image_objects(TEXT, INTERVAL) IS '清理放弃的上传 - 删除超过有效期仍没有被引用的对象，返回被删除的行';
@@ -0,0 +1,173 @@
+-- ============================================
+-- 原子出入库操作 (Atomic Inventory Transactions)
+-- ============================================
+-- 在一个数据库事务中锁定库存行、计算新库存并写入出入库记录，
+-- 多个扫码枪同时操作同一物料/库位时不会丢失更新
+-- 在 Supabase SQL Editor 中运行（需先运行 wms_setup.sql）
+
+CREATE OR REPLACE FUNCTION apply_inventory_transaction(
+  p_item_id UUID,
+  p_location_id UUID,
+  p_transaction_type TEXT,
+  p_quantity DECIMAL,
+  p_operator_id UUID,
+  p_notes TEXT DEFAULT NULL,
+  p_reference_type TEXT DEFAULT NULL,
+  p_reference_id UUID DEFAULT NULL
+)
+RETURNS inventory_transactions AS $$
+DECLARE
+  v_before DECIMAL;
+  v_after DECIMAL;
+  v_transaction inventory_transactions;
+BEGIN
+  IF p_transaction_type NOT IN ('in', 'out', 'adjust', 'initial') THEN
+    RAISE EXCEPTION 'Invalid transaction type' USING ERRCODE = '22023';
+  END IF;
+
+  -- 确保库存行存在，然后加行锁（并发操作在此排队）
+  INSERT INTO inventory (item_id, location_id, quantity)
+  VALUES (p_item_id, p_location_id, 0)
+  ON CONFLICT (item_id, location_id) DO NOTHING;
+
+  SELECT quantity INTO v_before
+  FROM inventory
+  WHERE item_id = p_item_id AND location_id = p_location_id
+  FOR UPDATE;
+
+  -- 计算新库存
+  IF p_transaction_type IN ('in', 'initial') THEN
+    v_after := v_before + p_quantity;
+  ELSIF p_transaction_type = 'out' THEN
+    v_after := v_before - p_quantity;
+  ELSE
+    v_after := p_quantity;
+  END IF;
+
+  -- 库存不能为负（异常会回滚上面插入的空库存行）
+  IF v_after < 0 THEN
+    RAISE EXCEPTION 'Insufficient stock' USING ERRCODE = '23514';
+  END IF;
+
+  UPDATE inventory
+  SET quantity = v_after, updated_at = NOW()
+  WHERE item_id = p_item_id AND location_id = p_location_id;
+
+  -- 记录交易历史
+  INSERT INTO inventory_transactions (
+    item_id, location_id, transaction_type, quantity,
+    before_quantity, after_quantity, operator_id,
+    notes, reference_type, reference_id
+  )
+  VALUES (
+    p_item_id, p_location_id, p_transaction_type, p_quantity,
+    v_before, v_after, p_operator_id,
+    p_notes, p_reference_type, p_reference_id
+  )
+  RETURNING * INTO v_transaction;
+
+  RETURN v_transaction;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION apply_inventory_transaction(UUID, UUID, TEXT, DECIMAL, UUID, TEXT, TEXT, UUID) IS '原子出入库 - 锁定库存行、更新库存并写入出入库记录';
+
+-- ============================================
+-- 批量初始化库存（首次盘点）
+-- ============================================
+-- entries: [{row_index, item_id, location_id, quantity, operator_id, notes}]
+-- 每批一次调用：校验、upsert 库存、写入出入库记录，返回每行结果。
+-- 同一批次中同一物料/库位出现多次时，按 row_index 顺序累加，
+-- before/after 数量与逐条录入的结果一致。
+CREATE OR REPLACE FUNCTION bulk_init_inventory(entries JSONB)
+RETURNS TABLE (
+  row_index INTEGER,
+  success BOOLEAN,
+  error TEXT,
+  transaction_id UUID,
+  before_quantity DECIMAL,
+  after_quantity DECIMAL
+) AS $$
+  WITH input AS (
+    SELECT e.*
+    FROM jsonb_to_recordset(entries) AS e(
+      row_index INTEGER,
+      item_id UUID,
+      location_id UUID,
+      quantity DECIMAL,
+      operator_id UUID,
+      notes TEXT
+    )
+  ),
+  checked AS (
+    SELECT
+      input.*,
+      CASE
+        WHEN input.quantity IS NULL OR input.quantity < 0 THEN 'Invalid quantity'
+        WHEN NOT EXISTS (SELECT 1 FROM items i WHERE i.id = input.item_id) THEN 'Item not found'
+        WHEN NOT EXISTS (SELECT 1 FROM storage_locations l WHERE l.id = input.location_id) THEN 'Location not found'
+        WHEN NOT EXISTS (SELECT 1 FROM profiles p WHERE p.id = input.operator_id) THEN 'Operator not found'
+      END AS error
+    FROM input
+  ),
+  valid AS (
+    SELECT checked.*, uuid_generate_v4() AS transaction_id
+    FROM checked
+    WHERE checked.error IS NULL
+  ),
+  totals AS (
+    SELECT valid.item_id, valid.location_id, SUM(valid.quantity) AS batch_quantity
+    FROM valid
+    GROUP BY valid.item_id, valid.location_id
+  ),
+  -- upsert 会锁定库存行，返回的是本批次累加后的库存
+  upserted AS (
+    INSERT INTO inventory (item_id, location_id, quantity)
+    SELECT totals.item_id, totals.location_id, totals.batch_quantity
+    FROM totals
+    ON CONFLICT (item_id, location_id) DO UPDATE
+    SET quantity = inventory.quantity + EXCLUDED.quantity, updated_at = NOW()
+    RETURNING inventory.item_id, inventory.location_id, inventory.quantity AS final_quantity
+  ),
+  ledger AS (
+    SELECT
+      valid.transaction_id,
+      valid.row_index,
+      valid.item_id,
+      valid.location_id,
+      valid.quantity,
+      valid.operator_id,
+      valid.notes,
+      upserted.final_quantity - totals.batch_quantity
+        + SUM(valid.quantity) OVER running - valid.quantity AS before_quantity,
+      upserted.final_quantity - totals.batch_quantity
+        + SUM(valid.quantity) OVER running AS after_quantity
+    FROM valid
+    JOIN totals ON totals.item_id = valid.item_id AND totals.location_id = valid.location_id
+    JOIN upserted ON upserted.item_id = valid.item_id AND upserted.location_id = valid.location_id
+    WINDOW running AS (PARTITION BY valid.item_id, valid.location_id ORDER BY valid.row_index)
+  ),
+  inserted AS (
+    INSERT INTO inventory_transactions (
+      id, item_id, location_id, transaction_type, quantity,
+      before_quantity, after_quantity, operator_id, notes
+    )
+    SELECT
+      ledger.transaction_id, ledger.item_id, ledger.location_id, 'initial', ledger.quantity,
+      ledger.before_quantity, ledger.after_quantity, ledger.operator_id, ledger.notes
+    FROM ledger
+    RETURNING id
+  )
+  SELECT
+    checked.row_index,
+    checked.error IS NULL AS success,
+    checked.error,
+    ledger.transaction_id,
+    ledger.before_quantity,
+    ledger.after_quantity
+  FROM checked
+  LEFT JOIN ledger ON ledger.row_index = checked.row_index
+  ORDER BY checked.row_index;
+$$ LANGUAGE sql;
+
+COMMENT ON FUNCTION bulk_init_inventory(JSONB) IS '批量初始化库存 - 一次调用处理一批盘点数据并返回每行结果';
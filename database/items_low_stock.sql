@@ -0,0 +1,25 @@
+-- ============================================
+-- 低库存筛选 (Low Stock Filter)
+-- ============================================
+-- GET /items?low_stock=true 在数据库中筛选 stock_quantity <= min_stock_level，
+-- 只传输符合条件的行（之前下载全部物料后在 Python 中过滤）。
+-- 条件与 Item 模型、物料创建/更新写入的字段以及库存管理页面的高亮一致；
+-- low_stock_items 视图（einkaufs_setup.sql）不受影响。
+-- 部分索引与物料列表的 (name, id) 游标分页排序一致
+-- 在 Supabase SQL Editor 中运行（可重复运行）
+
+-- ============================================
+-- 1. 生成列：是否低库存（随库存和最低库存自动更新）
+-- ============================================
+ALTER TABLE items
+  ADD COLUMN IF NOT EXISTS is_low_stock BOOLEAN
+  GENERATED ALWAYS AS (COALESCE(stock_quantity, 0) <= COALESCE(min_stock_level, 0)) STORED;
+
+-- ============================================
+-- 2. 部分索引：只包含启用的低库存物料
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_items_low_stock_name_id
+  ON items(name, id)
+  WHERE is_low_stock AND is_active;
+
+COMMENT ON COLUMN items.is_low_stock IS '是否低库存 - stock_quantity <= min_stock_level（生成列）';
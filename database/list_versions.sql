@@ -0,0 +1,48 @@
+-- ============================================
+-- 列表版本 (List Versions for ETag)
+-- ============================================
+-- GET /items 和 GET /api/wms/inventory 在执行列表查询之前调用这些函数，
+-- 用 行数 + 最大 updated_at 生成 ETag；客户端带 If-None-Match 且数据没有变化时
+-- 直接返回 304，不再查询和序列化整个列表。
+-- 行数覆盖插入和删除，updated_at（由触发器维护）覆盖修改
+-- 在 Supabase SQL Editor 中运行（需先运行 schema.sql 和 wms_setup.sql）
+
+-- ============================================
+-- 1. 触发器：修改库存和库位时更新 updated_at（items 已有，见 schema.sql）
+-- ============================================
+DROP TRIGGER IF EXISTS update_inventory_updated_at ON inventory;
+CREATE TRIGGER update_inventory_updated_at BEFORE UPDATE ON inventory
+  FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_storage_locations_updated_at ON storage_locations;
+CREATE TRIGGER update_storage_locations_updated_at BEFORE UPDATE ON storage_locations
+  FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- ============================================
+-- 2. 索引：MAX(updated_at) 只读取索引的一端
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_items_updated_at ON items(updated_at);
+CREATE INDEX IF NOT EXISTS idx_inventory_updated_at ON inventory(updated_at);
+CREATE INDEX IF NOT EXISTS idx_storage_locations_updated_at ON storage_locations(updated_at);
+
+-- ============================================
+-- 3. 版本函数
+-- ============================================
+-- 物料列表
+CREATE OR REPLACE FUNCTION items_list_version()
+RETURNS TEXT AS $$
+  SELECT COUNT(*) || '-' || COALESCE(MAX(updated_at)::TEXT, '') FROM items;
+$$ LANGUAGE sql STABLE;
+
+-- 库存列表（嵌入了物料和库位，三张表任何一张变化都会改变版本）
+CREATE OR REPLACE FUNCTION inventory_list_version()
+RETURNS TEXT AS $$
+  SELECT concat_ws(':',
+    (SELECT COUNT(*) || '-' || COALESCE(MAX(updated_at)::TEXT, '') FROM inventory),
+    items_list_version(),
+    (SELECT COUNT(*) || '-' || COALESCE(MAX(updated_at)::TEXT, '') FROM storage_locations)
+  );
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION items_list_version() IS '物料列表版本 - 行数和最大 updated_at，用于 GET /items 的 ETag';
+COMMENT ON FUNCTION inventory_list_version() IS '库存列表版本 - 库存、物料、库位的行数和最大 updated_at，用于 GET /api/wms/inventory 的 ETag';
@@ -0,0 +1,24 @@
+-- ============================================
+-- 通知实时推送 (Notifications Realtime)
+-- ============================================
+-- 把 notifications 表加入 Supabase Realtime 的发布，
+-- 后端 NotificationHub 才能收到 INSERT/UPDATE/DELETE 事件并通过 /notifications/stream 推送给客户端
+-- 在 Supabase SQL Editor 中运行
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1
+    FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime'
+      AND schemaname = 'public'
+      AND tablename = 'notifications'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE notifications;
+  END IF;
+END;
+$$;
+
+-- DELETE 事件的 old_record 默认只有主键，FULL 时包含 user_id，
+-- 后端才能让该用户的未读数缓存失效
+ALTER TABLE notifications REPLICA IDENTITY FULL;
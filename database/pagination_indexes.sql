@@ -0,0 +1,15 @@
+-- ============================================
+-- 游标分页索引 (Keyset Pagination Indexes)
+-- ============================================
+-- 列表接口按 (created_at, id) 或 (name, id) 排序并用游标翻页，
+-- 复合索引让每一页都是一次索引范围扫描，与翻到第几页无关
+-- 在 Supabase SQL Editor 中运行
+
+CREATE INDEX IF NOT EXISTS idx_requests_created_id ON requests(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_material_transfers_created_id ON material_transfers(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_return_requests_created_id ON return_requests(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_projects_created_id ON projects(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_created_id ON purchase_orders(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_items_name_id ON items(name, id);
+CREATE INDEX IF NOT EXISTS idx_suppliers_name_id ON suppliers(name, id);
@@ -0,0 +1,85 @@
+-- ============================================
+-- 统计函数 (Statistics Functions)
+-- ============================================
+-- 在数据库中完成汇总，/statistics 接口只接收结果行
+-- 在 Supabase SQL Editor 中运行
+
+-- ============================================
+-- 1. 索引
+-- ============================================
+-- 已完成申请按创建时间查询（材料使用统计）
+CREATE INDEX IF NOT EXISTS idx_requests_completed_created
+  ON requests(created_at)
+  WHERE status = 'completed';
+
+-- 工地申请按创建时间查询（工地统计）
+CREATE INDEX IF NOT EXISTS idx_requests_baustelle_created
+  ON requests(baustelle_id, created_at);
+
+-- ============================================
+-- 2. 材料/设备使用统计
+-- ============================================
+-- 统计已完成申请中每个物品的总数量，按总数量降序排列
+-- date_to_inclusive = true 时 created_at <= date_to，否则 created_at < date_to
+CREATE OR REPLACE FUNCTION material_usage_stats(
+  date_from TIMESTAMPTZ DEFAULT NULL,
+  date_to TIMESTAMPTZ DEFAULT NULL,
+  date_to_inclusive BOOLEAN DEFAULT true,
+  filter_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+  item_id UUID,
+  item_name TEXT,
+  total_quantity DECIMAL,
+  unit TEXT,
+  request_count BIGINT
+) AS $$
+  SELECT
+    ri.item_id,
+    COALESCE(i.name, 'Unknown') AS item_name,
+    SUM(ri.quantity) AS total_quantity,
+    MIN(ri.unit) AS unit,
+    COUNT(*) AS request_count
+  FROM requests r
+  JOIN request_items ri ON ri.request_id = r.id
+  LEFT JOIN items i ON i.id = ri.item_id
+  WHERE r.status = 'completed'
+    AND (date_from IS NULL OR r.created_at >= date_from)
+    AND (
+      date_to IS NULL
+      OR (date_to_inclusive AND r.created_at <= date_to)
+      OR (NOT date_to_inclusive AND r.created_at < date_to)
+    )
+    AND (filter_type IS NULL OR i.type = filter_type)
+  GROUP BY ri.item_id, i.name
+  ORDER BY total_quantity DESC;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION material_usage_stats(TIMESTAMPTZ, TIMESTAMPTZ, BOOLEAN, TEXT) IS '材料使用统计 - 按物品汇总已完成申请的数量';
+
+-- ============================================
+-- 3. 工地申请统计
+-- ============================================
+-- 按状态和优先级分组计数，每个组合返回一行
+CREATE OR REPLACE FUNCTION baustelle_request_stats(
+  site_id UUID,
+  date_from TIMESTAMPTZ DEFAULT NULL,
+  date_to TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+  status TEXT,
+  priority TEXT,
+  request_count BIGINT
+) AS $$
+  SELECT
+    r.status,
+    r.priority,
+    COUNT(*) AS request_count
+  FROM requests r
+  WHERE r.baustelle_id = site_id
+    AND (date_from IS NULL OR r.created_at >= date_from)
+    AND (date_to IS NULL OR r.created_at <= date_to)
+  GROUP BY r.status, r.priority;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION baustelle_request_stats(UUID, TIMESTAMPTZ, TIMESTAMPTZ) IS '工地申请统计 - 按状态和优先级分组计数';
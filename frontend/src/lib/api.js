@@ -6,6 +6,24 @@ class ApiClient {
   }
 
   async request(endpoint, options = {}) {
+    const { data } = await this.requestWithHeaders(endpoint, options)
+    return data
+  }
+
+  // Paginated lists: follow the X-Next-Cursor header until the last page
+  async requestAllPages(endpoint, params = {}) {
+    const rows = []
+    let cursor = null
+    do {
+      const query = new URLSearchParams(cursor ? { ...params, cursor } : params).toString()
+      const { data, headers } = await this.requestWithHeaders(`${endpoint}?${query}`)
+      rows.push(...data)
+      cursor = headers.get('X-Next-Cursor')
+    } while (cursor)
+    return rows
+  }
+
+  async requestWithHeaders(endpoint, options = {}) {
     // Ensure endpoint starts with /
     const cleanEndpoint = endpoint.startsWith('/') ? endpoint : `/${endpoint}`
     const url = `${this.baseURL}${cleanEndpoint}`
@@ -28,7 +46,7 @@ class ApiClient {
         throw new Error(data.detail || 'API request failed')
       }
 
-      return data
+      return { data, headers: response.headers }
     } catch (error) {
       console.error('API Error:', error)
       throw error
@@ -54,8 +72,7 @@ class ApiClient {
 
   // Items
   async getItems(params = {}) {
-    const query = new URLSearchParams(params).toString()
-    return this.request(`/items/?${query}`)
+    return this.requestAllPages('/items/', { limit: 500, ...params })
   }
 
   async getItem(id) {
@@ -133,6 +150,10 @@ class ApiClient {
     })
   }
 
+  notificationStreamUrl(userId) {
+    return `${this.baseURL}/notifications/stream?user_id=${encodeURIComponent(userId)}`
+  }
+
   async markAllNotificationsRead(userId) {
     return this.request(`/notifications/mark-all-read?user_id=${userId}`, {
       method: 'PATCH',
@@ -1,6 +1,8 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Package, Search, Plus, Edit, Trash2, Tag, Image as ImageIcon, X } from 'lucide-react'
 
+const SEARCH_DEBOUNCE_MS = 150
+
 export default function MaterialManagement() {
   const [materials, setMaterials] = useState([])
   const [loading, setLoading] = useState(true)
@@ -31,8 +33,14 @@ export default function MaterialManagement() {
     }
   }
 
-  const handleSearch = async (term) => {
+  // Wait until typing pauses and drop responses for outdated terms
+  const searchTimerRef = useRef(null)
+  const searchAbortRef = useRef(null)
+
+  const handleSearch = (term) => {
     setSearchTerm(term)
+    clearTimeout(searchTimerRef.current)
+    searchAbortRef.current?.abort()
 
     if (!term || term.length < 2) {
       setSearchResults([])
@@ -40,18 +48,29 @@ export default function MaterialManagement() {
       return
     }
 
+    searchTimerRef.current = setTimeout(() => runSearch(term), SEARCH_DEBOUNCE_MS)
+  }
+
+  const runSearch = async (term) => {
+    const controller = new AbortController()
+    searchAbortRef.current = controller
+
     try {
       setIsSearching(true)
       const response = await fetch(
-        `${import.meta.env.VITE_API_URL}/materials/search?q=${encodeURIComponent(term)}`
+        `${import.meta.env.VITE_API_URL}/materials/typeahead?q=${encodeURIComponent(term)}&limit=20`,
+        { signal: controller.signal }
       )
       const data = await response.json()
       setSearchResults(data)
     } catch (error) {
+      if (error.name === 'AbortError') return
       console.error('Search error:', error)
       setSearchResults([])
     } finally {
-      setIsSearching(false)
+      if (searchAbortRef.current === controller) {
+        setIsSearching(false)
+      }
     }
   }
 
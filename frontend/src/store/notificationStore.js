@@ -1,5 +1,4 @@
 import { create } from 'zustand'
-import { supabase } from '../lib/supabase'
 import { api } from '../lib/api'
 
 export const useNotificationStore = create((set, get) => ({
@@ -10,56 +9,68 @@ export const useNotificationStore = create((set, get) => ({
 
   initialize: async (userId) => {
     if (!userId) return
+    get().cleanup()
 
     // 加载通知
     await get().fetchNotifications(userId)
 
-    // 订阅实时通知
-    const subscription = supabase
-      .channel('notifications')
-      .on(
-        'postgres_changes',
-        {
-          event: 'INSERT',
-          schema: 'public',
-          table: 'notifications',
-          filter: `user_id=eq.${userId}`,
-        },
-        (payload) => {
-          set((state) => ({
-            notifications: [payload.new, ...state.notifications],
-            unreadCount: state.unreadCount + 1,
-          }))
+    // 通过后端 SSE 接收通知变更（断线后浏览器自动重连）
+    const source = new EventSource(api.notificationStreamUrl(userId))
+    let connected = false
+
+    source.onopen = () => {
+      // 重新连接后补上断线期间的变更
+      if (connected) get().fetchNotifications(userId)
+      connected = true
+    }
+
+    source.addEventListener('insert', (event) => {
+      const { notification } = JSON.parse(event.data)
+      set((state) => ({
+        notifications: [notification, ...state.notifications],
+        unreadCount: notification.is_read ? state.unreadCount : state.unreadCount + 1,
+      }))
+    })
+
+    source.addEventListener('update', (event) => {
+      const { notification } = JSON.parse(event.data)
+      set((state) => {
+        const previous = state.notifications.find((n) => n.id === notification.id)
+        let unreadCount = state.unreadCount
+        if (previous && !previous.is_read && notification.is_read) unreadCount -= 1
+        if (previous && previous.is_read && !notification.is_read) unreadCount += 1
+        return {
+          notifications: state.notifications.map((n) =>
+            n.id === notification.id ? notification : n
+          ),
+          unreadCount: Math.max(0, unreadCount),
         }
-      )
-      .on(
-        'postgres_changes',
-        {
-          event: 'UPDATE',
-          schema: 'public',
-          table: 'notifications',
-          filter: `user_id=eq.${userId}`,
-        },
-        (payload) => {
-          set((state) => ({
-            notifications: state.notifications.map((n) =>
-              n.id === payload.new.id ? payload.new : n
-            ),
-            unreadCount: payload.new.is_read
-              ? Math.max(0, state.unreadCount - 1)
-              : state.unreadCount,
-          }))
+      })
+    })
+
+    source.addEventListener('delete', (event) => {
+      const { notification } = JSON.parse(event.data)
+      set((state) => {
+        const previous = state.notifications.find((n) => n.id === notification.id)
+        return {
+          notifications: state.notifications.filter((n) => n.id !== notification.id),
+          unreadCount: previous && !previous.is_read
+            ? Math.max(0, state.unreadCount - 1)
+            : state.unreadCount,
         }
-      )
-      .subscribe()
+      })
+    })
+
+    // 服务器端积压或订阅中断后要求重新加载
+    source.addEventListener('resync', () => get().fetchNotifications(userId))
 
-    set({ subscription })
+    set({ subscription: source })
   },
 
   cleanup: () => {
     const subscription = get().subscription
     if (subscription) {
-      supabase.removeChannel(subscription)
+      subscription.close()
       set({ subscription: null })
     }
   },